@@ -0,0 +1,115 @@
+"""
+アドミッション制御（同時処理数のメモリ予算管理）
+アップロードサイズから各リクエストのメモリ使用量を見積もり、
+合計が予算を超える場合は待ち行列で待機させます。
+待ち行列が一杯、または待機がタイムアウトした場合は受け付けを拒否します。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+
+class AdmissionController:
+    """メモリ予算と待ち行列によるアドミッション制御
+
+    budget_bytes: 同時に処理できるリクエストの見積もりメモリ合計
+    max_queue: 待機できるリクエスト数の上限
+    queue_timeout: 待機の最大秒数
+    """
+
+    def __init__(self, budget_bytes, max_queue, queue_timeout):
+        self.budget_bytes = budget_bytes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._queue = deque()  # 待機中のチケット（先着順）
+        self._in_use_bytes = 0
+        self._in_flight = 0
+
+        # 監視用の統計
+        self._admitted_total = 0
+        self._rejected_total = 0
+        self._timed_out_total = 0
+        self._peak_queue_depth = 0
+        self._avg_hold_seconds = 0.0
+
+    def _fits(self, cost):
+        return self._in_use_bytes + cost <= self.budget_bytes or self._in_flight == 0
+
+    def acquire(self, cost):
+        """予算を確保する。確保できた場合は確保した量（release に渡す）、拒否した場合は None を返す
+        1件で予算を超えるリクエストは、他に処理中のものがなければ単独で実行する"""
+        cost = min(cost, self.budget_bytes)
+
+        with self._cond:
+            # 待機中のリクエストがなければ即時に受け付け
+            if not self._queue and self._fits(cost):
+                self._admit(cost)
+                return cost
+
+            if len(self._queue) >= self.max_queue:
+                self._rejected_total += 1
+                return None
+
+            ticket = object()
+            self._queue.append(ticket)
+            self._peak_queue_depth = max(self._peak_queue_depth, len(self._queue))
+            deadline = time.monotonic() + self.queue_timeout
+
+            try:
+                # 先頭の順番が来て、かつ予算に収まるまで待機
+                while not (self._queue[0] is ticket and self._fits(cost)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out_total += 1
+                        self._rejected_total += 1
+                        return None
+                    self._cond.wait(remaining)
+
+                self._admit(cost)
+                return cost
+            finally:
+                self._queue.remove(ticket)
+                # 次の待機者が先頭になったことを通知
+                self._cond.notify_all()
+
+    def _admit(self, cost):
+        self._in_use_bytes += cost
+        self._in_flight += 1
+        self._admitted_total += 1
+
+    def release(self, cost, hold_seconds=None):
+        """acquire で確保した予算を解放する"""
+        with self._cond:
+            self._in_use_bytes -= cost
+            self._in_flight -= 1
+            if hold_seconds is not None:
+                # 処理時間の移動平均（Retry-After の目安に使う）
+                self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * hold_seconds
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """再試行までの目安秒数"""
+        with self._cond:
+            waiting = len(self._queue) + 1
+            parallel = max(self._in_flight, 1)
+            return max(1, math.ceil(self._avg_hold_seconds * waiting / parallel))
+
+    def stats(self):
+        """監視用の統計値"""
+        with self._cond:
+            return {
+                'budget_bytes': self.budget_bytes,
+                'in_use_bytes': self._in_use_bytes,
+                'in_flight': self._in_flight,
+                'queue_depth': len(self._queue),
+                'max_queue': self.max_queue,
+                'peak_queue_depth': self._peak_queue_depth,
+                'admitted_total': self._admitted_total,
+                'rejected_total': self._rejected_total,
+                'timed_out_total': self._timed_out_total,
+                'avg_hold_seconds': round(self._avg_hold_seconds, 3)
+            }
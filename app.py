@@ -1,23 +1,62 @@
 from flask import Flask, render_template, request, jsonify, send_file
 import os
+import time
+import functools
+import multiprocessing
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import ClosingIterator
 from pptx import Presentation
 from pptx.util import Pt
-import re
 import json
 from io import BytesIO
+from keyword_scanner import (
+    DEFAULT_ENGINE, DEFAULT_SCOPES, ENGINES,
+    compile_keywords, find_keywords_in_presentation, parse_scopes, visit_scope_shapes
+)
+from admission import AdmissionController
+from chunked_upload import ChunkedUploadStore, UploadLimitExceeded, UploadNotFound
+from keyword_registry import KeywordRegistry
+from scan_worker import (
+    STATUS_ERROR, STATUS_OK, STATUS_TIMEOUT, STATUS_TOO_LARGE, ScanWorkerPool, WorkerBusy, estimate_parse_memory, is_retryable,
+    retry_with_raw_engine, scan_file
+)
+from parallel_scan import ParallelScanner
+from output_cache import OutputCache, file_digest
 
 app = Flask(__name__)
 
+CONFIG_FILE = 'config.json'
+
 # 設定ファイルを読み込む
 def load_config():
     """設定ファイルを読み込む"""
-    config_file = 'config.json'
+    config_file = CONFIG_FILE
     default_config = {
         'default_keywords': ['OldCompany', '旧社名', 'Old Company Name'],
         'default_replacement': 'NewCompany',
         'max_file_size_mb': 50,
-        'allowed_extensions': ['pptx', 'ppt']
+        'allowed_extensions': ['pptx', 'ppt'],
+        'default_scopes': list(DEFAULT_SCOPES),
+        'memory_budget_mb': 1024,
+        'memory_cost_factor': 6,
+        'max_queued_requests': 8,
+        'queue_timeout_sec': 30,
+        'upload_chunk_size_mb': 4,
+        'upload_concurrency': 4,
+        'upload_ttl_sec': 3600,
+        'upload_max_pending_mb': 2048,
+        'file_time_limit_sec': 120,
+        'file_memory_limit_mb': 2048,
+        'file_inprocess_max_mb': 0,
+        'retry_with_raw_engine': True,
+        'scan_workers': 2,
+        'parallel_scan_workers': 0,
+        'parallel_scan_min_parts': 200,
+        'parallel_scan_min_mb': 1,
+        'parallel_scan_plan_max_mb': 16,
+        'output_cache_dir': 'output_cache',
+        'output_cache_mb': 512,
+        'max_client_keyword_sets': 100
     }
     
     if os.path.exists(config_file):
@@ -31,6 +70,11 @@ def load_config():
 
 config = load_config()
 
+# キーワードセット（config.json の更新を自動で反映する）
+# アップロード先・メモリ予算などの起動時の設定は再起動まで変わらない
+keyword_registry = KeywordRegistry(CONFIG_FILE, config,
+                                   max_client_sets=config.get('max_client_keyword_sets', 100))
+
 # 設定
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = set(config['allowed_extensions'])
@@ -42,6 +86,71 @@ if not os.path.exists(UPLOAD_FOLDER):
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
+# 分割アップロード（チャンクごとのリクエストは MAX_CONTENT_LENGTH の範囲内に収まる）
+upload_store = ChunkedUploadStore(
+    os.path.join(UPLOAD_FOLDER, 'chunked'),
+    chunk_size=int(config.get('upload_chunk_size_mb', 4) * 1024 * 1024),
+    max_file_size=MAX_FILE_SIZE,
+    ttl=config.get('upload_ttl_sec', 3600),
+    max_total_size=int(config.get('upload_max_pending_mb', 2048) * 1024 * 1024)
+)
+
+# アドミッション制御
+# 解析済みの Presentation と BytesIO のコピーを保持するため、
+# アップロードサイズ × memory_cost_factor をリクエストのメモリ使用量とみなす
+MEMORY_COST_FACTOR = config.get('memory_cost_factor', 6)
+admission = AdmissionController(
+    budget_bytes=config.get('memory_budget_mb', 1024) * 1024 * 1024,
+    max_queue=config.get('max_queued_requests', 8),
+    queue_timeout=config.get('queue_timeout_sec', 30)
+)
+
+# ファイル単位の処理予算（時間・メモリ）
+# 検出はワーカープロセスで行い、予算を超えたファイルはワーカーごと打ち切る
+# （file_inprocess_max_mb を指定すると、見積もりがそれ以下のファイルは時間の上限なしでプロセスを使わずに検出する）
+FILE_TIME_LIMIT = config.get('file_time_limit_sec', 120)
+FILE_MEMORY_LIMIT = int(config.get('file_memory_limit_mb', 2048) * 1024 * 1024)
+scan_workers = ScanWorkerPool(
+    size=config.get('scan_workers', 2),
+    time_limit=FILE_TIME_LIMIT,
+    memory_limit=FILE_MEMORY_LIMIT,
+    inprocess_limit=int(config.get('file_inprocess_max_mb', 0) * 1024 * 1024),
+    acquire_timeout=config.get('queue_timeout_sec', 30)
+)
+RETRY_WITH_RAW_ENGINE = config.get('retry_with_raw_engine', True)
+
+# 1ファイル内の並列検出（パート数の多い巨大なデッキのみ）
+# パートをチャンクに分けてワーカープロセスで検査する（parallel_scan_workers: 0 で CPU 数、1 で無効）
+parallel_scanner = ParallelScanner(
+    workers=config.get('parallel_scan_workers', 0),
+    min_parts=config.get('parallel_scan_min_parts', 200),
+    min_bytes=int(config.get('parallel_scan_min_mb', 1) * 1024 * 1024),
+    plan_max_bytes=int(config.get('parallel_scan_plan_max_mb', 16) * 1024 * 1024)
+)
+
+# 置換結果のキャッシュ（output_cache_mb: 0 で無効）
+OUTPUT_CACHE_BYTES = int(config.get('output_cache_mb', 512) * 1024 * 1024)
+output_cache = OutputCache(config.get('output_cache_dir', 'output_cache'), OUTPUT_CACHE_BYTES) \
+    if OUTPUT_CACHE_BYTES > 0 else None
+
+
+def check_parse_memory(file_path):
+    """python-pptx で読み込む前に解析メモリの見積もりを確認
+    上限（file_memory_limit_mb）を超える場合はエラーメッセージ、収まる場合は None を返す"""
+    estimate = estimate_parse_memory(file_path)
+    if FILE_MEMORY_LIMIT and estimate > FILE_MEMORY_LIMIT:
+        return (f'解析に必要なメモリの見積もり（{estimate // (1024 * 1024)} MB）が'
+                f'上限（{FILE_MEMORY_LIMIT // (1024 * 1024)} MB）を超えています')
+    return None
+
+
+def busy_response():
+    """混雑時のレスポンス（503）"""
+    response = jsonify({'error': 'サーバーが混雑しています。しばらくしてから再度お試しください'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(admission.retry_after())
+    return response
+
 
 def allowed_file(filename):
     """ファイルが許可されている拡張子かチェック"""
@@ -83,83 +192,137 @@ def get_all_files_recursive(file_path, recursive=False):
     return files_list
 
 
-def find_keywords_in_presentation(prs, keywords):
-    """プレゼンテーション内のキーワードを検出 (OR条件)
-    通常スライドとマスタースライドの両方をチェック"""
-    results = []
+def estimate_request_memory():
+    """アップロードサイズからリクエストのメモリ使用量を見積もる"""
+    content_length = request.content_length or MAX_FILE_SIZE
+    upload_bytes = min(content_length, MAX_FILE_SIZE)
     
-    # 通常スライドを処理
-    for slide_num, slide in enumerate(prs.slides, 1):
-        for shape_num, shape in enumerate(slide.shapes):
-            if hasattr(shape, "text") and shape.text.strip():
-                found_keywords = []
-                total_count = 0
-                
-                # すべてのキーワードを検查
-                for keyword in keywords:
-                    if keyword.lower() in shape.text.lower():
-                        count = shape.text.lower().count(keyword.lower())
-                        found_keywords.append(keyword)
-                        total_count += count
-                
-                # いずれかのキーワードが見つかった場合
-                if found_keywords:
-                    results.append({
-                        'slide': slide_num,
-                        'shape': shape_num,
-                        'text': shape.text,
-                        'keywords': found_keywords,
-                        'count': total_count,
-                        'is_master': False
-                    })
+    # 分割アップロード済みのファイルを参照するリクエストは本文が小さいため、参照先のサイズで見積もる
+    # （multipart の場合に request.form を参照すると本文全体を解析してしまうため対象外）
+    if request.mimetype != 'multipart/form-data':
+        upload_bytes = max(upload_bytes, upload_store.total_size(get_request_upload_ids()))
     
-    # マスタースライドを処理（複数のマスターグループに対応）
+    return upload_bytes * MEMORY_COST_FACTOR
+
+
+def admission_controlled(view):
+    """メモリ予算を確保してから処理するデコレータ
+    予算が空くまで待機し、待ち行列が一杯の場合は 503 を返す"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        cost = admission.acquire(estimate_request_memory())
+        if cost is None:
+            return busy_response()
+        
+        started = time.monotonic()
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            admission.release(cost, time.monotonic() - started)
+            raise
+        
+        # ダウンロードの送信が終わるまで BytesIO を保持しているため、レスポンス終了時に解放
+        def release():
+            admission.release(cost, time.monotonic() - started)
+        
+        if response.direct_passthrough:
+            # send_file のレスポンスは close 時のコールバックが呼ばれないため、本体をラップする
+            response.response = ClosingIterator(response.response, release)
+        else:
+            response.call_on_close(release)
+        return response
+    
+    return wrapper
+
+
+def get_request_upload_ids():
+    """リクエストから分割アップロード済みファイルのIDリストを取得"""
+    upload_ids_json = request.form.get('upload_ids', '')
+    if not upload_ids_json:
+        return []
     try:
-        for master_group_num, slide_master in enumerate(prs.slide_masters):
-            for layout_num, layout in enumerate(slide_master.slide_layouts):
-                for shape_num, shape in enumerate(layout.shapes):
-                    if hasattr(shape, "text") and shape.text.strip():
-                        found_keywords = []
-                        total_count = 0
-                        
-                        for keyword in keywords:
-                            if keyword.lower() in shape.text.lower():
-                                count = shape.text.lower().count(keyword.lower())
-                                found_keywords.append(keyword)
-                                total_count += count
-                        
-                        if found_keywords:
-                            results.append({
-                                'slide': f'Master Group {master_group_num + 1}, Layout {layout_num + 1}',
-                                'shape': shape_num,
-                                'text': shape.text,
-                                'keywords': found_keywords,
-                                'count': total_count,
-                                'is_master': True
-                            })
-    except Exception as e:
-        print(f"マスタースライド処理エラー: {str(e)}")
+        upload_ids = json.loads(upload_ids_json)
+    except json.JSONDecodeError:
+        upload_ids = upload_ids_json.split(',')
+    if not isinstance(upload_ids, list):
+        upload_ids = [upload_ids]
+    return [str(upload_id).strip() for upload_id in upload_ids if str(upload_id).strip()]
+
+
+def get_uploaded_paths(upload_ids):
+    """分割アップロード済みファイルのパスを取得（未完了・期限切れの場合は例外）
+    再利用できるよう、処理後もクリーンアップの対象にはしない"""
+    return [upload_store.completed_path(upload_id) for upload_id in upload_ids]
+
+
+def get_request_scopes():
+    """リクエストから検査対象（スコープ）を取得
+    未指定の場合は設定ファイルの default_scopes を使用"""
+    return parse_scopes(request.form.get('scopes'),
+                        default=keyword_registry.config.get('default_scopes', DEFAULT_SCOPES))
+
+
+def get_request_keywords():
+    """リクエストからキーワードを取得し、(キーワードのリスト, キーワードセット or None) を返す
+    keyword_set（セットID）が指定された場合はそのセットを使用（見つからない場合は KeyError）"""
+    set_id = request.form.get('keyword_set', '').strip()
+    if set_id:
+        keyword_set = keyword_registry.get(set_id)
+        return list(keyword_set.keywords), keyword_set
     
-    return results
+    keywords_json = request.form.get('keywords', '[]')
+    try:
+        keywords = json.loads(keywords_json)
+    except json.JSONDecodeError:
+        keywords = [keywords_json] if keywords_json else []
+    return keywords, None
+
+
+def get_output_cache_key(files_to_process, keywords, action, new_keyword, scopes):
+    """置換結果のキャッシュキー（入力ファイルの内容・キーワード・処理内容・検査対象から決まる）
+    複数ファイルの ZIP は格納するファイル名も出力に含まれるため、ファイル名もキーに加える"""
+    if len(files_to_process) == 1:
+        inputs = [file_digest(files_to_process[0])]
+    else:
+        inputs = [[os.path.basename(file_path), file_digest(file_path)] for file_path in files_to_process]
+    return output_cache.make_key(
+        inputs=inputs,
+        keywords=list(keywords),
+        action=action,
+        replacement=new_keyword if action != 'delete' else None,
+        scopes=list(scopes)
+    )
+
+
+def set_output_cache_headers(response, cache_status):
+    """キャッシュの利用結果（HIT / MISS）と累計のヒット・ミス数をレスポンスヘッダーに設定"""
+    if output_cache is None:
+        return
+    cache_stats = output_cache.stats()
+    response.headers['X-Output-Cache'] = cache_status
+    response.headers['X-Output-Cache-Hits'] = str(cache_stats['hits'])
+    response.headers['X-Output-Cache-Misses'] = str(cache_stats['misses'])
 
 
 def replace_text_in_shape(shape, keywords, new_text, is_delete=False):
     """シェイプ内のテキストを置換 (複数キーワード対応)"""
     if hasattr(shape, "text_frame"):
+        # キーワードの組み合わせごとにコンパイル済みの正規表現を使い回す
+        patterns = compile_keywords(tuple(keywords))
         for paragraph in shape.text_frame.paragraphs:
             # パラグラフレベルでテキスト全体を取得
             full_text = ''.join(run.text for run in paragraph.runs)
             
             # いずれかのキーワードがマッチするか確認
-            has_match = any(keyword.lower() in full_text.lower() for keyword in keywords)
+            lowered_text = full_text.lower()
+            has_match = any(lowered in lowered_text for _, lowered, _ in patterns)
             
             if not has_match:
                 continue
             
             # すべてのキーワードを置換（ループで処理）
             new_full_text = full_text
-            for keyword in keywords:
-                pattern = re.compile(re.escape(keyword), re.IGNORECASE)
+            for _, _, pattern in patterns:
                 new_full_text = pattern.sub(new_text, new_full_text)
             
             # すべてのrunをクリアして新しいテキストを設定
@@ -174,83 +337,86 @@ def replace_text_in_shape(shape, keywords, new_text, is_delete=False):
                 paragraph.text = new_full_text
 
 
-def process_presentation(prs, keywords, new_keyword=None, is_delete=False):
+def process_presentation(prs, keywords, new_keyword=None, is_delete=False, scopes=DEFAULT_SCOPES):
     """プレゼンテーション全体を処理 (複数キーワード対応)
-    通常スライドとマスタースライドの両方を処理"""
+    scopes で指定した検査対象（通常スライド・マスター・レイアウト・ノート）を処理"""
     modified_count = 0
+    patterns = compile_keywords(tuple(keywords))
     
-    # 通常スライドを処理
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text_frame"):
-                original_text = shape.text
+    def visit(scope, location, shape_num, shape):
+        nonlocal modified_count
+        if hasattr(shape, "text_frame"):
+            original_text = shape.text
+            
+            # いずれかのキーワードが含まれているか確認
+            lowered_text = original_text.lower()
+            has_keyword = any(lowered in lowered_text for _, lowered, _ in patterns)
+            
+            if has_keyword:
+                # 置換先のテキストを決定
+                replacement_text = '' if is_delete else (new_keyword or keywords[0])
                 
-                # いずれかのキーワードが含まれているか確認
-                has_keyword = any(kw.lower() in original_text.lower() for kw in keywords)
+                # 置換を実行
+                replace_text_in_shape(shape, keywords, replacement_text, is_delete=is_delete)
                 
-                if has_keyword:
-                    # 置換先のテキストを決定
-                    replacement_text = '' if is_delete else (new_keyword or keywords[0])
-                    
-                    # 置換を実行
-                    replace_text_in_shape(shape, keywords, replacement_text, is_delete=is_delete)
-                    
-                    # 変更があったかを確認
-                    if shape.text != original_text:
-                        modified_count += 1
-    
-    # マスタースライドを処理（複数のマスターグループに対応）
-    try:
-        for slide_master in prs.slide_masters:
-            for layout in slide_master.slide_layouts:
-                for shape in layout.shapes:
-                    if hasattr(shape, "text_frame"):
-                        original_text = shape.text
-                        
-                        has_keyword = any(kw.lower() in original_text.lower() for kw in keywords)
-                        
-                        if has_keyword:
-                            replacement_text = '' if is_delete else (new_keyword or keywords[0])
-                            replace_text_in_shape(shape, keywords, replacement_text, is_delete=is_delete)
-                            
-                            if shape.text != original_text:
-                                modified_count += 1
-    except Exception as e:
-        print(f"マスタースライド処理エラー: {str(e)}")
+                # 変更があったかを確認
+                if shape.text != original_text:
+                    modified_count += 1
     
+    # マスター・レイアウトでエラーが発生した場合はそのパートのみ飛ばす
+    visit_scope_shapes(prs, scopes, visit)
     return modified_count
 
 
 @app.route('/')
 def index():
     """メインページ"""
+    current_config = keyword_registry.config
     return render_template('index.html', 
-                          default_keywords=config['default_keywords'],
-                          default_replacement=config['default_replacement'])
+                          default_keywords=current_config['default_keywords'],
+                          default_replacement=current_config['default_replacement'],
+                          default_scopes=list(current_config.get('default_scopes', DEFAULT_SCOPES)),
+                          upload_concurrency=config.get('upload_concurrency', 4))
 
 
 @app.route('/api/detect', methods=['POST'])
+@admission_controlled
 def detect_keywords():
     """キーワード検出API"""
     files_to_cleanup = []
     try:
         files = request.files.getlist('file')  # 複数ファイルに対応
-        if not files or (len(files) == 1 and files[0].filename == ''):
+        upload_ids = get_request_upload_ids()  # 分割アップロード済みのファイル
+        if not upload_ids and (not files or (len(files) == 1 and files[0].filename == '')):
             return jsonify({'error': 'ファイルがアップロードされていません'}), 400
         
-        keywords_json = request.form.get('keywords', '[]')
         recursive = request.form.get('recursive', 'false').lower() == 'true'
         
         try:
-            keywords = json.loads(keywords_json)
-        except json.JSONDecodeError:
-            keywords = [keywords_json] if keywords_json else []
+            keywords, keyword_set = get_request_keywords()
+        except KeyError:
+            return jsonify({'error': 'キーワードセットが見つかりません'}), 400
         
         if not keywords or len(keywords) == 0:
             return jsonify({'error': 'キーワードを入力してください'}), 400
         
+        try:
+            scopes = get_request_scopes()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        engine = request.form.get('engine', DEFAULT_ENGINE)
+        if engine not in ENGINES:
+            return jsonify({'error': f'不明なエンジンです: {engine}'}), 400
+        
         # 複数ファイルを処理
-        files_to_process = []
+        try:
+            files_to_process = get_uploaded_paths(upload_ids)
+        except UploadNotFound:
+            return jsonify({'error': 'アップロードが見つかりません（期限切れの可能性があります）。再度アップロードしてください'}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         for file in files:
             if file.filename == '':
                 continue
@@ -273,33 +439,70 @@ def detect_keywords():
             cleanup_uploads(files_to_cleanup)
             return jsonify({'error': '処理するPPTXファイルが見つかりません'}), 400
         
+        retry_raw = request.form.get('retry_raw', str(RETRY_WITH_RAW_ENGINE)).lower() == 'true'
+        
+        # ファイルごとに処理予算の範囲で検出する
+        file_results = []
+        retries = []
+        try:
+            with scan_workers.worker() as worker:
+                for i, file_path in enumerate(files_to_process):
+                    parts = parallel_scanner.plan(file_path, scopes)
+                    if parts is not None:
+                        # 巨大なデッキはパートを分割して並列に検査する（結果は raw エンジンと同じ）
+                        result = parallel_scanner.scan_file(file_path, parts, keywords, timeout=worker.time_limit)
+                    else:
+                        result = scan_file(worker, file_path, keywords, scopes, engine)
+                    if retry_raw and is_retryable(result):
+                        # 他のファイルを待たせないよう、打ち切ったファイルは最後に raw エンジンで再検査する
+                        retries.append(i)
+                    file_results.append(result)
+                
+                for i in retries:
+                    file_results[i] = retry_with_raw_engine(worker, files_to_process[i], keywords, scopes,
+                                                            file_results[i])
+        except WorkerBusy:
+            cleanup_uploads(files_to_cleanup)
+            return busy_response()
+        
         # 全ファイルの結果を集約
         all_results = []
         total_count = 0
         total_affected_slides = 0
+        file_statuses = []
         
-        for file_path in files_to_process:
-            try:
-                prs = Presentation(file_path)
-                results = find_keywords_in_presentation(prs, keywords)
-                
-                # ファイル情報を結果に追加
-                for result in results:
-                    result['file'] = os.path.basename(file_path)
-                
-                all_results.extend(results)
-                total_count += sum(r['count'] for r in results)
-                total_affected_slides += len(results)
-            except Exception as e:
-                print(f"ファイル処理エラー {file_path}: {str(e)}")
+        for file_path, result in zip(files_to_process, file_results):
+            filename = os.path.basename(file_path)
+            file_statuses.append({
+                'file': filename,
+                'status': result['status'],
+                'engine': result['engine'],
+                'retried_from': result.get('retried_from'),
+                'parallel': 'chunks' in result,
+                'error': result['error']
+            })
+            if not result['success']:
+                print(f"ファイル処理エラー {file_path}: {result['error']}")
                 continue
+            
+            # ファイル情報を結果に追加
+            for detection in result['results']:
+                detection['file'] = filename
+            
+            all_results.extend(result['results'])
+            total_count += sum(r['count'] for r in result['results'])
+            total_affected_slides += len(result['results'])
         
         response = jsonify({
             'success': True,
             'keywords': keywords,
+            'keyword_set': keyword_set.set_id if keyword_set else None,
             'total_count': total_count,
             'affected_slides': total_affected_slides,
             'files_processed': len(files_to_process),
+            'scopes': list(scopes),
+            'engine': engine,
+            'file_statuses': file_statuses,
             'results': all_results
         })
         
@@ -313,23 +516,28 @@ def detect_keywords():
 
 
 @app.route('/api/replace', methods=['POST'])
+@admission_controlled
 def replace_keywords():
     """キーワード置換API"""
     files_to_cleanup = []
     try:
         files = request.files.getlist('file')  # 複数ファイルに対応
-        if not files or (len(files) == 1 and files[0].filename == ''):
+        upload_ids = get_request_upload_ids()  # 分割アップロード済みのファイル
+        if not upload_ids and (not files or (len(files) == 1 and files[0].filename == '')):
             return jsonify({'error': 'ファイルがアップロードされていません'}), 400
         
-        keywords_json = request.form.get('keywords', '[]')
         new_keyword = request.form.get('new_keyword', '').strip()
         action = request.form.get('action', 'replace')
         recursive = request.form.get('recursive', 'false').lower() == 'true'
         
         try:
-            keywords = json.loads(keywords_json)
-        except json.JSONDecodeError:
-            keywords = [keywords_json] if keywords_json else []
+            keywords, keyword_set = get_request_keywords()
+        except KeyError:
+            return jsonify({'error': 'キーワードセットが見つかりません'}), 400
+        
+        # キーワードセットの置換先は、置換先が指定されなかった場合に使用
+        if not new_keyword and keyword_set is not None and keyword_set.replacement:
+            new_keyword = keyword_set.replacement
         
         if not keywords or len(keywords) == 0:
             return jsonify({'error': 'キーワードを入力してください'}), 400
@@ -337,8 +545,19 @@ def replace_keywords():
         if action == 'replace' and not new_keyword:
             return jsonify({'error': '置換先のキーワードを入力してください'}), 400
         
+        try:
+            scopes = get_request_scopes()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # 複数ファイルを処理
-        files_to_process = []
+        try:
+            files_to_process = get_uploaded_paths(upload_ids)
+        except UploadNotFound:
+            return jsonify({'error': 'アップロードが見つかりません（期限切れの可能性があります）。再度アップロードしてください'}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         for file in files:
             if file.filename == '':
                 continue
@@ -361,20 +580,54 @@ def replace_keywords():
             cleanup_uploads(files_to_cleanup)
             return jsonify({'error': '処理するPPTXファイルが見つかりません'}), 400
         
+        # 同じ内容のリクエストはキャッシュ済みの出力をそのまま返す
+        cache_key = None
+        if output_cache is not None:
+            cache_key = get_output_cache_key(files_to_process, keywords, action, new_keyword, scopes)
+            cached = output_cache.open(cache_key)
+            if cached is not None:
+                if len(files_to_process) > 1:
+                    mimetype = 'application/zip'
+                    download_name = 'modified_presentations.zip'
+                else:
+                    mimetype = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+                    download_name = f"modified_{os.path.basename(files_to_process[0])}"
+                response = send_file(
+                    cached,
+                    mimetype=mimetype,
+                    as_attachment=True,
+                    download_name=download_name
+                )
+                if keyword_set is not None:
+                    response.headers['X-Keyword-Set'] = keyword_set.set_id
+                set_output_cache_headers(response, 'HIT')
+                cleanup_uploads(files_to_cleanup)
+                return response
+        
         # 複数ファイル処理の場合はZIPで返す
         if len(files_to_process) > 1:
             import zipfile
             zip_buffer = BytesIO()
+            failed = False
+            too_large = 0
             with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
                 for file_path in files_to_process:
                     try:
+                        error = check_parse_memory(file_path)
+                        if error is not None:
+                            # 解析メモリの上限を超えるファイルは読み込まずに除外する
+                            print(f"スキップ（サイズ超過） {file_path}: {error}")
+                            too_large += 1
+                            failed = True
+                            continue
                         prs = Presentation(file_path)
                         is_delete = (action == 'delete')
                         process_presentation(
                             prs, 
                             keywords, 
                             new_keyword if not is_delete else None,
-                            is_delete=is_delete
+                            is_delete=is_delete,
+                            scopes=scopes
                         )
                         
                         output = BytesIO()
@@ -385,8 +638,12 @@ def replace_keywords():
                         zip_file.writestr(result_filename, output.getvalue())
                     except Exception as e:
                         print(f"ファイル処理エラー {file_path}: {str(e)}")
+                        failed = True
                         continue
             
+            # 一部のファイルを処理できなかった結果はキャッシュしない（一時的なエラーの可能性がある）
+            if cache_key is not None and not failed:
+                output_cache.put(cache_key, zip_buffer.getvalue())
             zip_buffer.seek(0)
             response = send_file(
                 zip_buffer,
@@ -394,11 +651,20 @@ def replace_keywords():
                 as_attachment=True,
                 download_name='modified_presentations.zip'
             )
+            if keyword_set is not None:
+                response.headers['X-Keyword-Set'] = keyword_set.set_id
+            if too_large:
+                response.headers['X-Too-Large-Files'] = str(too_large)
+            set_output_cache_headers(response, 'MISS')
             cleanup_uploads(files_to_cleanup)
             return response
         else:
             # 単一ファイル処理
             file_path = files_to_process[0]
+            error = check_parse_memory(file_path)
+            if error is not None:
+                cleanup_uploads(files_to_cleanup)
+                return jsonify({'error': error, 'status': STATUS_TOO_LARGE}), 413
             prs = Presentation(file_path)
             
             is_delete = (action == 'delete')
@@ -406,11 +672,14 @@ def replace_keywords():
                 prs, 
                 keywords, 
                 new_keyword if not is_delete else None,
-                is_delete=is_delete
+                is_delete=is_delete,
+                scopes=scopes
             )
             
             output = BytesIO()
             prs.save(output)
+            if cache_key is not None:
+                output_cache.put(cache_key, output.getvalue())
             output.seek(0)
             
             result_filename = f"modified_{os.path.basename(file_path)}"
@@ -421,6 +690,9 @@ def replace_keywords():
                 as_attachment=True,
                 download_name=result_filename
             )
+            if keyword_set is not None:
+                response.headers['X-Keyword-Set'] = keyword_set.set_id
+            set_output_cache_headers(response, 'MISS')
             cleanup_uploads(files_to_cleanup)
             return response
     
@@ -430,23 +702,28 @@ def replace_keywords():
 
 
 @app.route('/api/preview', methods=['POST'])
+@admission_controlled
 def preview_results():
     """置換前後のプレビューAPI"""
     files_to_cleanup = []
     try:
         files = request.files.getlist('file')  # 複数ファイルに対応
-        if not files or (len(files) == 1 and files[0].filename == ''):
+        upload_ids = get_request_upload_ids()  # 分割アップロード済みのファイル
+        if not upload_ids and (not files or (len(files) == 1 and files[0].filename == '')):
             return jsonify({'error': 'ファイルがアップロードされていません'}), 400
         
-        keywords_json = request.form.get('keywords', '[]')
         new_keyword = request.form.get('new_keyword', '').strip()
         action = request.form.get('action', 'replace')
         recursive = request.form.get('recursive', 'false').lower() == 'true'
         
         try:
-            keywords = json.loads(keywords_json)
-        except json.JSONDecodeError:
-            keywords = [keywords_json] if keywords_json else []
+            keywords, keyword_set = get_request_keywords()
+        except KeyError:
+            return jsonify({'error': 'キーワードセットが見つかりません'}), 400
+        
+        # キーワードセットの置換先は、置換先が指定されなかった場合に使用
+        if not new_keyword and keyword_set is not None and keyword_set.replacement:
+            new_keyword = keyword_set.replacement
         
         if not keywords or len(keywords) == 0:
             return jsonify({'error': 'キーワードを入力してください'}), 400
@@ -454,8 +731,19 @@ def preview_results():
         if action == 'replace' and not new_keyword:
             return jsonify({'error': '置換先のキーワードを入力してください'}), 400
         
+        try:
+            scopes = get_request_scopes()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # 複数ファイルを処理
-        files_to_process = []
+        try:
+            files_to_process = get_uploaded_paths(upload_ids)
+        except UploadNotFound:
+            return jsonify({'error': 'アップロードが見つかりません（期限切れの可能性があります）。再度アップロードしてください'}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         for file in files:
             if file.filename == '':
                 continue
@@ -484,13 +772,46 @@ def preview_results():
         total_after_count = 0
         total_after_slides = 0
         total_modified = 0
+        file_statuses = []
         
         for file_path in files_to_process:
             try:
-                prs = Presentation(file_path)
+                error = check_parse_memory(file_path)
+                if error is not None:
+                    # 解析メモリの上限を超えるファイルは読み込まずに除外する
+                    print(f"スキップ（サイズ超過） {file_path}: {error}")
+                    file_statuses.append({'file': os.path.basename(file_path), 'status': STATUS_TOO_LARGE,
+                                          'error': error})
+                    continue
+                
+                # 巨大なデッキは処理前の検出を並列に開始し、その間に python-pptx で読み込む
+                parts = parallel_scanner.plan(file_path, scopes)
+                pending = parallel_scanner.scan_async(file_path, parts, keywords) if parts is not None else None
+                
+                try:
+                    prs = Presentation(file_path)
+                except Exception:
+                    # 読み込めないファイルの並列検出は結果を待たずに打ち切る
+                    if pending is not None:
+                        pending.cancel()
+                    raise
                 
                 # 処理前の検出
-                before_results = find_keywords_in_presentation(prs, keywords)
+                before_results = None
+                if pending is not None:
+                    try:
+                        before_results = pending.get(FILE_TIME_LIMIT or None)
+                    except multiprocessing.TimeoutError:
+                        error = f'処理時間の上限（{FILE_TIME_LIMIT:g} 秒）を超えました'
+                        print(f"ファイル処理エラー {file_path}: {error}")
+                        file_statuses.append({'file': os.path.basename(file_path), 'status': STATUS_TIMEOUT,
+                                              'error': error})
+                        continue
+                    except Exception as e:
+                        # 並列検出に失敗した場合は読み込み済みのデッキで検出する
+                        print(f"並列検出エラー {file_path}: {str(e)}")
+                if before_results is None:
+                    before_results = find_keywords_in_presentation(prs, keywords, scopes)
                 before_count = sum(r['count'] for r in before_results)
                 
                 # 処理を実行（プレビューのみ）
@@ -499,11 +820,12 @@ def preview_results():
                     prs, 
                     keywords, 
                     new_keyword if not is_delete else None,
-                    is_delete=is_delete
+                    is_delete=is_delete,
+                    scopes=scopes
                 )
                 
                 # 処理後の検出
-                after_results = find_keywords_in_presentation(prs, keywords)
+                after_results = find_keywords_in_presentation(prs, keywords, scopes)
                 after_count = sum(r['count'] for r in after_results)
                 
                 total_before_count += before_count
@@ -511,8 +833,10 @@ def preview_results():
                 total_after_count += after_count
                 total_after_slides += len(after_results)
                 total_modified += modified_count
+                file_statuses.append({'file': os.path.basename(file_path), 'status': STATUS_OK, 'error': None})
             except Exception as e:
                 print(f"ファイル処理エラー {file_path}: {str(e)}")
+                file_statuses.append({'file': os.path.basename(file_path), 'status': STATUS_ERROR, 'error': str(e)})
                 continue
         
         response = jsonify({
@@ -527,7 +851,10 @@ def preview_results():
             },
             'modified_shapes': total_modified,
             'files_processed': len(files_to_process),
-            'action': action
+            'scopes': list(scopes),
+            'keyword_set': keyword_set.set_id if keyword_set else None,
+            'action': action,
+            'file_statuses': file_statuses
         })
         
         cleanup_uploads(files_to_cleanup)
@@ -538,5 +865,97 @@ def preview_results():
         return jsonify({'error': f'エラーが発生しました: {str(e)}'}), 500
 
 
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """分割アップロード開始API
+    JSON: {"filename": "...", "size": バイト数}"""
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    
+    if not isinstance(filename, str):
+        return jsonify({'error': 'ファイル名が不正です'}), 400
+    if filename.startswith('.') or not allowed_file(filename):
+        return jsonify({'error': f'"{filename}" はPPTX/PPT形式ではありません'}), 400
+    
+    try:
+        upload = upload_store.create(filename, data.get('size'))
+    except UploadLimitExceeded:
+        response = jsonify({'error': '保持中のアップロードが上限に達しています。しばらくしてから再度お試しください'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    print(f"分割アップロード開始: {upload['filename']} ({upload['total_chunks']} チャンク)")
+    return jsonify(upload), 201
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """分割アップロード状態API（再開時に受信済みチャンクを確認）"""
+    try:
+        return jsonify(upload_store.status(upload_id))
+    except UploadNotFound:
+        return jsonify({'error': 'アップロードが見つかりません'}), 404
+
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """チャンク受信API（本文はチャンクのバイナリ）"""
+    try:
+        upload = upload_store.write_chunk(upload_id, index, request.get_data(cache=False))
+    except UploadNotFound:
+        return jsonify({'error': 'アップロードが見つかりません'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if upload['complete']:
+        print(f"分割アップロード完了: {upload['filename']}")
+    return jsonify(upload)
+
+
+@app.route('/api/status', methods=['GET'])
+def status():
+    """監視用API（アドミッション制御の待ち行列・拒否数など）"""
+    return jsonify({
+        'success': True,
+        'admission': admission.stats(),
+        'keyword_registry': keyword_registry.stats(),
+        'output_cache': output_cache.stats() if output_cache is not None else None
+    })
+
+
+@app.route('/api/keyword-sets', methods=['GET'])
+def list_keyword_sets():
+    """キーワードセットの一覧（最新バージョン）"""
+    return jsonify({
+        'success': True,
+        'keyword_sets': [keyword_set.to_dict() for keyword_set in keyword_registry.list_sets()]
+    })
+
+
+@app.route('/api/keyword-sets', methods=['POST'])
+def register_keyword_set():
+    """キーワードセットを登録（同じ名前で内容が異なる場合は新しいバージョンになる）"""
+    data = request.get_json(silent=True) or {}
+    try:
+        keyword_set = keyword_registry.register(data.get('name'), data.get('keywords'),
+                                                data.get('replacement'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'keyword_set': keyword_set.to_dict()}), 201
+
+
+@app.route('/api/keyword-sets/<set_id>', methods=['GET'])
+def get_keyword_set(set_id):
+    """キーワードセットを取得（名前 または 名前@バージョン）"""
+    try:
+        keyword_set = keyword_registry.get(set_id)
+    except KeyError:
+        return jsonify({'error': 'キーワードセットが見つかりません'}), 404
+    return jsonify({'success': True, 'keyword_set': keyword_set.to_dict()})
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,213 @@
+"""
+分割アップロード（チャンクアップロード）
+ブラウザからファイルを一定サイズのチャンクに分けて並列に送信し、サーバー側で1つのファイルに組み立てます。
+受信済みチャンクを記録しているため、通信が切れた場合も未受信のチャンクだけを再送して再開できます。
+
+保存先:
+  <base_dir>/<upload_id>/meta.json       アップロード情報と受信済みチャンク
+  <base_dir>/<upload_id>/<ファイル名>     組み立て中／組み立て済みのファイル
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadNotFound(KeyError):
+    """指定されたアップロードが存在しない（期限切れを含む）"""
+
+
+class UploadLimitExceeded(Exception):
+    """保持中のアップロードの合計サイズが上限に達している"""
+
+
+class ChunkedUploadStore:
+    """分割アップロードの受け付けと組み立てを管理する
+
+    base_dir: 保存先ディレクトリ
+    chunk_size: チャンクサイズ（バイト）
+    max_file_size: 1ファイルの最大サイズ（バイト）
+    ttl: 最終更新からこの秒数を過ぎたアップロードは削除する
+    max_total_size: 保持中（組み立て中・組み立て済み）のアップロードの合計サイズの上限（バイト。None で無制限）
+    """
+
+    def __init__(self, base_dir, chunk_size, max_file_size, ttl, max_total_size=None):
+        self.base_dir = base_dir
+        self.chunk_size = chunk_size
+        self.max_file_size = max_file_size
+        self.ttl = ttl
+        self.max_total_size = max_total_size
+        self._lock = threading.Lock()
+
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+
+    def _upload_dir(self, upload_id):
+        if not _UPLOAD_ID_PATTERN.match(upload_id or ''):
+            raise UploadNotFound(upload_id)
+        return os.path.join(self.base_dir, upload_id)
+
+    def _read_meta(self, upload_id):
+        meta_path = os.path.join(self._upload_dir(upload_id), 'meta.json')
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadNotFound(upload_id)
+
+    def _write_meta(self, meta):
+        upload_dir = self._upload_dir(meta['upload_id'])
+        tmp_path = os.path.join(upload_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(upload_dir, 'meta.json'))
+
+    @staticmethod
+    def _summary(meta):
+        """クライアントに返すアップロード状態"""
+        return {
+            'upload_id': meta['upload_id'],
+            'filename': meta['filename'],
+            'size': meta['size'],
+            'chunk_size': meta['chunk_size'],
+            'total_chunks': meta['total_chunks'],
+            'received': sorted(meta['received']),
+            'complete': len(meta['received']) == meta['total_chunks']
+        }
+
+    def create(self, filename, size):
+        """アップロードを開始して状態を返す"""
+        self.purge_expired()
+
+        if not isinstance(filename, str):
+            raise ValueError('ファイル名が不正です')
+        filename = secure_filename(filename)
+        if not filename:
+            raise ValueError('ファイル名が不正です')
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise ValueError('ファイルサイズが不正です')
+        if size > self.max_file_size:
+            raise ValueError(f'ファイルサイズが上限（{self.max_file_size // (1024 * 1024)} MB）を超えています')
+
+        upload_id = uuid.uuid4().hex
+        upload_dir = self._upload_dir(upload_id)
+
+        # 事前に確保するディスク容量が上限を超えないよう、合計サイズの確認から作成までを排他する
+        with self._lock:
+            if self.max_total_size is not None and self._pending_size() + size > self.max_total_size:
+                raise UploadLimitExceeded(upload_id)
+            os.makedirs(upload_dir)
+            # 受信したチャンクをオフセット位置に直接書き込むため、あらかじめ全体のサイズを確保
+            with open(os.path.join(upload_dir, filename), 'wb') as f:
+                f.truncate(size)
+
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'size': size,
+            'chunk_size': self.chunk_size,
+            'total_chunks': max(1, -(-size // self.chunk_size)),
+            'received': []
+        }
+        if size == 0:
+            meta['received'] = [0]
+        self._write_meta(meta)
+        return self._summary(meta)
+
+    def status(self, upload_id):
+        """アップロード状態を返す（再開時に未受信チャンクを確認するため）"""
+        return self._summary(self._read_meta(upload_id))
+
+    def write_chunk(self, upload_id, index, data):
+        """チャンクを書き込んで状態を返す"""
+        meta = self._read_meta(upload_id)
+
+        if index < 0 or index >= meta['total_chunks']:
+            raise ValueError(f'チャンク番号が範囲外です: {index}')
+
+        offset = index * meta['chunk_size']
+        expected = min(meta['chunk_size'], meta['size'] - offset)
+        if len(data) != expected:
+            raise ValueError(f'チャンクサイズが不正です（期待値: {expected} バイト、受信: {len(data)} バイト）')
+
+        file_path = os.path.join(self._upload_dir(upload_id), meta['filename'])
+        with open(file_path, 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+
+        # 並列に届くチャンクの記録が競合しないようにメタ情報の更新は排他する
+        with self._lock:
+            meta = self._read_meta(upload_id)
+            if index not in meta['received']:
+                meta['received'].append(index)
+            self._write_meta(meta)
+
+        return self._summary(meta)
+
+    def completed_path(self, upload_id):
+        """組み立て済みファイルのパスを返す（未完了の場合は ValueError）"""
+        meta = self._read_meta(upload_id)
+        if len(meta['received']) != meta['total_chunks']:
+            raise ValueError(f"アップロードが完了していません: {meta['filename']}")
+
+        # 使用中のアップロードが期限切れで削除されないよう最終更新日時を更新
+        upload_dir = self._upload_dir(upload_id)
+        os.utime(os.path.join(upload_dir, 'meta.json'))
+        return os.path.join(upload_dir, meta['filename'])
+
+    def _pending_size(self):
+        """保持中のアップロードの合計サイズ（メタ情報の書き込み前のものはファイルサイズで数える）"""
+        total = 0
+        try:
+            entries = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            upload_dir = os.path.join(self.base_dir, entry)
+            try:
+                with open(os.path.join(upload_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                    total += json.load(f)['size']
+            except (OSError, ValueError, KeyError):
+                try:
+                    total += sum(os.path.getsize(os.path.join(upload_dir, name))
+                                 for name in os.listdir(upload_dir))
+                except OSError:
+                    continue
+        return total
+
+    def total_size(self, upload_ids):
+        """指定アップロードの合計サイズ（存在しないものは無視）"""
+        total = 0
+        for upload_id in upload_ids:
+            try:
+                total += self._read_meta(upload_id)['size']
+            except UploadNotFound:
+                continue
+        return total
+
+    def purge_expired(self):
+        """期限切れのアップロードを削除"""
+        now = time.time()
+        try:
+            entries = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            return
+
+        for entry in entries:
+            upload_dir = os.path.join(self.base_dir, entry)
+            meta_path = os.path.join(upload_dir, 'meta.json')
+            try:
+                if now - os.path.getmtime(meta_path) > self.ttl:
+                    shutil.rmtree(upload_dir, ignore_errors=True)
+                    print(f"期限切れのアップロードを削除: {entry}")
+            except OSError:
+                continue
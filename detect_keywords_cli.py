@@ -6,10 +6,19 @@ PowerPoint キーワード検出ツール（CLI版）
 import os
 import sys
 import json
+import time
+import queue
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from pptx import Presentation
 from datetime import datetime
+import scan_daemon
+from parallel_scan import ParallelScanner
+from keyword_scanner import DEFAULT_ENGINE, DEFAULT_SCOPES, ENGINES, SCOPES, parse_scopes
+from scan_worker import (
+    RETRYABLE_STATUSES, STATUS_LABELS, ScanWorker, ScanWorkerPool, is_retryable, retry_with_raw_engine, scan_file
+)
 
 
 def load_config():
@@ -17,7 +26,17 @@ def load_config():
     config_file = 'config.json'
     default_config = {
         'default_keywords': ['OldCompany', '旧社名', 'Old Company Name'],
-        'allowed_extensions': ['pptx', 'ppt']
+        'allowed_extensions': ['pptx', 'ppt'],
+        'default_scopes': list(DEFAULT_SCOPES),
+        'file_time_limit_sec': 120,
+        'file_memory_limit_mb': 2048,
+        'file_inprocess_max_mb': 0,
+        'retry_with_raw_engine': True,
+        'scan_workers': 2,
+        'parallel_scan_workers': 0,
+        'parallel_scan_min_parts': 200,
+        'parallel_scan_min_mb': 1,
+        'parallel_scan_plan_max_mb': 16
     }
     
     if os.path.exists(config_file):
@@ -31,115 +50,118 @@ def load_config():
     return default_config
 
 
-def find_ppt_files(directory, recursive=True):
-    """指定ディレクトリ内のPPTファイルを検索"""
-    ppt_files = []
+PPT_EXTENSIONS = ('.pptx', '.ppt')
+WALK_WORKERS = 8  # ディレクトリ列挙の並列数（NAS など遅いストレージ向け）
+
+
+def check_search_directory(directory, log=print):
+    """検索対象のディレクトリが存在するか確認"""
     path = Path(directory)
     
     if not path.exists():
-        print(f"エラー: ディレクトリが存在しません: {directory}")
-        return []
+        log(f"エラー: ディレクトリが存在しません: {directory}")
+        return False
     
     if not path.is_dir():
-        print(f"エラー: 指定されたパスはディレクトリではありません: {directory}")
-        return []
+        log(f"エラー: 指定されたパスはディレクトリではありません: {directory}")
+        return False
     
-    try:
-        if recursive:
-            # 再帰的に検索
-            for ext in ['*.pptx', '*.ppt']:
-                ppt_files.extend(path.rglob(ext))
-        else:
-            # 直下のみ検索
-            for ext in ['*.pptx', '*.ppt']:
-                ppt_files.extend(path.glob(ext))
-        
-        # 隠しファイルを除外
-        ppt_files = [f for f in ppt_files if not any(part.startswith('.') for part in f.parts)]
-        
-    except Exception as e:
-        print(f"エラー: ファイル検索中にエラーが発生しました: {str(e)}")
-        return []
+    return True
+
+
+def iter_ppt_files(directory, recursive=True, log=print, workers=WALK_WORKERS):
+    """指定ディレクトリ内のPPTファイルを見つけた順に返す（順不同）
+    サブディレクトリはスレッドプールで並行に列挙し、隠しディレクトリ（.で始まる）はたどらない"""
+    found = queue.Queue()
+    done = object()
+    stopped = threading.Event()
+    lock = threading.Lock()
+    pending = [0]  # 列挙中・列挙待ちのディレクトリ数
     
-    return sorted(ppt_files)
-
-
-def find_keywords_in_presentation(prs, keywords):
-    """プレゼンテーション内のキーワードを検出
-    通常スライドとマスタースライドの両方をチェック"""
-    results = []
-    
-    # 通常スライドを処理
-    for slide_num, slide in enumerate(prs.slides, 1):
-        for shape_num, shape in enumerate(slide.shapes):
-            if hasattr(shape, "text") and shape.text.strip():
-                found_keywords = []
-                total_count = 0
-                
-                # すべてのキーワードを検査
-                for keyword in keywords:
-                    if keyword.lower() in shape.text.lower():
-                        count = shape.text.lower().count(keyword.lower())
-                        found_keywords.append(keyword)
-                        total_count += count
-                
-                # いずれかのキーワードが見つかった場合
-                if found_keywords:
-                    results.append({
-                        'slide': slide_num,
-                        'shape': shape_num,
-                        'text': shape.text[:100],  # 最初の100文字のみ
-                        'keywords': found_keywords,
-                        'count': total_count,
-                        'is_master': False
-                    })
-    
-    # マスタースライドを処理（複数のマスターグループに対応）
+    def scan_directory(dir_path, executor):
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if stopped.is_set():
+                        break
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if recursive:
+                            submit(entry.path, executor)
+                    elif entry.name.lower().endswith(PPT_EXTENSIONS):
+                        found.put(Path(entry.path))
+        except OSError as e:
+            found.put(f"警告: ディレクトリを読み込めません: {dir_path} ({str(e)})")
+        finally:
+            with lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                found.put(done)
+    
+    def submit(dir_path, executor):
+        if stopped.is_set():
+            return
+        with lock:
+            pending[0] += 1
+        executor.submit(scan_directory, dir_path, executor)
+    
+    executor = ThreadPoolExecutor(max_workers=workers if recursive else 1)
     try:
-        for master_group_num, slide_master in enumerate(prs.slide_masters):
-            for layout_num, layout in enumerate(slide_master.slide_layouts):
-                for shape_num, shape in enumerate(layout.shapes):
-                    if hasattr(shape, "text") and shape.text.strip():
-                        found_keywords = []
-                        total_count = 0
-                        
-                        for keyword in keywords:
-                            if keyword.lower() in shape.text.lower():
-                                count = shape.text.lower().count(keyword.lower())
-                                found_keywords.append(keyword)
-                                total_count += count
-                        
-                        if found_keywords:
-                            results.append({
-                                'slide': f'Master Group {master_group_num + 1}, Layout {layout_num + 1}',
-                                'shape': shape_num,
-                                'text': shape.text[:100],  # 最初の100文字のみ
-                                'keywords': found_keywords,
-                                'count': total_count,
-                                'is_master': True
-                            })
-    except Exception as e:
-        print(f"    警告: マスタースライド処理エラー: {str(e)}")
+        submit(str(directory), executor)
+        while True:
+            item = found.get()
+            if item is done:
+                break
+            if isinstance(item, str):
+                log(item)
+            else:
+                yield item
+    finally:
+        # 途中で打ち切られた場合は残りの列挙を止める
+        stopped.set()
+        executor.shutdown(wait=False)
+
+
+def find_ppt_files(directory, recursive=True, log=print):
+    """指定ディレクトリ内のPPTファイルを検索（パス順に並べて返す）
+    log: メッセージの出力先（常駐モードではクライアントへ転送する）"""
+    if not check_search_directory(directory, log=log):
+        return []
     
-    return results
+    return sorted(iter_ppt_files(directory, recursive=recursive, log=log))
 
 
-def detect_keywords_in_file(file_path, keywords):
-    """1つのファイル内のキーワードを検出"""
-    try:
-        prs = Presentation(str(file_path))
-        results = find_keywords_in_presentation(prs, keywords)
-        return {
-            'success': True,
-            'results': results,
-            'error': None
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'results': [],
-            'error': str(e)
-        }
+def detect_keywords_in_file(file_path, keywords, scopes=DEFAULT_SCOPES, engine=DEFAULT_ENGINE, worker=None,
+                            profile=None, parallel=None, budget=None):
+    """1つのファイル内のキーワードを検出
+    engine が 'raw' の場合は指定スコープに必要なパートのみを読み込む
+    worker を指定した場合は処理予算 budget（(最大秒数, 最大メモリ)。省略時は worker の既定値）の範囲で検出する
+    profile を指定した場合は計測値を result['profile'] に記録する（scan_worker.run_detection を参照）
+    parallel（ParallelScanner）を指定した場合、巨大なデッキはパートを分割して並列に検出する"""
+    if worker is None:
+        worker = ScanWorker()
+    if budget is None:
+        budget = worker.budget
+    started = time.perf_counter()
+    parts = parallel.plan(file_path, scopes) if parallel is not None else None
+    if parts is not None:
+        # 並列検出は raw エンジンと同じ結果になる（関数ごとの計測値は記録しない）
+        result = parallel.scan_file(file_path, parts, keywords, timeout=budget[0])
+        if profile is not None:
+            result['profile'] = {}
+    else:
+        result = scan_file(worker, file_path, keywords, scopes, engine, profile=profile, budget=budget)
+    if profile is not None:
+        result['profile']['wall'] = time.perf_counter() - started
+    for detection in result['results']:
+        detection['text'] = detection['text'][:100]  # 最初の100文字のみ
+    return result
 
 
 def format_results_text(all_results, target_directory, show_all_files=False):
@@ -155,18 +177,27 @@ def format_results_text(all_results, target_directory, show_all_files=False):
         
         if file_result['success']:
             detection_count = len(file_result['results'])
+            if file_result.get('retried_from'):
+                # 打ち切り後に raw エンジンで再検査した場合は常に表示
+                label = STATUS_LABELS[file_result['retried_from']]
+                output.append(f"{file_path}\t{detection_count}\t(raw エンジンで再検査: {label})")
             # show_all_filesがTrueの場合は全ファイル、Falseの場合は検出があったファイルのみ
-            if show_all_files or detection_count > 0:
+            elif show_all_files or detection_count > 0:
                 output.append(f"{file_path}\t{detection_count}")
         else:
-            # エラーの場合は常に表示
-            output.append(f"{file_path}\t0\t(エラー: {file_result['error']})")
+            # エラー・打ち切りの場合は常に表示
+            label = STATUS_LABELS.get(file_result.get('status'), 'エラー')
+            output.append(f"{file_path}\t0\t({label}: {file_result['error']})")
     
     # サマリー情報
     output.append("")
     output.append("=" * 80)
     output.append(f"対象ディレクトリ: {target_directory}")
     output.append(f"検出ファイル数: {files_with_keywords}/{total_files}")
+    aborted_files = sum(1 for r in all_results
+                        if r.get('status') in RETRYABLE_STATUSES or r.get('retried_from'))
+    if aborted_files:
+        output.append(f"処理予算超過で打ち切ったファイル数: {aborted_files}")
     output.append(f"実施日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     output.append("=" * 80)
     
@@ -183,6 +214,293 @@ def save_results_to_file(content, output_file):
         print(f"\nエラー: ファイル保存に失敗しました: {str(e)}")
 
 
+def create_parallel_scanner(config, workers=None):
+    """巨大なデッキの並列検出（ワーカープロセスは必要になった時点で起動）"""
+    return ParallelScanner(
+        workers=config.get('parallel_scan_workers', 0) if workers is None else workers,
+        min_parts=config.get('parallel_scan_min_parts', 200),
+        min_bytes=int(config.get('parallel_scan_min_mb', 1) * 1024 * 1024),
+        plan_max_bytes=int(config.get('parallel_scan_plan_max_mb', 16) * 1024 * 1024)
+    )
+
+
+def create_worker_pool(config, size=1):
+    """処理予算付きの検出ワーカー（処理予算は検査ごとに指定する）"""
+    return ScanWorkerPool(size, inprocess_limit=int(config.get('file_inprocess_max_mb', 0) * 1024 * 1024))
+
+
+def scan_events(request, config, workers=None, parallel=None):
+    """検査の進行をイベント（辞書）として順に返す
+    通常モードと常駐モードで共通の処理。
+    workers（ScanWorkerPool）と parallel（ParallelScanner）は常駐モードで起動時に作成したものを使い回す
+    （省略時はこの検査のために作成し、終了時に停止する）。request の項目:
+      directory, keywords, recursive, scopes, engine
+      time_limit（秒）, memory_limit（MB）, retry_raw,
+      parallel_workers（省略時は設定ファイルの値。parallel を渡した場合は 1（並列化しない）のみ反映する）
+      profile（None または {'dump_dir': tracemalloc スナップショットの保存先 or None}）
+      cwd（常駐モードのみ。相対パスをクライアントの作業ディレクトリ基準で解決する）"""
+    keywords = request.get('keywords') or config['default_keywords']
+    scopes = parse_scopes(request.get('scopes'), default=config.get('default_scopes', DEFAULT_SCOPES))
+    engine = request.get('engine') or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"不明なエンジンです: {engine}")
+    
+    time_limit = request.get('time_limit')
+    if time_limit is None:
+        time_limit = config.get('file_time_limit_sec', 120)
+    memory_limit = request.get('memory_limit')
+    if memory_limit is None:
+        memory_limit = config.get('file_memory_limit_mb', 2048)
+    retry_raw = request.get('retry_raw')
+    if retry_raw is None:
+        retry_raw = config.get('retry_with_raw_engine', True)
+    parallel_workers = request.get('parallel_workers')
+    
+    yield {'event': 'start', 'keywords': list(keywords), 'scopes': list(scopes), 'engine': engine,
+           'time_limit': time_limit, 'memory_limit': memory_limit}
+    
+    directory = request['directory']
+    search_directory = os.path.join(request['cwd'], directory) if request.get('cwd') else directory
+    
+    profile = request.get('profile')
+    dump_dir = None
+    if profile is not None and profile.get('dump_dir'):
+        dump_dir = os.path.join(request.get('cwd') or '', profile['dump_dir'])
+        os.makedirs(dump_dir, exist_ok=True)
+    
+    def file_profile(index):
+        """プロファイル時の計測オプション（プロファイルしない場合は None）"""
+        if profile is None:
+            return None
+        snapshot_path = os.path.join(dump_dir, f"tracemalloc_{index:05d}.snapshot") if dump_dir else None
+        return {'snapshot_path': snapshot_path}
+    
+    # 1ファイルずつ処理予算の範囲で検出する（超過したファイルはワーカーごと打ち切る）
+    # 見積もりの小さいファイルはワーカープロセスを使わないため、プロセスは必要になった時点で起動する
+    budget = (time_limit, int(memory_limit * 1024 * 1024))
+    own_workers = workers is None
+    if own_workers:
+        workers = create_worker_pool(config)
+    # パート数の多い巨大なデッキは1ファイル内を並列に検出する
+    # 常駐モードでは起動時の並列数を使い、リクエストでは無効化（1）のみ指定できる
+    own_parallel = parallel is None
+    if own_parallel:
+        parallel = create_parallel_scanner(config, parallel_workers)
+    scan_parallel = None if parallel_workers == 1 else parallel
+    try:
+        with workers.worker() as worker:
+            yield from _scan_directory(search_directory, directory, request, keywords, scopes, engine,
+                                       budget, retry_raw, file_profile, worker, scan_parallel)
+    finally:
+        if own_workers:
+            workers.close()
+        if own_parallel:
+            parallel.close()
+
+
+def _scan_directory(search_directory, directory, request, keywords, scopes, engine, budget, retry_raw,
+                    file_profile, worker, parallel):
+    """scan_events の検査部分（借りたワーカーで1ファイルずつ検出する）"""
+    profiling = file_profile(0) is not None
+    if profiling:
+        # ライブラリの読み込みとワーカーの起動時間が計測値に含まれないよう先に済ませておく
+        # （小さなファイルは呼び出し元のプロセスで検出する）
+        import pptx  # noqa: F401
+        import lxml.etree  # noqa: F401
+        try:
+            worker.ensure_started()
+        except RuntimeError:
+            pass
+    
+    # PPTファイルを探しながら、見つかったものから順に検査する
+    messages = []
+    count = 0
+    retries = []
+    if check_search_directory(search_directory, log=messages.append):
+        for file_path in iter_ppt_files(search_directory, recursive=request.get('recursive', True),
+                                        log=messages.append):
+            for text in messages:
+                yield {'event': 'message', 'text': text}
+            messages.clear()
+            
+            count += 1
+            yield {'event': 'file_start', 'index': count, 'total': None, 'name': file_path.name}
+            
+            result = detect_keywords_in_file(file_path, keywords, scopes, engine, worker=worker,
+                                             profile=file_profile(count), parallel=parallel, budget=budget)
+            # 表示用のパスは指定されたディレクトリの書き方に揃える
+            result['file'] = str(Path(directory) / file_path.relative_to(search_directory))
+            if retry_raw and is_retryable(result):
+                retries.append((count, file_path, result))
+            
+            yield {'event': 'file_done', 'index': count, 'result': result}
+    
+    for text in messages:
+        yield {'event': 'message', 'text': text}
+    
+    yield {'event': 'files', 'count': count}
+    
+    # 打ち切ったファイルは他のファイルを待たせないよう最後にまとめて raw エンジンで再検査する
+    if retries:
+        yield {'event': 'retry_start', 'count': len(retries)}
+    for i, (index, file_path, failed) in enumerate(retries, 1):
+        yield {'event': 'file_start', 'index': i, 'total': len(retries), 'name': file_path.name,
+               'retry': True}
+        
+        if not profiling:
+            result = retry_with_raw_engine(worker, file_path, keywords, scopes, failed, budget=budget)
+        else:
+            started = time.perf_counter()
+            result = retry_with_raw_engine(worker, file_path, keywords, scopes, failed,
+                                           profile=file_profile(index), budget=budget)
+            result.setdefault('profile', {})['wall'] = time.perf_counter() - started
+        for detection in result['results']:
+            detection['text'] = detection['text'][:100]
+        result['file'] = failed['file']
+        
+        yield {'event': 'file_done', 'index': index, 'result': result, 'retry': True}
+
+
+def print_scan_events(events, args, profile=None):
+    """検査の進行イベントを表示し、全ファイルの結果を返す
+    PPTファイルが見つからなかった場合は None を返す
+    profile（ScanProfile）を指定した場合は各ファイルの計測値を集計する"""
+    all_results = []
+    result_positions = {}  # 進行イベントの index → all_results の位置（再検査時の置き換え用）
+    
+    for event in events:
+        kind = event['event']
+        
+        if kind == 'start':
+            print("=" * 80)
+            print("PowerPoint キーワード検出ツール (CLI版)")
+            print("=" * 80)
+            print(f"検索ディレクトリ: {args.directory}")
+            print(f"検索キーワード: {', '.join(event['keywords'])}")
+            print(f"再帰検索: {'いいえ' if args.no_recursive else 'はい'}")
+            print(f"検査対象: {', '.join(event['scopes'])}")
+            print(f"検出エンジン: {event['engine']}")
+            time_limit = f"{event['time_limit']:g} 秒" if event.get('time_limit') else '無制限'
+            memory_limit = f"{event['memory_limit']:g} MB" if event.get('memory_limit') else '無制限'
+            print(f"1ファイルの処理予算: 時間 {time_limit} / メモリ {memory_limit}")
+            print("-" * 80)
+            print("\nPPTファイルを検索しながら検査します...")
+        
+        elif kind == 'message':
+            print(event['text'])
+        
+        elif kind == 'files':
+            # 検索と検査は並行して進むため、件数は検索の完了後に届く
+            if event['count'] == 0:
+                print("PPTファイルが見つかりませんでした。")
+                return None
+            print(f"\n{event['count']} 件のPPTファイルを検査しました。")
+        
+        elif kind == 'retry_start':
+            print(f"\n処理予算を超えた {event['count']} 件のファイルを raw エンジンで再検査します。")
+        
+        elif kind == 'file_start':
+            progress = f"{event['index']}/{event['total']}" if event['total'] else event['index']
+            print(f"[{progress}] 検査中: {event['name']} ... ", end='', flush=True)
+        
+        elif kind == 'file_done':
+            result = event['result']
+            if profile is not None:
+                profile.add(event['index'], result, retry=event.get('retry', False))
+                result.pop('profile', None)
+            if event.get('retry'):
+                all_results[result_positions[event['index']]] = result
+            else:
+                result_positions[event['index']] = len(all_results)
+                all_results.append(result)
+            
+            if result['success']:
+                if result['results']:
+                    print(f"✓ {len(result['results'])} 箇所で検出")
+                else:
+                    print("検出なし")
+            else:
+                print(f"✗ {STATUS_LABELS.get(result.get('status'), 'エラー')}")
+        
+        elif kind == 'error':
+            raise RuntimeError(event['error'])
+    
+    # 検査は見つかった順に行うため、レポートはパス順に並べ直す
+    all_results.sort(key=lambda r: Path(r['file']))
+    return all_results
+
+
+def profile_request(args):
+    """--profile 指定時の計測オプション（指定しない場合は None）"""
+    if not (args.profile or args.profile_dump):
+        return None
+    return {'dump_dir': args.profile_dump}
+
+
+def build_scan_request(args, config):
+    """コマンドライン引数から検査リクエストを作成
+    省略された項目はこのプロセスで読み込んだ config.json の値で埋める
+    （常駐プロセスに依頼する場合も、常駐プロセス側の設定ではなく実行したディレクトリの設定で検査する）"""
+    return {
+        'directory': args.directory,
+        'keywords': args.keywords or config['default_keywords'],
+        'recursive': not args.no_recursive,
+        'scopes': list(parse_scopes(args.scope, default=config.get('default_scopes', DEFAULT_SCOPES))),
+        'engine': args.engine,
+        'time_limit': args.time_limit if args.time_limit is not None else config.get('file_time_limit_sec', 120),
+        'memory_limit': (args.memory_limit if args.memory_limit is not None
+                         else config.get('file_memory_limit_mb', 2048)),
+        'retry_raw': False if args.no_retry_raw else config.get('retry_with_raw_engine', True),
+        'parallel_workers': args.parallel_workers,
+        'profile': profile_request(args)
+    }
+
+
+def request_daemon_scan(socket_path, request):
+    """常駐プロセスに検査を依頼し、進行イベントを返す
+    常駐プロセスに接続できない場合は None を返す"""
+    request = dict(request, cwd=os.getcwd())
+    events = scan_daemon.send_request(socket_path, request)
+    try:
+        first_event = next(events)
+    except (OSError, StopIteration):
+        return None
+    
+    def chained():
+        yield first_event
+        yield from events
+    
+    return chained()
+
+
+def run_daemon(args):
+    """常駐モードで起動（ライブラリと設定を読み込んだまま待ち受ける）"""
+    if not scan_daemon.is_supported():
+        print("エラー: この環境では常駐モード（Unixソケット）を使用できません。")
+        sys.exit(1)
+    
+    # 重いライブラリを先に読み込んでおく
+    import pptx  # noqa: F401
+    import lxml.etree  # noqa: F401
+    
+    # 既定キーワードなどはクライアントが自身の config.json から解決して送るため、
+    # 常駐プロセスの設定はワーカー数などの起動時の設定にのみ使用する
+    config = load_config()
+    
+    # ワーカーは起動時に作成し、リクエスト間で使い回す（リクエストは並行して処理される）
+    workers = create_worker_pool(config, size=config.get('scan_workers', 2))
+    parallel = create_parallel_scanner(config)
+    
+    def handler(request):
+        return scan_events(request, config, workers=workers, parallel=parallel)
+    
+    try:
+        scan_daemon.serve(args.socket, handler)
+    finally:
+        workers.close()
+        parallel.close()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='PowerPointファイル内のキーワードを検出します',
@@ -193,59 +511,79 @@ def main():
   python detect_keywords_cli.py C:\\Documents --no-recursive
   python detect_keywords_cli.py C:\\Documents --keywords "OldCompany" "旧社名"
   python detect_keywords_cli.py C:\\Documents --output results.txt
+  python detect_keywords_cli.py C:\\Documents --scope slides notes --engine raw
+
+常駐モード（Linux/macOS）:
+  python detect_keywords_cli.py --daemon
+  python detect_keywords_cli.py /data/presentations --client
         """
     )
     
-    parser.add_argument('directory', help='検索対象のディレクトリパス')
+    parser.add_argument('directory', nargs='?', help='検索対象のディレクトリパス')
     parser.add_argument('--keywords', '-k', nargs='+', help='検索するキーワード（スペース区切り）')
     parser.add_argument('--no-recursive', '-n', action='store_true', 
                        help='サブディレクトリを検索しない')
     parser.add_argument('--output', '-o', help='結果を保存するファイル名')
     parser.add_argument('--show-all', '-a', action='store_true',
                        help='検出数が0のファイルも含めて全ファイルを表示')
+    parser.add_argument('--scope', '-s', nargs='+', choices=SCOPES,
+                       help='検査対象（slides, masters, layouts, notes。既定: 設定ファイルの default_scopes）')
+    parser.add_argument('--engine', '-e', choices=ENGINES, default=None,
+                       help='検出エンジン（pptx: python-pptx（既定）, raw: 必要なパートのみ読み込む軽量エンジン）')
+    parser.add_argument('--time-limit', type=float, default=None, metavar='SEC',
+                       help='1ファイルあたりの最大処理時間（秒。0 で無制限。既定: 設定ファイルの file_time_limit_sec）')
+    parser.add_argument('--memory-limit', type=float, default=None, metavar='MB',
+                       help='1ファイルあたりの最大メモリ（MB。0 で無制限。既定: 設定ファイルの file_memory_limit_mb）')
+    parser.add_argument('--no-retry-raw', action='store_true',
+                       help='処理予算を超えたファイルを raw エンジンで再検査しない')
+    parser.add_argument('--parallel-workers', type=int, default=None, metavar='N',
+                       help='巨大なデッキを1ファイル内で並列に検出するプロセス数（0 で CPU 数、1 で並列化しない。'
+                            '既定: 設定ファイルの parallel_scan_workers）')
+    parser.add_argument('--profile', action='store_true',
+                       help='ファイルごとの処理時間・読込バイト数・ピークメモリと関数ごとの処理時間を計測して表示')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                       help='プロファイルで表示する遅いファイル・関数の件数（既定: 10）')
+    parser.add_argument('--profile-dump', metavar='DIR',
+                       help='オフライン分析用に cProfile の集計と tracemalloc のスナップショットを保存（--profile を含む）')
+    parser.add_argument('--daemon', action='store_true',
+                       help='常駐モードで起動し、Unixソケットで検査リクエストを待ち受ける')
+    parser.add_argument('--client', '-c', action='store_true',
+                       help='常駐プロセスに検査を依頼する（接続できない場合は通常どおり実行）')
+    parser.add_argument('--socket', default=scan_daemon.DEFAULT_SOCKET_PATH,
+                       help=f'常駐モードのソケットパス（既定: {scan_daemon.DEFAULT_SOCKET_PATH}）')
     
     args = parser.parse_args()
     
-    # 設定読み込み
-    config = load_config()
+    if args.daemon:
+        run_daemon(args)
+        return
     
-    # キーワード設定
-    keywords = args.keywords if args.keywords else config['default_keywords']
+    if not args.directory:
+        parser.error('検索対象のディレクトリパスを指定してください')
     
-    print("=" * 80)
-    print("PowerPoint キーワード検出ツール (CLI版)")
-    print("=" * 80)
-    print(f"検索ディレクトリ: {args.directory}")
-    print(f"検索キーワード: {', '.join(keywords)}")
-    print(f"再帰検索: {'いいえ' if args.no_recursive else 'はい'}")
-    print("-" * 80)
+    # 設定読み込み（常駐プロセスに依頼する場合も、既定値はこのディレクトリの設定を使う）
+    config = load_config()
+    request = build_scan_request(args, config)
     
-    # PPTファイルを検索
-    print("\nPPTファイルを検索中...")
-    ppt_files = find_ppt_files(args.directory, recursive=not args.no_recursive)
+    events = None
+    if args.client:
+        if scan_daemon.is_supported():
+            events = request_daemon_scan(args.socket, request)
+        if events is None:
+            print("警告: 常駐プロセスに接続できないため、通常モードで実行します。", file=sys.stderr)
     
-    if not ppt_files:
-        print("PPTファイルが見つかりませんでした。")
-        return
+    if events is None:
+        events = scan_events(request, config)
     
-    print(f"{len(ppt_files)} 件のPPTファイルが見つかりました。\n")
+    profile = None
+    if args.profile or args.profile_dump:
+        # プロファイル時のみ読み込む
+        from scan_profiler import ScanProfile
+        profile = ScanProfile()
     
-    # 各ファイルを処理
-    all_results = []
-    for i, file_path in enumerate(ppt_files, 1):
-        print(f"[{i}/{len(ppt_files)}] 検査中: {file_path.name} ... ", end='', flush=True)
-        
-        result = detect_keywords_in_file(file_path, keywords)
-        result['file'] = str(file_path)
-        all_results.append(result)
-        
-        if result['success']:
-            if result['results']:
-                print(f"✓ {len(result['results'])} 箇所で検出")
-            else:
-                print("検出なし")
-        else:
-            print(f"✗ エラー")
+    all_results = print_scan_events(events, args, profile=profile)
+    if all_results is None:
+        return
     
     # 結果を整形
     output_text = format_results_text(all_results, args.directory, show_all_files=args.show_all)
@@ -258,6 +596,15 @@ def main():
     if args.output:
         save_results_to_file(output_text, args.output)
     
+    if profile is not None:
+        print("\n")
+        print(profile.format_report(top=args.profile_top))
+        if args.profile_dump:
+            pstats_path, snapshots = profile.dump(args.profile_dump, top=args.profile_top)
+            print(f"\ncProfile の集計を保存しました: {pstats_path}")
+            if snapshots:
+                print(f"tracemalloc のスナップショットを保存しました（処理時間の長い {len(snapshots)} 件）: {args.profile_dump}")
+    
     # エラーがあった場合は終了コード1
     if any(not r['success'] for r in all_results):
         sys.exit(1)
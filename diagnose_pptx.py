@@ -1,9 +1,55 @@
 """
-PowerPoint ファイルの置換テスト
+PowerPoint ファイルの診断ツール
+ファイルまたはディレクトリを指定して、処理が遅いデッキの原因を調べます。
+
+  - パートごとの圧縮前／圧縮後サイズ
+  - スライドごとのシェイプ・段落・ラン数とランの断片化率
+  - マスター／レイアウト数
+  - エンジンごとの読込・検査・保存時間
+  - 処理が極端に遅くなる要因（巨大なメディア、大量の細かいラン、大量のレイアウトなど）の警告
+  - 参照先のパートが存在しないなど、読み込めない原因の警告（一部の計測に失敗しても他の結果は表示する）
 """
 from pptx import Presentation
 import re
 import os
+import sys
+import json
+import time
+import argparse
+import posixpath
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+from keyword_scanner import (
+    NAMESPACES, SCOPES, RawPackage, count_keywords,
+    find_keywords_in_presentation, iter_part_shapes, list_scope_parts
+)
+from detect_keywords_cli import find_ppt_files, load_config
+from report_format import format_size
+
+
+# 警告のしきい値
+LARGE_MEDIA_BYTES = 20 * 1024 * 1024      # メディア・埋め込み1件あたり
+TOTAL_MEDIA_BYTES = 100 * 1024 * 1024     # メディア・埋め込みの合計
+LARGE_XML_PART_BYTES = 5 * 1024 * 1024    # XMLパート1件あたり（展開後）
+MAX_RUNS_PER_SLIDE = 1000
+MAX_RUNS_PER_PARAGRAPH = 8.0              # ランの断片化率（ラン数 / テキストのある段落数）
+MAX_LAYOUTS = 100
+MAX_MASTERS = 10
+MAX_SLIDES = 500
+
+# パート名の分類（先頭一致）
+PART_CATEGORIES = (
+    ('ppt/slides/', 'slides'),
+    ('ppt/notesSlides/', 'notes'),
+    ('ppt/slideLayouts/', 'layouts'),
+    ('ppt/slideMasters/', 'masters'),
+    ('ppt/media/', 'media'),
+    ('ppt/embeddings/', 'embeddings'),
+    ('ppt/charts/', 'charts'),
+    ('ppt/theme/', 'theme'),
+)
 
 def diagnose_pptx(filepath):
     """PowerPoint ファイルの内容を診断"""
@@ -115,16 +161,395 @@ def test_replace_in_pptx(input_filepath, keyword, new_keyword, output_filepath):
         traceback.print_exc()
 
 
+def categorize_part(name):
+    """パート名から分類を決める"""
+    if name.endswith('.rels'):
+        return 'rels'
+    for prefix, category in PART_CATEGORIES:
+        if name.startswith(prefix):
+            return category
+    return 'other'
+
+
+def collect_part_stats(filepath, top=10):
+    """パートごとの圧縮前／圧縮後サイズを集計"""
+    by_category = {}
+    parts = []
+
+    with zipfile.ZipFile(filepath) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            category = categorize_part(info.filename)
+            parts.append({
+                'name': info.filename,
+                'category': category,
+                'compressed': info.compress_size,
+                'uncompressed': info.file_size
+            })
+            stats = by_category.setdefault(category, {'count': 0, 'compressed': 0, 'uncompressed': 0})
+            stats['count'] += 1
+            stats['compressed'] += info.compress_size
+            stats['uncompressed'] += info.file_size
+
+    parts.sort(key=lambda p: p['uncompressed'], reverse=True)
+    return {
+        'count': len(parts),
+        'compressed': sum(p['compressed'] for p in parts),
+        'uncompressed': sum(p['uncompressed'] for p in parts),
+        'by_category': by_category,
+        'largest': parts[:top],
+        'all': parts
+    }
+
+
+def find_missing_parts(filepath):
+    """リレーションシップの参照先が存在しないパートを (参照元, 参照先) のリストで返す"""
+    missing = []
+    with zipfile.ZipFile(filepath) as zf:
+        names = set(zf.namelist())
+    with RawPackage(filepath) as package:
+        for rels_name in sorted(n for n in names if n.endswith('.rels')):
+            # ppt/slides/_rels/slide1.xml.rels → 参照元 ppt/slides/slide1.xml
+            rels_dir, rels_file = posixpath.split(rels_name)
+            source = posixpath.join(posixpath.dirname(rels_dir), rels_file[:-len('.rels')])
+            for _, target in package.relationships(source).values():
+                if target not in names:
+                    missing.append((source or '/', target))
+    return missing
+
+
+def collect_slide_stats(filepath):
+    """スライドごとのシェイプ・段落・ラン数と、マスター／レイアウト数を集計"""
+    slides = []
+    masters = 0
+    layouts = 0
+
+    with RawPackage(filepath) as package:
+        for scope, location, partname in list_scope_parts(package, ('slides', 'masters', 'layouts')):
+            if scope == 'masters':
+                masters += 1
+                continue
+            if scope == 'layouts':
+                layouts += 1
+                continue
+
+            root = package.read_xml(partname)
+            shapes = sum(1 for _ in iter_part_shapes(root))
+            paragraphs = 0
+            text_paragraphs = 0
+            runs = 0
+            for p in root.iterfind('.//a:p', NAMESPACES):
+                paragraphs += 1
+                paragraph_runs = len(p.findall('a:r', NAMESPACES))
+                if paragraph_runs:
+                    text_paragraphs += 1
+                    runs += paragraph_runs
+
+            slides.append({
+                'slide': location,
+                'part': partname,
+                'shapes': shapes,
+                'paragraphs': paragraphs,
+                'runs': runs,
+                'runs_per_paragraph': round(runs / text_paragraphs, 2) if text_paragraphs else 0.0,
+                '_text_paragraphs': text_paragraphs
+            })
+
+    return slides, masters, layouts
+
+
+def _best_of(repeat, func):
+    """repeat 回実行して最短時間（秒）と最後の戻り値を返す"""
+    best = None
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def measure_engines(filepath, keywords, repeat=1):
+    """エンジンごとの読込・検査・保存時間を計測（全スコープ対象）
+    読み込めないエンジンは時間の代わりに 'error' にエラーメッセージを記録する"""
+    timings = {}
+
+    # pptx エンジン（python-pptx）
+    timing = {'parse': None, 'scan': None, 'save': None, 'error': None}
+    try:
+        timing['parse'], prs = _best_of(repeat, lambda: Presentation(filepath))
+        timing['scan'], _ = _best_of(repeat, lambda: find_keywords_in_presentation(prs, keywords, SCOPES))
+        timing['save'], _ = _best_of(repeat, lambda: prs.save(BytesIO()))
+    except Exception as e:
+        timing['error'] = _describe_error(e)
+    timings['pptx'] = timing
+
+    # raw エンジン（必要なパートのみ読み込み。保存は非対応）
+    def raw_parse():
+        with RawPackage(filepath) as package:
+            return [(partname, package.read_xml(partname))
+                    for _, _, partname in list_scope_parts(package, SCOPES)]
+
+    def raw_scan(roots):
+        for _, root in roots:
+            for _, text in iter_part_shapes(root):
+                if text is not None and text.strip():
+                    count_keywords(text, keywords)
+
+    timing = {'parse': None, 'scan': None, 'save': None, 'error': None}
+    try:
+        timing['parse'], roots = _best_of(repeat, raw_parse)
+        timing['scan'], _ = _best_of(repeat, lambda: raw_scan(roots))
+    except Exception as e:
+        timing['error'] = _describe_error(e)
+    timings['raw'] = timing
+
+    return timings
+
+
+def _describe_error(e):
+    # KeyError の str() は引用符付きのため、メッセージのみにする
+    if isinstance(e, KeyError) and e.args:
+        return str(e.args[0])
+    return str(e) or type(e).__name__
+
+
+def find_pathologies(report):
+    """処理が極端に遅くなる要因・読み込めない原因を検出"""
+    warnings = []
+    parts = report['parts']
+
+    for source, target in report.get('missing_parts', []):
+        warnings.append(f"参照先のパートがありません: {target}（{source} から参照）")
+    for engine, timing in report.get('timings', {}).items():
+        if timing.get('error'):
+            warnings.append(f"{engine} エンジンで読み込めません: {timing['error']}")
+    if report.get('slides_error'):
+        warnings.append(f"スライドの構造を集計できません: {report['slides_error']}")
+
+    media_parts = [p for p in parts['all'] if p['category'] in ('media', 'embeddings')]
+    for part in media_parts:
+        if part['uncompressed'] >= LARGE_MEDIA_BYTES:
+            warnings.append(f"巨大なメディア: {part['name']} ({format_size(part['uncompressed'])})")
+    total_media = sum(p['uncompressed'] for p in media_parts)
+    if total_media >= TOTAL_MEDIA_BYTES:
+        warnings.append(f"メディアの合計サイズが大きい: {format_size(total_media)}")
+
+    for part in parts['all']:
+        if part['name'].endswith('.xml') and part['uncompressed'] >= LARGE_XML_PART_BYTES:
+            warnings.append(f"巨大なXMLパート: {part['name']} ({format_size(part['uncompressed'])})")
+
+    for slide in report['slides']:
+        if slide['runs'] >= MAX_RUNS_PER_SLIDE:
+            warnings.append(f"ランが非常に多いスライド: スライド {slide['slide']} ({slide['runs']} ラン)")
+
+    totals = report['totals']
+    if totals['runs_per_paragraph'] >= MAX_RUNS_PER_PARAGRAPH:
+        warnings.append(f"ランの断片化が激しい: 段落あたり平均 {totals['runs_per_paragraph']} ラン")
+
+    if report['layouts'] >= MAX_LAYOUTS:
+        warnings.append(f"レイアウトが非常に多い: {report['layouts']} 件")
+    if report['masters'] >= MAX_MASTERS:
+        warnings.append(f"マスターが非常に多い: {report['masters']} 件")
+    if len(report['slides']) >= MAX_SLIDES:
+        warnings.append(f"スライドが非常に多い: {len(report['slides'])} 枚")
+
+    return warnings
+
+
+def analyze_deck(filepath, keywords, repeat=1, top=10):
+    """1ファイルの性能診断レポートを作成"""
+    report = {
+        'file': str(filepath),
+        'file_size': os.path.getsize(filepath),
+        'error': None
+    }
+
+    # ZIP として読めない場合は他の集計もできない
+    try:
+        report['parts'] = collect_part_stats(filepath, top=top)
+        report['missing_parts'] = find_missing_parts(filepath)
+    except Exception as e:
+        report['error'] = _describe_error(e)
+        return report
+
+    # 壊れたデッキの原因を示せるよう、以降は失敗した集計・計測のみを除いて続ける
+    report['slides_error'] = None
+    try:
+        slides, masters, layouts = collect_slide_stats(filepath)
+    except Exception as e:
+        report['slides_error'] = _describe_error(e)
+        slides, masters, layouts = [], 0, 0
+    report['slides'] = slides
+    report['masters'] = masters
+    report['layouts'] = layouts
+
+    text_paragraphs = sum(s.pop('_text_paragraphs') for s in slides)
+    runs = sum(s['runs'] for s in slides)
+    report['totals'] = {
+        'shapes': sum(s['shapes'] for s in slides),
+        'paragraphs': sum(s['paragraphs'] for s in slides),
+        'runs': runs,
+        'runs_per_paragraph': round(runs / text_paragraphs, 2) if text_paragraphs else 0.0
+    }
+    report['timings'] = measure_engines(str(filepath), keywords, repeat=repeat)
+    report['warnings'] = find_pathologies(report)
+
+    return report
+
+
+def has_errors(report):
+    """読み込めない・一部のエンジンで処理できないデッキか"""
+    if report['error']:
+        return True
+    return any(timing['error'] for timing in report['timings'].values())
+
+
+def format_seconds(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+def print_report(report, show_slides=True):
+    """診断レポートを表示"""
+    print(f"\n診断対象: {report['file']}")
+    print("=" * 60)
+
+    if report['error']:
+        print(f"❌ エラー: {report['error']}")
+        return
+
+    parts = report['parts']
+    print(f"ファイルサイズ: {format_size(report['file_size'])}")
+    print(f"パート数: {parts['count']} "
+          f"(圧縮後 {format_size(parts['compressed'])} / 展開後 {format_size(parts['uncompressed'])})")
+    print(f"スライド数: {len(report['slides'])}  マスター数: {report['masters']}  レイアウト数: {report['layouts']}")
+
+    print("\n--- パート分類別サイズ ---")
+    for category, stats in sorted(parts['by_category'].items(), key=lambda item: -item[1]['uncompressed']):
+        print(f"  {category:<11} {stats['count']:>5} 件  "
+              f"圧縮後 {format_size(stats['compressed']):>10}  展開後 {format_size(stats['uncompressed']):>10}")
+
+    print("\n--- サイズの大きいパート ---")
+    for part in parts['largest']:
+        print(f"  {part['name']:<45} 圧縮後 {format_size(part['compressed']):>10}  "
+              f"展開後 {format_size(part['uncompressed']):>10}")
+
+    totals = report['totals']
+    print("\n--- テキスト構造 ---")
+    print(f"  シェイプ: {totals['shapes']}  段落: {totals['paragraphs']}  ラン: {totals['runs']}  "
+          f"ラン断片化率: {totals['runs_per_paragraph']}")
+    if show_slides:
+        for slide in report['slides']:
+            print(f"  スライド {slide['slide']:>4}: シェイプ {slide['shapes']:>4}  段落 {slide['paragraphs']:>5}  "
+                  f"ラン {slide['runs']:>6}  断片化率 {slide['runs_per_paragraph']}")
+
+    print("\n--- 処理時間（全スコープ） ---")
+    print(f"  {'エンジン':<8} {'読込':>12} {'検査':>12} {'保存':>12}")
+    for engine, timing in report['timings'].items():
+        if timing['error']:
+            print(f"  {engine:<10} ❌ エラー: {timing['error']}")
+            continue
+        print(f"  {engine:<10} {format_seconds(timing['parse']):>12} {format_seconds(timing['scan']):>12} "
+              f"{format_seconds(timing['save']):>12}")
+
+    if report['warnings']:
+        print("\n--- 警告 ---")
+        for warning in report['warnings']:
+            print(f"  ⚠️ {warning}")
+    else:
+        print("\n✓ 問題となる要因は見つかりませんでした")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='PowerPointファイルの性能を診断します',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用例:
+  python diagnose_pptx.py C:\\Documents\\slow_deck.pptx
+  python diagnose_pptx.py C:\\Documents\\Presentations --json report.json
+  python diagnose_pptx.py deck.pptx --dump
+  python diagnose_pptx.py deck.pptx --replace-test "old keyword" "new keyword"
+        """
+    )
+    parser.add_argument('paths', nargs='+', help='診断するファイルまたはディレクトリ')
+    parser.add_argument('--no-recursive', '-n', action='store_true',
+                       help='ディレクトリ指定時にサブディレクトリを検索しない')
+    parser.add_argument('--keywords', '-k', nargs='+', help='検査時間の計測に使うキーワード（既定: 設定ファイル）')
+    parser.add_argument('--repeat', '-r', type=int, default=1,
+                       help='処理時間の計測回数（最短時間を表示）')
+    parser.add_argument('--top', type=int, default=10, help='表示するサイズの大きいパートの件数')
+    parser.add_argument('--summary', action='store_true', help='スライドごとの内訳を表示しない')
+    parser.add_argument('--json', help='診断結果をJSONファイルに保存')
+    parser.add_argument('--dump', action='store_true', help='スライドのテキスト・段落・ランを表示')
+    parser.add_argument('--replace-test', nargs=2, metavar=('KEYWORD', 'NEW_KEYWORD'),
+                       help='置換テストを行い <ファイル名>_replaced.pptx に保存')
+
+    args = parser.parse_args()
+
+    config = load_config()
+    keywords = args.keywords if args.keywords else config['default_keywords']
+
+    # 診断対象のファイルを収集
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(find_ppt_files(path, recursive=not args.no_recursive))
+        else:
+            files.append(Path(path))
+
+    if not files:
+        print("PPTファイルが見つかりませんでした。")
+        return
+
+    reports = []
+    for file_path in files:
+        if not file_path.exists():
+            print(f"⚠️ ファイルが見つかりません: {file_path}")
+            continue
+
+        if args.dump:
+            diagnose_pptx(str(file_path))
+
+        if args.replace_test:
+            output_file = str(file_path.with_name(f"{file_path.stem}_replaced{file_path.suffix}"))
+            test_replace_in_pptx(str(file_path), args.replace_test[0], args.replace_test[1], output_file)
+            continue
+
+        report = analyze_deck(file_path, keywords, repeat=max(1, args.repeat), top=args.top)
+        print_report(report, show_slides=not args.summary)
+        reports.append(report)
+
+    # 複数ファイルの場合は遅い順の一覧を表示
+    if len(reports) > 1:
+        print("\n" + "=" * 60)
+        print("処理時間の長いファイル（pptx エンジン 読込+検査+保存）")
+        print("=" * 60)
+        def total_time(report):
+            if report['error'] or report['timings']['pptx']['error']:
+                return -1
+            timing = report['timings']['pptx']
+            return timing['parse'] + timing['scan'] + timing['save']
+        for report in sorted(reports, key=total_time, reverse=True):
+            if total_time(report) < 0:
+                print(f"  {'エラー':>12}  {report['file']}")
+            else:
+                print(f"  {format_seconds(total_time(report)):>12}  {report['file']}"
+                      f"{'  ⚠️ ' + str(len(report['warnings'])) + ' 件の警告' if report['warnings'] else ''}")
+
+    if args.json:
+        for report in reports:
+            if 'parts' in report:
+                report['parts'].pop('all', None)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"\n診断結果を保存しました: {args.json}")
+
+    if any(has_errors(report) for report in reports):
+        sys.exit(1)
+
+
 if __name__ == '__main__':
-    # Test2.pptx のパスを設定
-    test_file = 'd:\\genAI\\Tool\\uploads\\Test2.pptx'
-    output_file = 'd:\\genAI\\Tool\\uploads\\Test2_replaced.pptx'
-    
-    # 診断
-    diagnose_pptx(test_file)
-    
-    # 置換テスト
-    test_replace_in_pptx(test_file, 'old keyword', 'new keyword', output_file)
-    
-    # 置換後のファイルを診断
-    diagnose_pptx(output_file)
+    main()
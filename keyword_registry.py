@@ -0,0 +1,238 @@
+"""
+キーワードセットのレジストリ（Web版）
+名前付き・バージョン付きのキーワード／置換先のセットを保持し、クライアントはセットID（名前または 名前@バージョン）で参照できます。
+置換用の正規表現はキーワードの組み合わせごとに keyword_scanner.compile_keywords の LRU キャッシュで使い回します。
+
+config.json の default_keywords / default_replacement は "default" セットとして、
+keyword_sets の各項目はその名前のセットとして登録されます。
+config.json が更新されると自動的に読み込み直し、内容が変わったセットのバージョンを上げます。
+クライアントが登録したセットは max_client_sets 件までとし、超えた場合は最後に使われてから最も時間が経ったものから削除します（LRU）。
+処理中のリクエストは取得済みのセット（変更されないオブジェクト）を使い続けるため影響を受けません。
+"""
+
+import collections
+import json
+import os
+import re
+import threading
+import time
+
+from keyword_scanner import compile_keywords
+
+
+DEFAULT_SET_NAME = 'default'
+
+_SET_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_\-]{1,64}$')
+
+
+class KeywordSet:
+    """名前付き・バージョン付きのキーワードセット（作成後は変更しない）"""
+
+    def __init__(self, name, version, keywords, replacement):
+        self.name = name
+        self.version = version
+        self.keywords = tuple(keywords)
+        self.replacement = replacement
+
+    @property
+    def set_id(self):
+        return f"{self.name}@{self.version}"
+
+    @property
+    def patterns(self):
+        return compile_keywords(self.keywords)
+
+    def same_content(self, keywords, replacement):
+        return self.keywords == tuple(keywords) and self.replacement == replacement
+
+    def to_dict(self):
+        return {
+            'id': self.set_id,
+            'name': self.name,
+            'version': self.version,
+            'keywords': list(self.keywords),
+            'replacement': self.replacement
+        }
+
+
+def _validate_set(name, keywords, replacement):
+    if not _SET_NAME_PATTERN.match(name or ''):
+        raise ValueError(f'キーワードセット名が不正です（英数字・_・- のみ、64文字まで）: {name}')
+    if not isinstance(keywords, list) or not keywords or \
+            not all(isinstance(keyword, str) and keyword for keyword in keywords):
+        raise ValueError(f'キーワードセットのキーワードが不正です: {name}')
+    if replacement is not None and not isinstance(replacement, str):
+        raise ValueError(f'キーワードセットの置換先が不正です: {name}')
+
+
+class KeywordRegistry:
+    """キーワードセットの登録・参照と config.json の自動読み込み
+
+    config_path: 設定ファイルのパス
+    config: 起動時に読み込んだ設定
+    check_interval: 設定ファイルの更新を確認する間隔（秒）
+    history: セットごとに保持する過去のバージョン数
+    max_client_sets: クライアントが登録できるセット数の上限（超えた場合は使われていないものから削除）
+    """
+
+    def __init__(self, config_path, config, check_interval=1.0, history=5, max_client_sets=100):
+        self.config_path = config_path
+        self.check_interval = check_interval
+        self.history = history
+        self.max_client_sets = max(1, max_client_sets)
+
+        self._lock = threading.Lock()
+        self._config = config
+        self._sets = {}          # 名前 → バージョン順の KeywordSet リスト（末尾が最新）
+        self._config_names = set()
+        self._client_names = collections.OrderedDict()  # クライアントが登録したセット名（先頭が最も古い）
+        self._evicted_total = 0
+        self._stamp = self._file_stamp()
+        self._checked_at = time.monotonic()
+        self._reloaded_total = 0
+        self._reload_failed_total = 0
+
+        try:
+            self._apply_config(config)
+        except ValueError as e:
+            print(f"キーワードセットの読み込みに失敗しました: {str(e)}")
+
+    @property
+    def config(self):
+        """最新の設定"""
+        self.refresh()
+        return self._config
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        """設定ファイルが更新されていれば読み込み直す（確認は check_interval 秒ごと）"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            try:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except Exception as e:
+                # 書き込み途中などで読めない場合は現在の設定を使い続け、次回の確認で再試行する
+                print(f"設定ファイルの再読み込みに失敗しました: {str(e)}")
+                return
+
+            # 不正な内容のファイルは次に更新されるまで読み込み直さない（現在の設定を使い続ける）
+            self._stamp = stamp
+            try:
+                self._apply_config(config)
+            except Exception as e:
+                self._reload_failed_total += 1
+                print(f"設定ファイルの再読み込みに失敗しました: {str(e)}")
+                return
+            self._config = config
+            self._reloaded_total += 1
+            print(f"設定ファイルを再読み込みしました: {self.config_path}")
+
+    def _apply_config(self, config):
+        """設定ファイルのキーワードセットを登録（内容が変わったセットのみ新しいバージョンにする）"""
+        if not isinstance(config, dict):
+            raise ValueError('設定ファイルの形式が不正です')
+        definitions = {
+            DEFAULT_SET_NAME: (list(config.get('default_keywords', [])), config.get('default_replacement'))
+        }
+        keyword_sets = config.get('keyword_sets', {})
+        if not isinstance(keyword_sets, dict):
+            raise ValueError('keyword_sets の形式が不正です')
+        for name, definition in keyword_sets.items():
+            if not isinstance(definition, dict):
+                raise ValueError(f'キーワードセットの定義が不正です: {name}')
+            definitions[name] = (definition.get('keywords'), definition.get('replacement'))
+
+        for name, (keywords, replacement) in definitions.items():
+            _validate_set(name, keywords, replacement)
+
+        for name, (keywords, replacement) in definitions.items():
+            # クライアントが登録したセットと同じ名前は設定ファイルの定義を優先する
+            self._client_names.pop(name, None)
+            self._put(name, keywords, replacement)
+
+        # 設定ファイルから削除されたセットは参照できなくする
+        for name in self._config_names - set(definitions):
+            self._sets.pop(name, None)
+        self._config_names = set(definitions)
+
+    def _put(self, name, keywords, replacement):
+        versions = self._sets.setdefault(name, [])
+        if versions and versions[-1].same_content(keywords, replacement):
+            return versions[-1]
+
+        keyword_set = KeywordSet(name, versions[-1].version + 1 if versions else 1, keywords, replacement)
+        versions.append(keyword_set)
+        del versions[:-self.history]
+        return keyword_set
+
+    def register(self, name, keywords, replacement=None):
+        """クライアントからキーワードセットを登録（同じ内容なら現在のバージョンを返す）
+        設定ファイルで定義されたセットは上書きできない"""
+        self.refresh()
+        _validate_set(name, keywords, replacement)
+        with self._lock:
+            if name in self._config_names:
+                raise ValueError(f'設定ファイルで定義されたキーワードセットは変更できません: {name}')
+            keyword_set = self._put(name, keywords, replacement)
+            self._client_names[name] = None
+            self._client_names.move_to_end(name)
+            while len(self._client_names) > self.max_client_sets:
+                evicted, _ = self._client_names.popitem(last=False)
+                self._sets.pop(evicted, None)
+                self._evicted_total += 1
+            return keyword_set
+
+    def get(self, set_id):
+        """セットID（名前 または 名前@バージョン）からキーワードセットを取得（見つからない場合は KeyError）"""
+        self.refresh()
+        name, _, version = (set_id or '').partition('@')
+        with self._lock:
+            versions = self._sets.get(name)
+            if not versions:
+                raise KeyError(set_id)
+            if name in self._client_names:
+                self._client_names.move_to_end(name)
+        if not version:
+            return versions[-1]
+        for keyword_set in versions:
+            if str(keyword_set.version) == version:
+                return keyword_set
+        raise KeyError(set_id)
+
+    def list_sets(self):
+        """最新バージョンのセット一覧"""
+        self.refresh()
+        with self._lock:
+            return [versions[-1] for versions in self._sets.values() if versions]
+
+    def stats(self):
+        """監視用の統計値"""
+        cache = compile_keywords.cache_info()
+        return {
+            'sets': len(self._sets),
+            'client_sets': len(self._client_names),
+            'max_client_sets': self.max_client_sets,
+            'evicted_total': self._evicted_total,
+            'reloaded_total': self._reloaded_total,
+            'reload_failed_total': self._reload_failed_total,
+            'pattern_cache_hits': cache.hits,
+            'pattern_cache_misses': cache.misses,
+            'pattern_cache_size': cache.currsize
+        }
@@ -0,0 +1,425 @@
+"""
+PowerPoint キーワード検出エンジン
+Web版（app.py）とCLI版（detect_keywords_cli.py）で共有する検出処理です。
+
+検査対象（スコープ）:
+  slides  - 通常スライド
+  masters - スライドマスター自身のシェイプ
+  layouts - スライドレイアウト（マスターグループごと）
+  notes   - ノート
+
+エンジン:
+  pptx - python-pptx でプレゼンテーション全体を読み込んで検査
+  raw  - PPTX（ZIP）パッケージから、指定スコープに必要なパートだけを読み込んで検査
+"""
+
+import functools
+import posixpath
+import re
+import time
+import zipfile
+
+
+SCOPES = ('slides', 'masters', 'layouts', 'notes')
+# 従来の検出対象（通常スライド + マスターグループ内のレイアウト）
+DEFAULT_SCOPES = ('slides', 'layouts')
+
+ENGINES = ('pptx', 'raw')
+DEFAULT_ENGINE = 'pptx'
+
+
+def parse_scopes(value, default=DEFAULT_SCOPES):
+    """スコープ指定を正規化する
+    リスト、カンマ区切り文字列、JSON配列文字列のいずれも受け付ける"""
+    if value is None:
+        return tuple(default)
+
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return tuple(default)
+        if text.startswith('['):
+            import json
+            value = json.loads(text)
+        else:
+            value = text.split(',')
+
+    scopes = []
+    for scope in value:
+        scope = str(scope).strip().lower()
+        if not scope:
+            continue
+        if scope not in SCOPES:
+            raise ValueError(f"不明なスコープです: {scope}（指定可能: {', '.join(SCOPES)}）")
+        if scope not in scopes:
+            scopes.append(scope)
+
+    if not scopes:
+        return tuple(default)
+
+    # 検査順序を固定するため SCOPES の並びに揃える
+    return tuple(s for s in SCOPES if s in scopes)
+
+
+@functools.lru_cache(maxsize=128)
+def compile_keywords(keywords):
+    """キーワードを検索・置換用に前処理する
+    キーワードごとに (キーワード, 小文字化したキーワード, 大文字小文字を区別しない正規表現) を返す
+    同じキーワードの組み合わせは再利用される（常駐プロセス・Web版では起動中保持される）"""
+    return tuple((keyword, keyword.lower(), re.compile(re.escape(keyword), re.IGNORECASE))
+                 for keyword in keywords)
+
+
+def count_keywords(text, keywords):
+    """テキスト内のキーワードを数える (OR条件、大文字小文字を区別しない)
+    戻り値: (見つかったキーワードのリスト, 合計出現数)"""
+    found_keywords = []
+    total_count = 0
+    lower_text = text.lower()
+
+    for keyword, lower_keyword, _ in compile_keywords(tuple(keywords)):
+        if lower_keyword in lower_text:
+            found_keywords.append(keyword)
+            total_count += lower_text.count(lower_keyword)
+
+    return found_keywords, total_count
+
+
+def _make_result(scope, location, shape_num, text, found_keywords, count):
+    """検出結果1件分の辞書を作成"""
+    return {
+        'slide': location,
+        'shape': shape_num,
+        'text': text,
+        'keywords': found_keywords,
+        'count': count,
+        'is_master': scope in ('masters', 'layouts'),
+        'scope': scope
+    }
+
+
+# ---------------------------------------------------------------------------
+# pptx エンジン（python-pptx）
+# ---------------------------------------------------------------------------
+
+def iter_scope_parts(prs, scopes=DEFAULT_SCOPES):
+    """指定スコープで検査するスライド・ノート・マスター・レイアウトを検査順に返す
+    (スコープ, 位置ラベル, シェイプを持つオブジェクト) を生成する"""
+    if 'slides' in scopes or 'notes' in scopes:
+        for slide_num, slide in enumerate(prs.slides, 1):
+            if 'slides' in scopes:
+                yield 'slides', slide_num, slide
+            # notes_slide は存在しない場合に新規作成されるため has_notes_slide で確認
+            if 'notes' in scopes and slide.has_notes_slide:
+                yield 'notes', slide_num, slide.notes_slide
+
+    if 'masters' in scopes or 'layouts' in scopes:
+        # マスタースライドを処理（複数のマスターグループに対応）
+        # 一覧を取得できない場合は raw エンジンの list_scope_parts と同様に以降のマスターを飛ばす
+        try:
+            masters = list(enumerate(prs.slide_masters))
+        except Exception as e:
+            print(f"マスタースライド処理エラー: {str(e)}")
+            return
+        for master_group_num, slide_master in masters:
+            if 'masters' in scopes:
+                yield 'masters', f'Master Group {master_group_num + 1}', slide_master
+            if 'layouts' in scopes:
+                try:
+                    layouts = list(enumerate(slide_master.slide_layouts))
+                except Exception as e:
+                    print(f"マスタースライド処理エラー: {str(e)}")
+                    continue
+                for layout_num, layout in layouts:
+                    yield ('layouts', f'Master Group {master_group_num + 1}, Layout {layout_num + 1}', layout)
+
+
+def visit_scope_shapes(prs, scopes, visit):
+    """指定スコープのシェイプごとに visit(スコープ, 位置ラベル, シェイプ番号, シェイプ) を呼び出す
+    マスター・レイアウトで発生したエラーは警告を表示してそのパートのみ飛ばす（raw エンジンの scan_parts と同じ）"""
+    for scope, location, part in iter_scope_parts(prs, scopes):
+        if scope in ('masters', 'layouts'):
+            try:
+                for shape_num, shape in enumerate(part.shapes):
+                    visit(scope, location, shape_num, shape)
+            except Exception as e:
+                print(f"マスタースライド処理エラー: {str(e)}")
+        else:
+            for shape_num, shape in enumerate(part.shapes):
+                visit(scope, location, shape_num, shape)
+
+
+def find_keywords_in_presentation(prs, keywords, scopes=DEFAULT_SCOPES):
+    """プレゼンテーション内のキーワードを検出 (OR条件)
+    scopes で指定した検査対象のみをチェック"""
+    results = []
+
+    def visit(scope, location, shape_num, shape):
+        if hasattr(shape, "text") and shape.text.strip():
+            found_keywords, total_count = count_keywords(shape.text, keywords)
+
+            # いずれかのキーワードが見つかった場合
+            if found_keywords:
+                results.append(_make_result(scope, location, shape_num, shape.text,
+                                            found_keywords, total_count))
+
+    visit_scope_shapes(prs, scopes, visit)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# raw エンジン（ZIPパッケージを直接読み込み）
+# ---------------------------------------------------------------------------
+
+# PresentationML / DrawingML の名前空間（iterfind などで使用）
+NAMESPACES = {
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+
+_RT_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+_RT_NOTES_SLIDE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide'
+
+# python-pptx がシェイプとして数える spTree の子要素
+_SHAPE_TAGS = frozenset(
+    '{%s}%s' % (NAMESPACES['p'], name)
+    for name in ('sp', 'grpSp', 'graphicFrame', 'cxnSp', 'pic', 'contentPart')
+)
+_SP_TAG = '{%s}sp' % NAMESPACES['p']
+_R_TAG = '{%s}r' % NAMESPACES['a']
+_BR_TAG = '{%s}br' % NAMESPACES['a']
+_FLD_TAG = '{%s}fld' % NAMESPACES['a']
+_T_TAG = '{%s}t' % NAMESPACES['a']
+_R_ID = '{%s}id' % NAMESPACES['r']
+
+# lxml は raw エンジン使用時に初めて読み込む（CLIの起動を軽くするため）
+_xml_parser = None
+
+
+def _parse_xml(blob):
+    """XMLを解析（外部エンティティは解決しない）"""
+    global _xml_parser
+    from lxml import etree
+    if _xml_parser is None:
+        _xml_parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+    return etree.fromstring(blob, _xml_parser)
+
+
+class PackageReadLimitExceeded(Exception):
+    """RawPackage で読み込むパートの合計サイズが上限を超えた"""
+
+
+class RawPackage:
+    """PPTXパッケージ（ZIP）を必要なパートだけ読み込むための軽量リーダー"""
+
+    def __init__(self, source, measure=False, max_read_bytes=None):
+        # source はファイルパスまたはファイルライクオブジェクト
+        # measure が True の場合は読み込んだバイト数（圧縮後）と解析時間を記録する
+        # max_read_bytes を指定した場合、読み込むパートの展開後サイズの合計が上限を超える時点で
+        # 読み込まずに PackageReadLimitExceeded を送出する（サイズは ZIP の中央ディレクトリで確認する）
+        self._zip = zipfile.ZipFile(source)
+        self._rels_cache = {}
+        self.measure = measure
+        self.bytes_read = 0
+        self.parse_seconds = 0.0
+        self.max_read_bytes = max_read_bytes
+        self._uncompressed_read = 0
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read(self, partname):
+        if self.max_read_bytes is not None:
+            size = self._zip.getinfo(partname).file_size
+            if self._uncompressed_read + size > self.max_read_bytes:
+                raise PackageReadLimitExceeded(
+                    f'読み込むパートのサイズが上限（{self.max_read_bytes // (1024 * 1024)} MB）を超えています: {partname}')
+            self._uncompressed_read += size
+        return self._zip.read(partname)
+
+    def read_xml(self, partname):
+        """パートを読み込んでXMLとして解析"""
+        if not self.measure:
+            return _parse_xml(self._read(partname))
+
+        started = time.perf_counter()
+        root = _parse_xml(self._read(partname))
+        self.parse_seconds += time.perf_counter() - started
+        self.bytes_read += self._zip.getinfo(partname).compress_size
+        return root
+
+    def relationships(self, partname):
+        """パートのリレーションシップを {rId: (種別, ターゲットのパート名)} で返す"""
+        if partname in self._rels_cache:
+            return self._rels_cache[partname]
+
+        base_dir, filename = posixpath.split(partname)
+        rels_name = posixpath.join(base_dir, '_rels', filename + '.rels')
+        rels = {}
+        try:
+            root = self.read_xml(rels_name)
+        except KeyError:
+            root = None
+
+        if root is not None:
+            for rel in root.iterfind('rel:Relationship', NAMESPACES):
+                if rel.get('TargetMode') == 'External':
+                    continue
+                target = rel.get('Target', '')
+                if target.startswith('/'):
+                    target_partname = target.lstrip('/')
+                else:
+                    target_partname = posixpath.normpath(posixpath.join(base_dir, target))
+                rels[rel.get('Id')] = (rel.get('Type'), target_partname)
+
+        self._rels_cache[partname] = rels
+        return rels
+
+    def main_document(self):
+        """presentation.xml のパート名を取得"""
+        for rel_type, target in self.relationships('').values():
+            if rel_type == _RT_OFFICE_DOCUMENT:
+                return target
+        return 'ppt/presentation.xml'
+
+    def ordered_parts(self, partname, element, id_path):
+        """ID リスト（sldIdLst など）の順序で関連パート名を返す"""
+        rels = self.relationships(partname)
+        parts = []
+        for id_elm in element.iterfind(id_path, NAMESPACES):
+            rel = rels.get(id_elm.get(_R_ID))
+            if rel is not None:
+                parts.append(rel[1])
+        return parts
+
+    def related_part(self, partname, rel_type):
+        """指定種別で関連付けられたパート名を返す（存在しない場合は None）"""
+        for candidate_type, target in self.relationships(partname).values():
+            if candidate_type == rel_type:
+                return target
+        return None
+
+
+def _paragraph_text(p):
+    """a:p 要素のテキスト（python-pptx の _Paragraph.text と同じ規則）"""
+    parts = []
+    for child in p:
+        tag = child.tag
+        if tag == _R_TAG or tag == _FLD_TAG:
+            t = child.find(_T_TAG)
+            if t is not None and t.text is not None:
+                parts.append(t.text)
+        elif tag == _BR_TAG:
+            parts.append('\v')
+    return ''.join(parts)
+
+
+def shape_text(shape_elm):
+    """p:sp 要素のテキスト（python-pptx の Shape.text と同じ規則）"""
+    txBody = shape_elm.find('p:txBody', NAMESPACES)
+    if txBody is None:
+        return ''
+    return '\n'.join(_paragraph_text(p) for p in txBody.iterfind('a:p', NAMESPACES))
+
+
+def iter_part_shapes(root):
+    """パートの spTree 直下のシェイプを (シェイプ番号, テキスト) で返す
+    テキストを持たないシェイプのテキストは None"""
+    spTree = root.find('p:cSld/p:spTree', NAMESPACES)
+    if spTree is None:
+        return
+    shape_num = 0
+    for elm in spTree:
+        if elm.tag not in _SHAPE_TAGS:
+            continue
+        yield shape_num, (shape_text(elm) if elm.tag == _SP_TAG else None)
+        shape_num += 1
+
+
+def _scan_part(package, partname, scope, location, keywords, results):
+    """1つのパートを検査して結果を追加"""
+    root = package.read_xml(partname)
+    for shape_num, text in iter_part_shapes(root):
+        if text is not None and text.strip():
+            found_keywords, total_count = count_keywords(text, keywords)
+            if found_keywords:
+                results.append(_make_result(scope, location, shape_num, text,
+                                            found_keywords, total_count))
+
+
+def list_scope_parts(package, scopes=DEFAULT_SCOPES):
+    """指定スコープで検査するパートを検査順に返す
+    (スコープ, 位置ラベル, パート名) のリスト。
+    レイアウトの一覧はマスターのXMLから取得するため、layouts 指定時のみマスターを読み込む"""
+    parts = []
+    pres_part = package.main_document()
+    pres = package.read_xml(pres_part)
+
+    if 'slides' in scopes or 'notes' in scopes:
+        slide_parts = package.ordered_parts(pres_part, pres, 'p:sldIdLst/p:sldId')
+        for slide_num, slide_part in enumerate(slide_parts, 1):
+            if 'slides' in scopes:
+                parts.append(('slides', slide_num, slide_part))
+            if 'notes' in scopes:
+                notes_part = package.related_part(slide_part, _RT_NOTES_SLIDE)
+                if notes_part is not None:
+                    parts.append(('notes', slide_num, notes_part))
+
+    if 'masters' in scopes or 'layouts' in scopes:
+        # マスタースライドを処理（複数のマスターグループに対応）
+        try:
+            master_parts = package.ordered_parts(pres_part, pres, 'p:sldMasterIdLst/p:sldMasterId')
+            for master_group_num, master_part in enumerate(master_parts):
+                if 'masters' in scopes:
+                    parts.append(('masters', f'Master Group {master_group_num + 1}', master_part))
+                if 'layouts' in scopes:
+                    master = package.read_xml(master_part)
+                    layout_parts = package.ordered_parts(
+                        master_part, master, 'p:sldLayoutIdLst/p:sldLayoutId')
+                    for layout_num, layout_part in enumerate(layout_parts):
+                        parts.append(('layouts',
+                                      f'Master Group {master_group_num + 1}, Layout {layout_num + 1}',
+                                      layout_part))
+        except PackageReadLimitExceeded:
+            raise
+        except Exception as e:
+            print(f"マスタースライド処理エラー: {str(e)}")
+
+    return parts
+
+
+def scan_parts(package, parts, keywords):
+    """list_scope_parts で取得したパートを順に検査して結果を返す
+    （パートを分割して並列に検査する場合も、分割した各部分に対して使用する）"""
+    results = []
+    for scope, location, partname in parts:
+        if scope in ('masters', 'layouts'):
+            try:
+                _scan_part(package, partname, scope, location, keywords, results)
+            except Exception as e:
+                print(f"マスタースライド処理エラー: {str(e)}")
+        else:
+            _scan_part(package, partname, scope, location, keywords, results)
+    return results
+
+
+def find_keywords_in_package(source, keywords, scopes=DEFAULT_SCOPES, stats=None):
+    """PPTXパッケージ内のキーワードを検出 (OR条件)
+    指定スコープに必要なパートのみを読み込む（結果の形式は pptx エンジンと同じ）
+    stats に辞書を渡すと、読み込んだバイト数 'bytes_read' と解析時間 'parse' を記録する"""
+    with RawPackage(source, measure=stats is not None) as package:
+        results = scan_parts(package, list_scope_parts(package, scopes), keywords)
+
+        if stats is not None:
+            stats['bytes_read'] = package.bytes_read
+            stats['parse'] = package.parse_seconds
+
+    return results
@@ -0,0 +1,592 @@
+"""
+Web版（app.py）の負荷試験ツール
+ローカルでサーバーを起動し（または起動済みのサーバーに対して）、サンプルのデッキを使って
+/api/detect・/api/preview・/api/replace を指定した比率・同時実行数・リクエストレートで送信します。
+upload は分割アップロード（/api/uploads）でデッキを送信してから、upload_ids で /api/detect を呼び出します
+（レイテンシはアップロードの開始から検出の完了まで）。
+
+  - エンドポイントごとの p50／p95／p99 レイテンシ、スループット、エラー率、ステータスコードの内訳
+  - 1秒ごとの完了数・エラー数
+  - サーバー（子プロセスを含む）のメモリ使用量（RSS）の推移（Linux のみ）
+
+結果は --json で JSON に保存でき、--compare で以前の結果（リリース間の比較など）と並べて表示します。
+リクエストレートを指定した場合、レイテンシは予定した送信時刻から計測します（送信待ちの時間を含む）。
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from detect_keywords_cli import find_ppt_files, load_config
+from report_format import format_size
+
+
+ENDPOINTS = ('detect', 'preview', 'replace', 'upload')
+DEFAULT_MIX = 'detect=6,preview=3,replace=1,upload=1'
+DEFAULT_SAMPLE_SLIDES = (10, 50, 200)
+SERVER_START_TIMEOUT = 60
+RESULT_FORMAT = 'load_test/1'
+
+
+def parse_mix(text):
+    """'detect=6,preview=3,replace=1' 形式の比率を {エンドポイント: 重み} に変換"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f"不明なエンドポイントです: {name}（{', '.join(ENDPOINTS)} から選択）")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"比率が不正です: {item}")
+        if mix[name] < 0:
+            raise ValueError(f"比率が不正です: {item}")
+    if not any(mix.values()):
+        raise ValueError("比率がすべて 0 です")
+    return mix
+
+
+def generate_sample_deck(file_path, slides, keywords):
+    """キーワードを含むサンプルのデッキを作成"""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"スライド {i + 1}"
+        body = slide.placeholders[1].text_frame
+        body.text = f"{keywords[i % len(keywords)]} に関する説明" if i % 3 == 0 else "本文のテキスト"
+        for j in range(4):
+            body.add_paragraph().text = f"箇条書き {j + 1}"
+        textbox = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(6), Inches(0.5))
+        textbox.text_frame.text = f"© {keywords[0]}"
+    prs.save(file_path)
+
+
+def prepare_decks(args, keywords):
+    """負荷試験に使うデッキを {ファイル名: 内容} で返す"""
+    if args.decks:
+        files = [p for p in find_ppt_files(args.decks) if p.suffix.lower() == '.pptx']
+        if not files:
+            raise ValueError(f"PPTXファイルが見つかりませんでした: {args.decks}")
+    else:
+        # 作成済みのサンプルは再利用する
+        os.makedirs(args.deck_dir, exist_ok=True)
+        files = []
+        for slides in args.sample_slides:
+            file_path = Path(args.deck_dir) / f"sample_{slides}slides.pptx"
+            if not file_path.exists():
+                print(f"サンプルを作成: {file_path}")
+                generate_sample_deck(str(file_path), slides, keywords)
+            files.append(file_path)
+
+    decks = {}
+    for file_path in files:
+        with open(file_path, 'rb') as f:
+            decks[file_path.name] = f.read()
+    return decks
+
+
+def encode_multipart(fields, filename, data):
+    """multipart/form-data の本文と Content-Type を作成"""
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                 f'{value}\r\n').encode('utf-8')
+    body += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+             f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+    body += data
+    body += f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return bytes(body), f'multipart/form-data; boundary={boundary}'
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, log_path=None):
+    """app.py をデバッグモード（自動再読み込み）なしで起動し、応答するまで待つ"""
+    code = ("import app; "
+            f"app.app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)")
+    log = open(log_path, 'w', encoding='utf-8') if log_path else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"サーバーが終了しました（終了コード: {process.returncode}）")
+        try:
+            urllib.request.urlopen(f'{base_url}/api/status', timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("サーバーが起動しませんでした")
+
+
+def stop_server(process):
+    """サーバーを停止（終了処理でワーカープロセスも停止するよう、まず SIGINT を送る）"""
+    if process.poll() is None:
+        if os.name == 'posix':
+            process.send_signal(signal.SIGINT)
+        else:
+            process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def process_tree_rss(pid):
+    """プロセスと子孫プロセスの RSS の合計（バイト）とプロセス数。取得できない環境では (None, None)"""
+    if not os.path.isdir('/proc'):
+        return None, None
+
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # プロセス名に空白や括弧が含まれる場合があるため、最後の ')' 以降を分割する
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    count = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+        count += 1
+        pending.extend(children.get(current, []))
+    return (total, count) if count else (None, None)
+
+
+def percentile(sorted_values, p):
+    """最近傍順位法によるパーセンタイル"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class LoadTest:
+    """負荷試験の実行と集計"""
+
+    def __init__(self, base_url, decks, keywords, mix, concurrency, rate, duration, max_requests,
+                 replacement, unique_replacement, timeout, seed):
+        self.base_url = base_url
+        self.decks = list(decks.items())
+        self.keywords = keywords
+        self.endpoints = [name for name in ENDPOINTS if mix.get(name)]
+        self.weights = [mix[name] for name in self.endpoints]
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.max_requests = max_requests
+        self.replacement = replacement
+        self.unique_replacement = unique_replacement
+        self.timeout = timeout
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._issued = 0
+        self.records = []  # (エンドポイント, 完了時刻, レイテンシ, ステータスコード, エラー, キャッシュ)
+
+    def _next_request(self):
+        """次に送信するリクエスト（番号, 予定時刻, エンドポイント, デッキ）。終了する場合は None"""
+        with self._lock:
+            index = self._issued
+            if self.max_requests and index >= self.max_requests:
+                return None
+            if self.rate:
+                scheduled = self.started + index / self.rate
+            else:
+                scheduled = time.perf_counter()
+            if scheduled - self.started >= self.duration:
+                return None
+            self._issued += 1
+            endpoint = self.random.choices(self.endpoints, self.weights)[0]
+            deck = self.random.choice(self.decks)
+        return index, scheduled, endpoint, deck
+
+    def _request(self, path, body, content_type, method='POST'):
+        """1件送信して (ステータスコード, 本文, キャッシュ) を返す（エラーのステータスは HTTPError）"""
+        request = urllib.request.Request(f'{self.base_url}{path}', data=body,
+                                         headers={'Content-Type': content_type}, method=method)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.status, response.read(), response.headers.get('X-Output-Cache')
+
+    def _send_multipart(self, index, endpoint, deck):
+        """ファイルを multipart/form-data で送信する"""
+        name, data = deck
+        fields = {'keywords': json.dumps(self.keywords, ensure_ascii=False)}
+        if endpoint != 'detect':
+            replacement = self.replacement
+            if endpoint == 'replace' and self.unique_replacement:
+                # 置換結果のキャッシュに当たらないよう置換先をリクエストごとに変える
+                replacement = f"{replacement}{index}"
+            fields['new_keyword'] = replacement
+            fields['action'] = 'replace'
+        # 同じファイル名の同時アップロードが衝突しないよう、リクエストごとにファイル名を変える
+        body, content_type = encode_multipart(fields, f"lt{index:06d}_{name}", data)
+        return self._request(f'/api/{endpoint}', body, content_type)
+
+    def _send_chunked(self, index, deck):
+        """分割アップロードしてから upload_ids で検出する"""
+        name, data = deck
+        body = json.dumps({'filename': f"lt{index:06d}_{name}", 'size': len(data)}).encode('utf-8')
+        _, content, _ = self._request('/api/uploads', body, 'application/json')
+        upload = json.loads(content)
+
+        chunk_size = upload['chunk_size']
+        for chunk_index in range(upload['total_chunks']):
+            start = chunk_index * chunk_size
+            self._request(f"/api/uploads/{upload['upload_id']}/chunks/{chunk_index}",
+                          data[start:start + chunk_size], 'application/octet-stream', method='PUT')
+
+        fields = {'upload_ids': json.dumps([upload['upload_id']]),
+                  'keywords': json.dumps(self.keywords, ensure_ascii=False)}
+        return self._request('/api/detect', urllib.parse.urlencode(fields).encode('utf-8'),
+                             'application/x-www-form-urlencoded')
+
+    def _send(self, index, endpoint, deck):
+        """1件送信して (ステータスコード, エラー, キャッシュ) を返す"""
+        try:
+            if endpoint == 'upload':
+                status, _, cache = self._send_chunked(index, deck)
+            else:
+                status, _, cache = self._send_multipart(index, endpoint, deck)
+            return status, None, cache
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, None, None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {str(e)}", None
+
+    def _worker(self):
+        while True:
+            job = self._next_request()
+            if job is None:
+                return
+            index, scheduled, endpoint, deck = job
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            status, error, cache = self._send(index, endpoint, deck)
+            finished = time.perf_counter()
+            with self._lock:
+                self.records.append((endpoint, finished - self.started, finished - scheduled,
+                                     status, error, cache))
+
+    def run(self, server_pid=None, rss_interval=1.0):
+        """負荷をかけ、終了後に集計結果を返す"""
+        self.rss_samples = []
+        stop = threading.Event()
+
+        def sample_rss():
+            while True:
+                rss, processes = process_tree_rss(server_pid)
+                if rss is not None:
+                    self.rss_samples.append([round(time.perf_counter() - self.started, 3), rss, processes])
+                if stop.wait(rss_interval):
+                    return
+
+        self.started = time.perf_counter()
+        sampler = None
+        if server_pid:
+            sampler = threading.Thread(target=sample_rss, daemon=True)
+            sampler.start()
+
+        workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.elapsed = time.perf_counter() - self.started
+
+        stop.set()
+        if sampler is not None:
+            sampler.join()
+        return self.summarize()
+
+    def _summarize_records(self, records):
+        latencies = sorted(r[2] for r in records)
+        errors = [r for r in records if r[4] is not None or not (200 <= r[3] < 300)]
+        status_codes = {}
+        for r in records:
+            key = str(r[3]) if r[3] is not None else 'exception'
+            status_codes[key] = status_codes.get(key, 0) + 1
+        summary = {
+            'requests': len(records),
+            'errors': len(errors),
+            'error_rate': len(errors) / len(records) if records else 0.0,
+            'throughput': len(records) / self.elapsed if self.elapsed else 0.0,
+            'latency': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'mean': sum(latencies) / len(latencies) if latencies else None,
+                'max': latencies[-1] if latencies else None
+            },
+            'status_codes': status_codes
+        }
+        cache = [r[5] for r in records if r[5]]
+        if cache:
+            summary['output_cache'] = {'hits': cache.count('HIT'), 'misses': cache.count('MISS')}
+        exceptions = sorted({r[4] for r in records if r[4]})
+        if exceptions:
+            summary['exceptions'] = exceptions[:10]
+        return summary
+
+    def summarize(self):
+        endpoints = {}
+        for name in self.endpoints:
+            records = [r for r in self.records if r[0] == name]
+            if records:
+                endpoints[name] = self._summarize_records(records)
+
+        # 1秒ごとの完了数・エラー数
+        timeline = [[second, 0, 0] for second in range(int(self.elapsed) + 1)]
+        for r in self.records:
+            bucket = timeline[min(int(r[1]), len(timeline) - 1)]
+            bucket[1] += 1
+            if r[4] is not None or not (200 <= r[3] < 300):
+                bucket[2] += 1
+
+        rss_values = [sample[1] for sample in self.rss_samples]
+        return {
+            'elapsed': self.elapsed,
+            'overall': self._summarize_records(self.records),
+            'endpoints': endpoints,
+            'timeline': {'columns': ['second', 'completed', 'errors'], 'rows': timeline},
+            'server_rss': {
+                'columns': ['second', 'rss_bytes', 'processes'],
+                'rows': self.rss_samples,
+                'peak': max(rss_values) if rss_values else None,
+                'last': rss_values[-1] if rss_values else None
+            }
+        }
+
+
+def format_ms(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:.0f}ms"
+
+
+def print_report(report):
+    """結果を表示"""
+    result = report['result']
+    settings = report['settings']
+    rate = f"{settings['rate']:g} リクエスト/秒" if settings['rate'] else '無制限'
+    print("=" * 80)
+    print("負荷試験の結果")
+    print("=" * 80)
+    print(f"同時実行数: {settings['concurrency']}  リクエストレート: {rate}  "
+          f"比率: {settings['mix']}  経過時間: {result['elapsed']:.1f} 秒")
+    print(f"デッキ: {', '.join(f'{name} ({format_size(size)})' for name, size in settings['decks'].items())}")
+    print("")
+    print(f"{'':<10}{'件数':>7}{'エラー率':>9}{'スループット':>12}{'p50':>9}{'p95':>9}{'p99':>9}{'最大':>9}")
+    rows = list(result['endpoints'].items()) + [('全体', result['overall'])]
+    for name, summary in rows:
+        latency = summary['latency']
+        print(f"{name:<10}{summary['requests']:>7}{summary['error_rate'] * 100:>8.1f}%"
+              f"{summary['throughput']:>10.2f}/s{format_ms(latency['p50']):>9}{format_ms(latency['p95']):>9}"
+              f"{format_ms(latency['p99']):>9}{format_ms(latency['max']):>9}")
+
+    for name, summary in rows:
+        codes = ', '.join(f"{code}: {count}" for code, count in sorted(summary['status_codes'].items()))
+        extra = ''
+        if 'output_cache' in summary:
+            extra = f"  置換結果のキャッシュ: ヒット {summary['output_cache']['hits']} / ミス {summary['output_cache']['misses']}"
+        print(f"  {name} ステータス: {codes}{extra}")
+        for message in summary.get('exceptions', []):
+            print(f"    ⚠️ {message}")
+
+    rss = result['server_rss']
+    if rss['rows']:
+        print("")
+        print(f"--- サーバーのメモリ使用量（子プロセスを含む。ピーク {format_size(rss['peak'])}） ---")
+        step = max(1, len(rss['rows']) // 20)
+        for second, value, processes in rss['rows'][::step]:
+            bar = '#' * round(value / rss['peak'] * 40) if rss['peak'] else ''
+            print(f"{second:>7.1f} 秒 {format_size(value):>10} ({processes} プロセス)  {bar}")
+
+
+def print_comparison(report, baseline):
+    """以前の結果と比較して表示"""
+    print("")
+    print(f"--- 比較（基準: {baseline.get('started', '-')} {baseline.get('label') or ''}） ---")
+    print(f"{'':<10}{'項目':<12}{'基準':>12}{'今回':>12}{'変化':>9}")
+    current_rows = dict(report['result']['endpoints'], **{'全体': report['result']['overall']})
+    baseline_rows = dict(baseline['result']['endpoints'], **{'全体': baseline['result']['overall']})
+    for name, current in current_rows.items():
+        before = baseline_rows.get(name)
+        if before is None:
+            continue
+        items = [
+            ('スループット', before['throughput'], current['throughput'], lambda v: f"{v:.2f}/s"),
+            ('エラー率', before['error_rate'], current['error_rate'], lambda v: f"{v * 100:.1f}%"),
+        ] + [(p, before['latency'][p], current['latency'][p], format_ms) for p in ('p50', 'p95', 'p99')]
+        for label, old, new, fmt in items:
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.0f}%" if old else '-'
+            print(f"{name:<10}{label:<12}{fmt(old):>12}{fmt(new):>12}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Web版（app.py）に負荷をかけ、レイテンシ・スループット・エラー率・メモリ使用量を計測します',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用例:
+  python load_test.py
+  python load_test.py --concurrency 8 --rate 5 --duration 60 --json result.json
+  python load_test.py --mix detect=1,replace=1 --decks TestData --compare baseline.json
+  python load_test.py --mix detect=1,upload=1
+  python load_test.py --url http://127.0.0.1:5000 --server-pid 12345
+        """
+    )
+    parser.add_argument('--url', help='起動済みのサーバーの URL（省略時はローカルでサーバーを起動）')
+    parser.add_argument('--server-pid', type=int, help='--url 指定時にメモリ使用量を記録するサーバーのプロセスID')
+    parser.add_argument('--server-log', help='起動したサーバーの出力を保存するファイル')
+    parser.add_argument('--decks', help='使用するデッキのディレクトリ（省略時はサンプルを作成）')
+    parser.add_argument('--deck-dir', default='loadtest_decks', help='サンプルの保存先（既定: loadtest_decks）')
+    parser.add_argument('--sample-slides', type=int, nargs='+', default=list(DEFAULT_SAMPLE_SLIDES),
+                        help=f"作成するサンプルのスライド数（1ファイルずつ。既定: {' '.join(map(str, DEFAULT_SAMPLE_SLIDES))}）")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'エンドポイントの比率（既定: {DEFAULT_MIX}）')
+    parser.add_argument('--concurrency', '-c', type=int, default=4, help='同時実行数（既定: 4）')
+    parser.add_argument('--rate', '-r', type=float, default=0,
+                        help='リクエストレート（リクエスト/秒。0 で同時実行数の範囲で最大。既定: 0）')
+    parser.add_argument('--duration', '-d', type=float, default=30, help='実行時間（秒。既定: 30）')
+    parser.add_argument('--requests', '-n', type=int, default=0, help='送信するリクエスト数の上限（0 で無制限）')
+    parser.add_argument('--keywords', '-k', nargs='+', help='検出するキーワード（既定: 設定ファイル）')
+    parser.add_argument('--replacement', default='NewCompany', help='置換先（既定: NewCompany）')
+    parser.add_argument('--unique-replacement', action='store_true',
+                        help='置換先をリクエストごとに変え、置換結果のキャッシュを使わせない')
+    parser.add_argument('--timeout', type=float, default=300, help='1リクエストのタイムアウト（秒。既定: 300）')
+    parser.add_argument('--rss-interval', type=float, default=1.0, help='メモリ使用量の記録間隔（秒。既定: 1）')
+    parser.add_argument('--seed', type=int, default=0, help='エンドポイント・デッキの選択に使う乱数のシード')
+    parser.add_argument('--label', help='結果に記録するラベル（リリース名など）')
+    parser.add_argument('--json', help='結果をJSONファイルに保存')
+    parser.add_argument('--compare', help='以前の結果（--json で保存したファイル）と比較')
+
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.concurrency < 1:
+        parser.error('同時実行数は 1 以上を指定してください')
+
+    config = load_config()
+    keywords = args.keywords if args.keywords else config['default_keywords']
+
+    try:
+        decks = prepare_decks(args, keywords)
+    except ValueError as e:
+        print(f"エラー: {str(e)}")
+        sys.exit(1)
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        server_pid = args.server_pid
+    else:
+        print("サーバーを起動しています...")
+        try:
+            server, base_url = start_server(find_free_port(), args.server_log)
+        except RuntimeError as e:
+            print(f"エラー: {str(e)}")
+            sys.exit(1)
+        server_pid = server.pid
+
+    started = datetime.now()
+    print(f"負荷試験を開始: {base_url}（{args.duration:g} 秒）")
+    try:
+        test = LoadTest(base_url, decks, keywords, mix, args.concurrency, args.rate, args.duration,
+                        args.requests, args.replacement, args.unique_replacement, args.timeout, args.seed)
+        result = test.run(server_pid=server_pid, rss_interval=args.rss_interval)
+
+        # サーバー側の統計（アドミッション制御・キャッシュなど）
+        try:
+            with urllib.request.urlopen(f'{base_url}/api/status', timeout=10) as response:
+                result['server_status'] = json.loads(response.read())
+        except Exception as e:
+            print(f"警告: サーバーの統計を取得できませんでした: {str(e)}")
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    report = {
+        'format': RESULT_FORMAT,
+        'label': args.label,
+        'started': started.isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'settings': {
+            'url': base_url,
+            'mix': args.mix,
+            'concurrency': args.concurrency,
+            'rate': args.rate,
+            'duration': args.duration,
+            'max_requests': args.requests,
+            'keywords': keywords,
+            'unique_replacement': args.unique_replacement,
+            'decks': {name: len(data) for name, data in decks.items()}
+        },
+        'result': result
+    }
+
+    print_report(report)
+
+    if args.compare:
+        try:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                print_comparison(report, json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"警告: 比較する結果を読み込めませんでした: {str(e)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+置換結果のキャッシュ（Web版の /api/replace）
+入力ファイルの内容のハッシュ・キーワード・処理内容から決まるキーで、生成した .pptx／ZIP をディスクに保存します。
+同じ内容のリクエストは解析・保存を行わず、保存済みのファイルをそのまま返します。
+合計サイズが上限を超えた場合は、最後に使われてから最も時間が経ったものから削除します（LRU）。
+Windows など開いているファイルを削除できない環境では、削除できなかったファイルを次回の削除時に再試行し、
+削除できるまで合計サイズに含めます。
+
+保存先:
+  <base_dir>/<キーの先頭2文字>/<キー>
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+
+
+# 置換処理の出力が変わる変更をした場合は上げる（古いキャッシュを使わないようにする）
+KEY_VERSION = 1
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path):
+    """ファイルの内容の SHA-256（16進数）"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class OutputCache:
+    """サイズ上限付きの LRU ディスクキャッシュ
+
+    base_dir: 保存先ディレクトリ
+    max_bytes: キャッシュの合計サイズの上限（バイト）
+    """
+
+    def __init__(self, base_dir, max_bytes):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # キー → サイズ（先頭が最も古い）
+        self._pending_deletes = {}  # 削除できなかったファイルのキー → サイズ（合計サイズに含める）
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+        self._load()
+
+    def _load(self):
+        """保存済みのキャッシュを最終使用日時（更新日時）の順に登録"""
+        found = []
+        for root, _, filenames in os.walk(self.base_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if filename.endswith('.tmp'):
+                    # 書き込み途中で停止した場合の残り
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, filename, stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(**fields):
+        """キャッシュキー（fields は JSON に変換できる値）"""
+        fields['version'] = KEY_VERSION
+        encoded = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.base_dir, key[:2], key)
+
+    def open(self, key):
+        """キャッシュを読み込み用に開く（ない場合は None）
+        送信中に追い出された場合、POSIX では開いたファイルを読み続けられる。
+        開いているファイルを削除できない環境では、閉じた後の削除時に再試行する"""
+        with self._lock:
+            if key not in self._entries:
+                self._misses += 1
+                return None
+            try:
+                f = open(self._path(key), 'rb')
+            except OSError:
+                # 外部から削除された場合
+                self._total_bytes -= self._entries.pop(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+        # 再起動後も使用順を保てるよう更新日時を更新
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return f
+
+    def put(self, key, data):
+        """生成したファイルの内容（bytes）を保存"""
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"置換結果のキャッシュの保存に失敗しました: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            if key in self._pending_deletes:
+                # 削除できなかった古いファイルは置き換えられた
+                self._total_bytes -= self._pending_deletes.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        """合計サイズが上限に収まるまで古いものから削除（ロックを取得した状態で呼び出す）"""
+        for key, size in list(self._pending_deletes.items()):
+            if self._remove(key):
+                del self._pending_deletes[key]
+                self._total_bytes -= size
+
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._evictions += 1
+            if self._remove(key):
+                self._total_bytes -= size
+            else:
+                self._pending_deletes[key] = size
+
+    def _remove(self, key):
+        """キャッシュのファイルを削除（削除できなかった場合は False）"""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Windows で送信中のファイルなど
+            return False
+        return True
+
+    def stats(self):
+        """監視用の統計値"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'pending_deletes': len(self._pending_deletes)
+            }
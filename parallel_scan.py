@@ -0,0 +1,188 @@
+"""
+1ファイル内の並列検出（スライド数の多い巨大なデッキ向け）
+デッキのスライド・レイアウト・マスターなどのパートを一定数ずつのチャンクに分け、
+ワーカープロセスがそれぞれパッケージ（ZIP）から担当するパートだけを読み込んで検査します。
+チャンクは検査順に連続したパートで構成し、結果をチャンクの順に結合するため、
+直列の検出（raw エンジン）と同じ順序・内容になります。
+
+時間内に終わらなかったデッキの残りのチャンクは、ワーカープロセスのプールごと停止して打ち切ります。
+同じプールで検出中だった他のデッキは、新しいプールで検出し直します。
+"""
+
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+from keyword_scanner import DEFAULT_SCOPES, RawPackage, list_scope_parts, scan_parts
+from scan_worker import STATUS_ERROR, STATUS_OK, STATUS_TIMEOUT
+
+
+# 結果を待つ間にプールの停止を確認する間隔（秒）
+_POLL_INTERVAL = 0.1
+
+
+class ParallelScanInterrupted(RuntimeError):
+    """他のデッキの打ち切りでプールが停止され、検出が中断された"""
+
+
+def _scan_chunk(args):
+    """ワーカープロセス: 1チャンク分のパートを検査"""
+    file_path, parts, keywords = args
+    with RawPackage(file_path) as package:
+        return scan_parts(package, parts, keywords)
+
+
+class ParallelScanner:
+    """巨大なデッキをパート単位に分割して並列に検出する
+
+    workers: ワーカープロセス数（0 または None で CPU 数。1 以下では並列化しない）
+    min_parts: 並列に検査するパート数の下限（これ未満のデッキは通常どおり検査する）
+    min_bytes: パート数を確認するファイルサイズの下限（小さなファイルは確認せずに通常どおり検査する）
+    chunk_parts: 1チャンクのパート数の上限
+    plan_max_bytes: パート数の確認で読み込む presentation.xml・マスターなどの展開後サイズの上限
+                    （超える場合は呼び出し元で解析せず、処理予算付きの通常の検出に任せる）
+    """
+
+    def __init__(self, workers=None, min_parts=200, min_bytes=1024 * 1024, chunk_parts=50,
+                 plan_max_bytes=16 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parts = min_parts
+        self.min_bytes = min_bytes
+        self.chunk_parts = chunk_parts
+        self.plan_max_bytes = plan_max_bytes
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 1
+
+    def plan(self, file_path, scopes=DEFAULT_SCOPES):
+        """並列に検査する場合は検査するパートのリスト、通常どおり検査する場合は None を返す"""
+        if not self.enabled:
+            return None
+        try:
+            if os.path.getsize(file_path) < self.min_bytes:
+                return None
+            with RawPackage(str(file_path), max_read_bytes=self.plan_max_bytes) as package:
+                parts = list_scope_parts(package, scopes)
+        except Exception:
+            # 読み込めないファイルや確認に使うパートが大きすぎるファイルは、通常の検出で処理予算の範囲で扱う
+            return None
+        return parts if len(parts) >= self.min_parts else None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Flask のスレッドから安全に起動できるよう spawn を使う
+                ctx = multiprocessing.get_context('spawn')
+                self._pool = _WorkerPool(ctx.Pool(self.workers))
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """打ち切ったデッキの残りのチャンクを止めるため、プールごと停止する（次の検出で新しく起動）"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.terminate()
+
+    def _chunks(self, parts):
+        # 負荷が偏らないよう、ワーカー数の数倍のチャンクに分ける
+        size = max(1, min(self.chunk_parts, math.ceil(len(parts) / (self.workers * 4))))
+        return [parts[i:i + size] for i in range(0, len(parts), size)]
+
+    def scan_async(self, file_path, parts, keywords):
+        """並列検出を開始し、結果を待つためのオブジェクトを返す
+        （get(timeout) で検出結果のリスト。結果を使わない場合は cancel() で打ち切る）"""
+        chunks = self._chunks(parts)
+        pool = self._get_pool()
+        pending = pool.pool.map_async(
+            _scan_chunk, [(str(file_path), chunk, list(keywords)) for chunk in chunks])
+        return _PendingScan(self, pool, pending, len(chunks))
+
+    def scan_file(self, file_path, parts, keywords, timeout=None):
+        """並列に検出し、scan_worker.scan_file と同じ形式の辞書を返す
+        {'success', 'status', 'results', 'error', 'engine', 'chunks'}"""
+        deadline = time.monotonic() + timeout if timeout else None
+        result = {'success': False, 'results': [], 'error': None, 'engine': 'raw',
+                  'chunks': len(self._chunks(parts))}
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            try:
+                if remaining is not None and remaining <= 0:
+                    raise multiprocessing.TimeoutError()
+                result['results'] = self.scan_async(file_path, parts, keywords).get(remaining)
+                result['success'] = True
+                result['status'] = STATUS_OK
+            except ParallelScanInterrupted:
+                # 他のデッキの打ち切りでプールが停止された場合は、残り時間で新しいプールで検出し直す
+                continue
+            except multiprocessing.TimeoutError:
+                result['status'] = STATUS_TIMEOUT
+                result['error'] = f'処理時間の上限（{timeout:g} 秒）を超えました'
+            except Exception as e:
+                result['status'] = STATUS_ERROR
+                result['error'] = str(e)
+            return result
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+
+
+class _WorkerPool:
+    """並列検出のワーカープロセスのプール（停止されたかを検出中のデッキから確認できる）"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.terminated = threading.Event()
+        self._lock = threading.Lock()
+
+    def terminate(self):
+        with self._lock:
+            if self.terminated.is_set():
+                return
+            self.terminated.set()
+        self.pool.terminate()
+        self.pool.join()
+
+
+class _PendingScan:
+    """並列検出の結果待ち"""
+
+    def __init__(self, scanner, pool, pending, chunks):
+        self._scanner = scanner
+        self._pool = pool
+        self._pending = pending
+        self.chunks = chunks
+
+    def get(self, timeout=None):
+        """チャンクの順に結合した検出結果
+        時間内に終わらない場合は残りのチャンクを打ち切って multiprocessing.TimeoutError、
+        他のデッキの打ち切りでプールが停止された場合は ParallelScanInterrupted を送出する"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self._pending.ready():
+            if self._pool.terminated.is_set():
+                raise ParallelScanInterrupted('並列検出が中断されました')
+            wait = _POLL_INTERVAL
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.cancel()
+                    raise multiprocessing.TimeoutError()
+                wait = min(wait, remaining)
+            self._pending.wait(wait)
+
+        results = []
+        for chunk_results in self._pending.get():
+            results.extend(chunk_results)
+        return results
+
+    def cancel(self):
+        """結果を待たずに打ち切る（処理中・未処理のチャンクが残っている場合はプールごと停止する）"""
+        if not self._pending.ready():
+            self._scanner._discard_pool(self._pool)
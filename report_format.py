@@ -0,0 +1,14 @@
+"""
+診断・計測ツールのレポート表示用の書式（diagnose_pptx・scan_profiler・load_test で共有）
+"""
+
+
+def format_size(size):
+    """バイト数を読みやすい形式に変換（None は '-'）"""
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -0,0 +1,136 @@
+"""
+キーワード検出 常駐プロセス（デーモン）
+python-pptx / lxml の読み込みや設定ファイルの読み込みを起動時に1回だけ行い、
+ローカルの Unix ソケットで検査リクエストを待ち受けます。
+
+プロトコル（1接続 = 1リクエスト）:
+  クライアント → サーバー: リクエストを JSON 1行で送信
+  サーバー → クライアント: 検査の進行イベントを JSON 1行ずつ送信し、最後に接続を閉じる
+
+このモジュールは通信部分のみを扱い、検査処理は呼び出し側から渡されます。
+クライアント側で重いライブラリを読み込まないよう、標準ライブラリのみを使用します。
+"""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+
+
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), 'detect_keywords_cli.sock')
+
+
+def is_supported():
+    """Unix ソケットが使用できる環境か"""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def _send_event(wfile, event):
+    wfile.write((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+    wfile.flush()
+
+
+class _ScanRequestHandler(socketserver.StreamRequestHandler):
+    """1件の検査リクエストを処理し、進行イベントを順に返す"""
+
+    def handle(self):
+        try:
+            line = self.rfile.readline()
+            if not line:
+                return
+            request = json.loads(line.decode('utf-8'))
+            if request.get('command') == 'ping':
+                _send_event(self.wfile, {'event': 'pong'})
+                return
+            for event in self.server.scan_handler(request):
+                _send_event(self.wfile, event)
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアントが途中で切断した場合は処理を打ち切る
+            print("クライアントが切断しました")
+        except Exception as e:
+            print(f"リクエスト処理エラー: {str(e)}")
+            try:
+                _send_event(self.wfile, {'event': 'error', 'error': str(e)})
+            except OSError:
+                pass
+
+
+class ScanDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """検査リクエストを待ち受ける常駐サーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, scan_handler):
+        # scan_handler(request) は進行イベント（辞書）を順に返すジェネレータ
+        self.scan_handler = scan_handler
+        self.socket_path = socket_path
+        super().__init__(socket_path, _ScanRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+
+def create_server(socket_path, scan_handler):
+    """ソケットを作成して待ち受けの準備をする（前回の残骸のソケットファイルは置き換える）
+    既に起動中の常駐プロセスがある場合は RuntimeError"""
+    if os.path.exists(socket_path):
+        # 前回の残骸か、既に起動中のプロセスがあるかを確認
+        if ping(socket_path):
+            raise RuntimeError(f"既に常駐プロセスが起動しています: {socket_path}")
+        os.remove(socket_path)
+
+    server = ScanDaemon(socket_path, scan_handler)
+    try:
+        os.chmod(socket_path, 0o600)
+    except OSError:
+        server.server_close()
+        raise
+    return server
+
+
+def serve(socket_path, scan_handler):
+    """常駐プロセスを起動して Ctrl+C まで待ち受ける"""
+    server = create_server(socket_path, scan_handler)
+
+    # SIGTERM でもソケットファイルを片付けてから終了する
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        print(f"常駐プロセスを起動しました: {socket_path}")
+        print("終了するには Ctrl+C を押してください。")
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def ping(socket_path, timeout=1.0):
+    """常駐プロセスが応答するか確認"""
+    try:
+        for event in send_request(socket_path, {'command': 'ping'}, timeout=timeout):
+            if event.get('event') == 'pong':
+                return True
+    except OSError:
+        return False
+    return False
+
+
+def send_request(socket_path, request, timeout=None):
+    """常駐プロセスにリクエストを送信し、進行イベントを順に返す
+    接続できない場合は OSError を送出する"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as rfile:
+            for line in rfile:
+                yield json.loads(line.decode('utf-8'))
+    finally:
+        sock.close()
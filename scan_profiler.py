@@ -0,0 +1,227 @@
+"""
+検出処理のプロファイル（CLI の --profile）
+ファイルごとの処理時間（読込・解析と検査の内訳）、読み込んだバイト数、ピークメモリと、
+関数ごとの処理時間（cProfile）を記録し、遅いファイル・処理速度の推移・ホットスポットを集計します。
+
+計測はワーカープロセス（処理予算が無制限の場合は呼び出し元のプロセス）で行い、
+結果は JSON に変換できる形式で返すため、常駐モードでもそのまま転送できます。
+--profile を指定しない場合、このモジュールの処理は一切実行されません。
+"""
+
+import cProfile
+import marshal
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+from keyword_scanner import find_keywords_in_package, find_keywords_in_presentation
+from report_format import format_size
+
+
+# tracemalloc で記録するスタックの深さ
+TRACEMALLOC_FRAMES = 10
+
+
+def reset_peak_rss():
+    """プロセスのピークメモリ（VmHWM）をリセット（Linux のみ）"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """プロセスのピークメモリ（バイト）。取得できない環境では None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss は Linux では KB、macOS ではバイト
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _dump_snapshot(snapshot_path, metrics):
+    """tracemalloc のスナップショットを保存（保存にかかった時間は計測値から除く）"""
+    started = time.perf_counter()
+    tracemalloc.take_snapshot().dump(snapshot_path)
+    metrics['snapshot'] = snapshot_path
+    metrics['snapshot_time'] = time.perf_counter() - started
+
+
+def profile_detection(file_path, keywords, scopes, engine, snapshot_path=None):
+    """計測しながら1ファイルのキーワードを検出し、(検出結果, 計測値) を返す
+    snapshot_path を指定した場合は tracemalloc のスナップショットを保存する
+    （pptx エンジンは解析直後、raw エンジンはパートごとに読み込み・検査するため検出後）。
+    tracemalloc はスナップショットを保存するファイルの計測中のみ有効にする"""
+    metrics = {}
+    profiler = cProfile.Profile()
+    own_tracing = bool(snapshot_path) and not tracemalloc.is_tracing()
+    if own_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        reset_peak_rss()
+
+        profiler.enable()
+        try:
+            if engine == 'raw':
+                stats = {}
+                started = time.perf_counter()
+                results = find_keywords_in_package(str(file_path), keywords, scopes, stats=stats)
+                metrics['parse'] = stats['parse']
+                metrics['scan'] = max(0.0, time.perf_counter() - started - stats['parse'])
+                metrics['bytes_read'] = stats['bytes_read']
+            else:
+                from pptx import Presentation
+                started = time.perf_counter()
+                prs = Presentation(str(file_path))
+                metrics['parse'] = time.perf_counter() - started
+                metrics['bytes_read'] = os.path.getsize(file_path)
+                if snapshot_path:
+                    # 全パートを読み込んだ直後がメモリ使用量の最大に近い
+                    profiler.disable()
+                    _dump_snapshot(snapshot_path, metrics)
+                    profiler.enable()
+                started = time.perf_counter()
+                results = find_keywords_in_presentation(prs, keywords, scopes)
+                metrics['scan'] = time.perf_counter() - started
+        finally:
+            profiler.disable()
+
+        metrics['peak_rss'] = peak_rss()
+        if tracemalloc.is_tracing():
+            metrics['peak_python_heap'] = tracemalloc.get_traced_memory()[1]
+        if engine == 'raw' and snapshot_path:
+            _dump_snapshot(snapshot_path, metrics)
+    finally:
+        if own_tracing:
+            tracemalloc.stop()
+
+    # JSON で転送できるよう (ファイル, 行, 関数名, 呼び出し回数(再帰除く), 呼び出し回数, 自身の時間, 累積時間) のリストにする
+    profiler.create_stats()
+    metrics['functions'] = [[filename, line, name, cc, nc, tt, ct]
+                            for (filename, line, name), (cc, nc, tt, ct, _) in profiler.stats.items()]
+    return results, metrics
+
+
+class ScanProfile:
+    """ファイルごとの計測値を集計する"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files = {}      # 進行イベントの index → ファイルごとの計測値
+        self.functions = {}  # (ファイル, 行, 関数名) → [cc, nc, tt, ct]
+
+    def add(self, index, result, retry=False):
+        """1ファイル分の計測値（result['profile']）を追加（再検査の場合は同じファイルに加算する）"""
+        metrics = result.get('profile') or {}
+        entry = self.files.get(index) if retry else None
+        if entry is None:
+            entry = {'file': result['file'], 'wall': 0.0, 'parse': 0.0, 'scan': 0.0,
+                     'bytes_read': 0, 'peak_rss': None, 'status': None, 'snapshot': None}
+            self.files[index] = entry
+
+        # スナップショットの保存時間は処理時間に含めない
+        entry['wall'] += max(0.0, metrics.get('wall', 0.0) - metrics.get('snapshot_time', 0.0))
+        entry['parse'] += metrics.get('parse', 0.0)
+        entry['scan'] += metrics.get('scan', 0.0)
+        entry['bytes_read'] += metrics.get('bytes_read', 0)
+        if metrics.get('peak_rss') is not None:
+            entry['peak_rss'] = max(entry['peak_rss'] or 0, metrics['peak_rss'])
+        if metrics.get('snapshot'):
+            entry['snapshot'] = metrics['snapshot']
+        entry['status'] = result.get('status')
+        entry['engine'] = result.get('engine')
+        entry['finished_at'] = time.perf_counter() - self.started
+
+        for filename, line, name, cc, nc, tt, ct in metrics.get('functions', []):
+            totals = self.functions.setdefault((filename, line, name), [0, 0, 0.0, 0.0])
+            totals[0] += cc
+            totals[1] += nc
+            totals[2] += tt
+            totals[3] += ct
+
+    def slowest(self, top):
+        return sorted(self.files.values(), key=lambda e: e['wall'], reverse=True)[:top]
+
+    def format_report(self, top=10):
+        """プロファイル結果を整形"""
+        output = []
+        entries = list(self.files.values())
+        if not entries:
+            return ""
+
+        elapsed = max(e['finished_at'] for e in entries)
+        output.append("=" * 80)
+        output.append("プロファイル")
+        output.append("=" * 80)
+        output.append(f"ファイル数: {len(entries)}  経過時間: {elapsed:.2f} 秒  "
+                      f"処理速度: {len(entries) / elapsed if elapsed else 0:.2f} ファイル/秒")
+        output.append(f"読込・解析: {sum(e['parse'] for e in entries):.2f} 秒  "
+                      f"検査: {sum(e['scan'] for e in entries):.2f} 秒  "
+                      f"読み込んだバイト数: {format_size(sum(e['bytes_read'] for e in entries))}")
+
+        output.append("")
+        output.append(f"--- 処理時間の長いファイル（上位 {top} 件） ---")
+        output.append(f"{'合計':>9} {'読込・解析':>9} {'検査':>9} {'読込バイト':>10} {'ピークメモリ':>10}  ファイル")
+        for e in self.slowest(top):
+            status = '' if e['status'] == 'ok' else f"  ({e['status']})"
+            output.append(f"{e['wall']:>8.3f}s {e['parse']:>8.3f}s {e['scan']:>8.3f}s "
+                          f"{format_size(e['bytes_read']):>10} {format_size(e['peak_rss']):>10}  "
+                          f"{e['file']}{status}")
+
+        # 処理速度の推移（最大20区間）
+        interval = max(1, math.ceil(elapsed / 20))
+        buckets = [0] * (int(elapsed // interval) + 1)
+        for e in entries:
+            buckets[int(e['finished_at'] // interval)] += 1
+        output.append("")
+        output.append(f"--- 処理速度の推移（{interval} 秒ごと） ---")
+        peak = max(buckets)
+        for i, count in enumerate(buckets):
+            bar = '#' * (round(count / peak * 40) if peak else 0)
+            output.append(f"{i * interval:>6}～{(i + 1) * interval:>6} 秒 {count / interval:>7.2f} ファイル/秒  {bar}")
+
+        if self.functions:
+            output.append("")
+            output.append(f"--- 関数ごとの処理時間（自身の時間の上位 {top} 件） ---")
+            output.append(f"{'自身の時間':>10} {'累積時間':>10} {'呼び出し回数':>12}  関数")
+            hotspots = sorted(self.functions.items(), key=lambda item: item[1][2], reverse=True)[:top]
+            for (filename, line, name), (cc, nc, tt, ct) in hotspots:
+                location = f"{os.path.basename(filename)}:{line}({name})" if line else name
+                output.append(f"{tt:>9.3f}s {ct:>9.3f}s {nc:>12}  {location}")
+
+        return "\n".join(output)
+
+    def dump(self, directory, top=10):
+        """オフライン分析用に cProfile の集計（profile.pstats）を保存し、
+        tracemalloc のスナップショットは処理時間の長いファイルの分だけ残す"""
+        os.makedirs(directory, exist_ok=True)
+
+        # pstats 形式: {(ファイル, 行, 関数名): (cc, nc, tt, ct, 呼び出し元)}
+        stats = {key: (cc, nc, tt, ct, {}) for key, (cc, nc, tt, ct) in self.functions.items()}
+        pstats_path = os.path.join(directory, 'profile.pstats')
+        with open(pstats_path, 'wb') as f:
+            marshal.dump(stats, f)
+
+        keep = {e['snapshot'] for e in self.slowest(top) if e['snapshot']}
+        for e in self.files.values():
+            if e['snapshot'] and e['snapshot'] not in keep:
+                try:
+                    os.remove(e['snapshot'])
+                except OSError:
+                    pass
+        return pstats_path, sorted(keep)
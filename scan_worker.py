@@ -0,0 +1,320 @@
+"""
+ファイル単位の処理予算（時間・メモリ）付きキーワード検出
+検出はワーカープロセスで行い、時間の上限を超えたファイルはワーカーごと停止して打ち切ります。
+メモリの上限は、解析前のパッケージサイズからの見積もりと、
+ワーカープロセスのアドレス空間の上限（Unix のみ）で判定します。
+
+inprocess_limit を指定した場合のみ、見積もりが小さいファイルはワーカープロセスを使わず呼び出し元のプロセスで検出し、
+プロセス間の受け渡しを省きます（実行中の検出は止められないため、時間の上限は適用されません）。
+ワーカープロセスは使い回し、処理予算はファイルごとに指定できます（常駐モードではリクエストごとに異なる）。
+
+打ち切ったファイルは、必要なパートのみを読み込む raw エンジンで再検査できます。
+"""
+
+import contextlib
+import multiprocessing
+import queue
+import zipfile
+
+from keyword_scanner import (
+    DEFAULT_ENGINE, DEFAULT_SCOPES, find_keywords_in_package, find_keywords_in_presentation
+)
+
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_TIMEOUT = 'timeout'
+STATUS_TOO_LARGE = 'too_large'
+
+STATUS_LABELS = {
+    STATUS_ERROR: 'エラー',
+    STATUS_TIMEOUT: 'タイムアウト',
+    STATUS_TOO_LARGE: 'サイズ超過'
+}
+
+# raw エンジンでの再検査の対象
+RETRYABLE_STATUSES = (STATUS_TIMEOUT, STATUS_TOO_LARGE)
+
+# python-pptx は全パートを読み込み、XML は展開後サイズの数倍のメモリを使う
+XML_MEMORY_FACTOR = 10
+
+# ワーカープロセスの起動（ライブラリの読み込み）を待つ最大秒数
+WORKER_START_TIMEOUT = 60
+
+
+class WorkerBusy(RuntimeError):
+    """空いているワーカーを時間内に借りられなかった"""
+
+
+def detect_keywords(file_path, keywords, scopes=DEFAULT_SCOPES, engine=DEFAULT_ENGINE):
+    """1ファイルのキーワードを検出（呼び出し元のプロセスで実行）"""
+    if engine == 'raw':
+        return find_keywords_in_package(str(file_path), keywords, scopes)
+
+    # python-pptx は読み込みに時間がかかるため必要になった時点で読み込む
+    from pptx import Presentation
+    prs = Presentation(str(file_path))
+    return find_keywords_in_presentation(prs, keywords, scopes)
+
+
+def run_detection(file_path, keywords, scopes, engine, profile=None):
+    """検出を実行して (検出結果, 計測値) を返す
+    profile: None（計測しない）または {'snapshot_path': tracemalloc スナップショットの保存先 or None}"""
+    if profile is None:
+        return detect_keywords(file_path, keywords, scopes, engine), None
+
+    # プロファイル時のみ読み込む
+    from scan_profiler import profile_detection
+    return profile_detection(file_path, keywords, scopes, engine,
+                             snapshot_path=profile.get('snapshot_path'))
+
+
+def estimate_parse_memory(file_path):
+    """python-pptx での解析に必要なメモリの見積もり（バイト）"""
+    estimate = 0
+    with zipfile.ZipFile(file_path) as zf:
+        for info in zf.infolist():
+            if info.filename.endswith(('.xml', '.rels')):
+                estimate += info.file_size * XML_MEMORY_FACTOR
+            else:
+                estimate += info.file_size
+    return estimate
+
+
+def _set_memory_limit(memory_limit):
+    """ワーカープロセスのアドレス空間の上限を設定（ジョブごとに変更するため soft 側のみ）"""
+    try:
+        import resource
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = memory_limit if memory_limit else hard
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    except (ImportError, ValueError, OSError):
+        # Windows など上限を設定できない環境では見積もりのみで判定する
+        pass
+
+
+def _worker_main(conn):
+    """ワーカープロセス: 検出リクエストを1件ずつ処理する"""
+    # 時間の計測にライブラリの読み込みを含めないよう、先に読み込んでから準備完了を通知
+    try:
+        import pptx  # noqa: F401
+        import lxml.etree  # noqa: F401
+    except ImportError as e:
+        conn.send((STATUS_ERROR, f'ワーカープロセスを起動できませんでした: {str(e)}'))
+        return
+    conn.send((STATUS_OK, None))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        file_path, keywords, scopes, engine, profile, memory_limit = job
+        _set_memory_limit(memory_limit)
+        try:
+            reply = (STATUS_OK,) + run_detection(file_path, keywords, scopes, engine, profile)
+        except MemoryError:
+            reply = (STATUS_TOO_LARGE, 'メモリの上限を超えました', None)
+        except Exception as e:
+            reply = (STATUS_ERROR, str(e), None)
+        # 結果の送信や次のジョブの受信がメモリの上限に掛からないよう、上限を戻してから送信する
+        _set_memory_limit(None)
+        conn.send(reply)
+
+
+class ScanWorker:
+    """処理予算付きでキーワードを検出するワーカー（1ファイルずつ処理）
+
+    time_limit: 1ファイルあたりの最大秒数（0 または None で無制限）
+    memory_limit: 1ファイルあたりの最大メモリ（バイト。0 または None で無制限）
+    inprocess_limit: 解析に必要なメモリの見積もりがこの値（バイト）以下のファイルは、
+                     ワーカープロセスを使わず呼び出し元のプロセスで検出する（0 または None で常にワーカーを使う）。
+                     呼び出し元のプロセスでの検出は途中で止められないため、時間の上限は適用されない
+    処理予算は detect の budget でファイルごとに指定でき、省略時は上記の値を使う。
+    どちらも無制限の場合もワーカープロセスを使わない。ワーカープロセスは必要になった時点で起動し、使い回す
+    """
+
+    def __init__(self, time_limit=None, memory_limit=None, inprocess_limit=None):
+        self.time_limit = time_limit or None
+        self.memory_limit = memory_limit or None
+        self.inprocess_limit = inprocess_limit or None
+        self._process = None
+        self._conn = None
+
+    @property
+    def budget(self):
+        """既定の処理予算 (最大秒数, 最大メモリ)"""
+        return self.time_limit, self.memory_limit
+
+    def _start(self):
+        # Flask のスレッドや常駐モードのスレッドから安全に起動できるよう spawn を使う
+        ctx = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+        if not self._conn.poll(WORKER_START_TIMEOUT):
+            self._kill()
+            raise RuntimeError('ワーカープロセスを起動できませんでした')
+        try:
+            status, message = self._conn.recv()
+        except EOFError:
+            status, message = STATUS_ERROR, 'ワーカープロセスを起動できませんでした'
+        if status != STATUS_OK:
+            self._kill()
+            raise RuntimeError(message)
+
+    def ensure_started(self):
+        """ワーカープロセスが起動していなければ起動する（起動できない場合は RuntimeError）"""
+        if self._process is None or not self._process.is_alive():
+            self._kill()
+            self._start()
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def close(self):
+        """ワーカープロセスを終了"""
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+            self._process.join(5)
+        except OSError:
+            pass
+        self._kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def detect(self, file_path, keywords, scopes=DEFAULT_SCOPES, engine=DEFAULT_ENGINE, profile=None, budget=None):
+        """1ファイルのキーワードを検出し、(状態, 検出結果またはエラーメッセージ, 計測値) を返す
+        budget: (最大秒数, 最大メモリ) 。省略時は既定の処理予算
+        計測値は profile を指定した場合のみ（run_detection を参照）"""
+        time_limit, memory_limit = budget if budget is not None else self.budget
+        time_limit = time_limit or None
+        memory_limit = memory_limit or None
+
+        estimate = None
+        if (memory_limit and engine != 'raw') or ((time_limit or memory_limit) and self.inprocess_limit):
+            try:
+                estimate = estimate_parse_memory(file_path)
+            except Exception as e:
+                return STATUS_ERROR, str(e), None
+        if memory_limit and engine != 'raw' and estimate > memory_limit:
+            return STATUS_TOO_LARGE, (f'解析に必要なメモリの見積もり（{estimate // (1024 * 1024)} MB）が'
+                                      f'上限（{memory_limit // (1024 * 1024)} MB）を超えています'), None
+
+        # 予算が無制限のファイルと、inprocess_limit 以下の小さなファイルはプロセスを起動せずに検出する
+        # （後者は時間の上限で打ち切れないため、inprocess_limit を指定した場合のみ）
+        inprocess_limit = self.inprocess_limit
+        if inprocess_limit and memory_limit:
+            inprocess_limit = min(inprocess_limit, memory_limit)
+        if not (time_limit or memory_limit) or (inprocess_limit and estimate <= inprocess_limit):
+            try:
+                return (STATUS_OK,) + run_detection(file_path, keywords, scopes, engine, profile)
+            except MemoryError:
+                return STATUS_TOO_LARGE, 'メモリの上限を超えました', None
+            except Exception as e:
+                return STATUS_ERROR, str(e), None
+
+        try:
+            self.ensure_started()
+        except RuntimeError as e:
+            return STATUS_ERROR, str(e), None
+
+        self._conn.send((str(file_path), list(keywords), tuple(scopes), engine, profile, memory_limit))
+        if not self._conn.poll(time_limit):
+            # 処理中のワーカーは止められないため、プロセスごと停止する（次のファイルで再起動）
+            self._kill()
+            return STATUS_TIMEOUT, f'処理時間の上限（{time_limit:g} 秒）を超えました', None
+
+        try:
+            return self._conn.recv()
+        except EOFError:
+            # メモリ不足で強制終了された場合など
+            self._kill()
+            return STATUS_TOO_LARGE, 'ワーカープロセスが異常終了しました（メモリ不足の可能性があります）', None
+
+
+class ScanWorkerPool:
+    """同時に処理するリクエスト間で共有するワーカー（Web版・常駐モード）
+
+    acquire_timeout: 空いているワーカーを待つ最大秒数（None で無制限）
+    """
+
+    def __init__(self, size, time_limit=None, memory_limit=None, inprocess_limit=None, acquire_timeout=None):
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()
+        self._workers = []
+        for _ in range(max(1, size)):
+            worker = ScanWorker(time_limit, memory_limit, inprocess_limit)
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    @contextlib.contextmanager
+    def worker(self):
+        """空いているワーカーを1つ借りる（acquire_timeout 秒以内に空かなければ WorkerBusy）"""
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise WorkerBusy('空いているワーカーがありません')
+        try:
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """全ワーカーのプロセスを終了"""
+        for worker in self._workers:
+            worker.close()
+
+
+def scan_file(worker, file_path, keywords, scopes=DEFAULT_SCOPES, engine=DEFAULT_ENGINE, profile=None,
+              budget=None):
+    """処理予算付きで1ファイルを検出し、結果を辞書で返す
+    {'success', 'status', 'results', 'error', 'engine'}（profile を指定した場合は 'profile' に計測値）"""
+    status, value, metrics = worker.detect(file_path, keywords, scopes, engine, profile, budget)
+    if status == STATUS_OK:
+        result = {'success': True, 'status': status, 'results': value, 'error': None, 'engine': engine}
+    else:
+        result = {'success': False, 'status': status, 'results': [], 'error': value, 'engine': engine}
+    if profile is not None:
+        result['profile'] = metrics or {}
+    return result
+
+
+def retry_with_raw_engine(worker, file_path, keywords, scopes, failed, profile=None, budget=None):
+    """打ち切ったファイルを raw エンジンで再検査する
+    failed: 最初の検出結果（scan_file の戻り値）。再検査できない場合はそのまま返す"""
+    if not is_retryable(failed):
+        return failed
+
+    result = scan_file(worker, file_path, keywords, scopes, engine='raw', profile=profile, budget=budget)
+    if result['success']:
+        # 最初の打ち切り理由を残す
+        result['retried_from'] = failed['status']
+        return result
+    return failed
+
+
+def is_retryable(result):
+    """raw エンジンで再検査できる結果か
+    既に raw エンジンで検出したものと、並列検出（raw エンジンと同じ処理）で打ち切ったものは対象外"""
+    return result['status'] in RETRYABLE_STATUSES and result['engine'] != 'raw' and 'chunks' not in result
@@ -24,6 +24,7 @@ const resultsSection = document.getElementById('resultsSection');
 const resultContent = document.getElementById('resultContent');
 const recursiveCheckbox = document.getElementById('recursiveCheckbox');
 const loading = document.getElementById('loading');
+const loadingText = document.getElementById('loadingText');
 const errorAlert = document.getElementById('errorAlert');
 
 // イベントリスナー設定
@@ -133,6 +134,19 @@ function initializePresetKeywords() {
     
     // デフォルト置換テキストを設定
     newKeywordInput.value = CONFIG.default_replacement;
+    
+    // デフォルトの検査対象をチェック
+    const defaultScopes = CONFIG.default_scopes || ['slides', 'layouts'];
+    document.querySelectorAll('.scope-checkbox').forEach(checkbox => {
+        checkbox.checked = defaultScopes.includes(checkbox.value);
+    });
+}
+
+// 選択中の検査対象（スコープ）を取得
+function getSelectedScopes() {
+    return Array.from(document.querySelectorAll('.scope-checkbox'))
+        .filter(cb => cb.checked)
+        .map(cb => cb.value);
 }
 
 // キーワードチェックボックスの動作
@@ -378,102 +392,311 @@ function displayFilesList() {
     filesList.style.display = 'block';
 }
 
-// キーワード検出
-async function detectKeywords() {
-    if (!validateInputs('detect')) return;
+// ===== 分割アップロード =====
+// ファイルをチャンクに分けて並列に送信し、通信が切れても未受信のチャンクから再開する
+// アップロードIDはブラウザ（localStorage）にも保存し、ページを再読み込みしても同じファイルなら続きから再開する
+
+const MAX_CHUNK_RETRIES = 3;
+const MAX_BUSY_RETRIES = 3;
+// ファイル → サーバー上のアップロード状態（同じファイルを再処理する際は再送しない）
+const uploadSessions = new Map();
+const UPLOAD_STORAGE_KEY = 'pptUploadSessions';
+// 保存したアップロードIDを破棄するまでの時間（サーバー側では upload_ttl_sec で期限切れになる）
+const UPLOAD_STORAGE_TTL_MS = 24 * 60 * 60 * 1000;
+let chunkLimiter = null;
+let uploadProgress = { done: 0, total: 0 };
+
+// 同時実行数を制限するリミッター
+function createLimiter(limit) {
+    let active = 0;
+    const queue = [];
+
+    const next = () => {
+        if (active >= limit || queue.length === 0) return;
+        active++;
+        const { task, resolve, reject } = queue.shift();
+        task().then(resolve, reject).finally(() => {
+            active--;
+            next();
+        });
+    };
 
-    if (selectedFiles.length === 0) {
-        showError('ファイルをアップロードしてください');
-        return;
-    }
+    return (task) => new Promise((resolve, reject) => {
+        queue.push({ task, resolve, reject });
+        next();
+    });
+}
 
-    const selectedKeywords = Array.from(document.querySelectorAll('.keyword-checkbox'))
-        .filter(cb => cb.checked)
-        .map(cb => cb.value);
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
 
-    if (selectedKeywords.length === 0) {
-        showError('少なくとも1つのキーワードを選択してください');
-        return;
+function fileKey(file) {
+    return `${file.name}:${file.size}:${file.lastModified}`;
+}
+
+// 保存済みのアップロードID（ファイル → {upload_id, saved_at}）。localStorage を使えない場合は空
+function readStoredUploads() {
+    try {
+        const stored = JSON.parse(localStorage.getItem(UPLOAD_STORAGE_KEY) || '{}');
+        const now = Date.now();
+        for (const [key, entry] of Object.entries(stored)) {
+            if (!entry || now - entry.saved_at > UPLOAD_STORAGE_TTL_MS) {
+                delete stored[key];
+            }
+        }
+        return stored;
+    } catch (error) {
+        return {};
     }
+}
 
+function writeStoredUploads(stored) {
     try {
-        showLoading(true);
+        localStorage.setItem(UPLOAD_STORAGE_KEY, JSON.stringify(stored));
+    } catch (error) {
+        // 保存できない場合は、このページを開いている間のみ再開できる
+    }
+}
+
+function storeUploadId(key, uploadId) {
+    const stored = readStoredUploads();
+    if (uploadId) {
+        stored[key] = { upload_id: uploadId, saved_at: Date.now() };
+    } else {
+        delete stored[key];
+    }
+    writeStoredUploads(stored);
+}
+
+function updateUploadProgress() {
+    if (uploadProgress.done < uploadProgress.total) {
+        setLoadingText(`アップロード中... ${uploadProgress.done}/${uploadProgress.total} チャンク`);
+    } else {
+        setLoadingText('処理中...');
+    }
+}
 
-        // 全ファイルをまとめて送信
-        const formData = new FormData();
-        for (let i = 0; i < selectedFiles.length; i++) {
-            formData.append('file', selectedFiles[i]);
+// 1ファイルをアップロードしてアップロードIDを返す
+async function uploadFile(file) {
+    const key = fileKey(file);
+    let upload = uploadSessions.get(key) || readStoredUploads()[key];
+
+    if (upload) {
+        // 以前のアップロードの状態を確認（完了済みなら再利用、途中なら再開）
+        const response = await fetch(`/api/uploads/${upload.upload_id}`);
+        upload = response.ok ? await response.json() : null;
+        if (!upload) {
+            // 期限切れなどでサーバーに残っていない場合は最初から送信する
+            storeUploadId(key, null);
         }
-        formData.append('keywords', JSON.stringify(selectedKeywords));
-        formData.append('recursive', recursiveProcessing);
+    }
 
-        const response = await fetch('/api/detect', {
+    if (!upload) {
+        const response = await fetch('/api/uploads', {
             method: 'POST',
-            body: formData
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
         });
-
         const data = await response.json();
-
         if (!response.ok) {
-            showError(data.error || 'エラーが発生しました');
+            throw new Error(data.error || 'アップロードを開始できませんでした');
+        }
+        upload = data;
+    }
+    uploadSessions.set(key, upload);
+    storeUploadId(key, upload.upload_id);
+
+    const received = new Set(upload.received);
+    const pending = [];
+    for (let index = 0; index < upload.total_chunks; index++) {
+        if (!received.has(index)) {
+            pending.push(index);
+        }
+    }
+
+    uploadProgress.total += pending.length;
+    updateUploadProgress();
+
+    await Promise.all(pending.map(index => chunkLimiter(() => uploadChunk(file, upload, index))));
+    return upload.upload_id;
+}
+
+// 1チャンクを送信（通信エラー・サーバーエラーの場合は再試行）
+async function uploadChunk(file, upload, index) {
+    const start = index * upload.chunk_size;
+    const chunk = file.slice(start, Math.min(start + upload.chunk_size, file.size));
+
+    for (let attempt = 1; ; attempt++) {
+        let response;
+        try {
+            response = await fetch(`/api/uploads/${upload.upload_id}/chunks/${index}`, {
+                method: 'PUT',
+                body: chunk
+            });
+        } catch (error) {
+            response = null;  // 通信エラー
+        }
+
+        if (response && response.ok) {
+            uploadProgress.done++;
+            updateUploadProgress();
             return;
         }
 
-        displayDetectResults(data);
+        if (response && response.status < 500) {
+            const data = await response.json();
+            throw new Error(data.error || 'チャンクの送信に失敗しました');
+        }
 
-    } catch (error) {
-        showError('通信エラー: ' + error.message);
-    } finally {
-        showLoading(false);
+        if (attempt >= MAX_CHUNK_RETRIES) {
+            throw new Error('チャンクの送信に失敗しました（再度実行すると続きから再開します）');
+        }
+        await sleep(500 * 2 ** (attempt - 1));
     }
 }
 
-// 変更プレビュー
-async function previewChanges() {
-    if (!validateInputs(currentAction)) return;
+// フォームをPOST（サーバー混雑時は Retry-After に従って再試行）
+async function postForm(url, params) {
+    for (let attempt = 1; ; attempt++) {
+        const response = await fetch(url, { method: 'POST', body: params });
+        if (response.status !== 503 || attempt > MAX_BUSY_RETRIES) {
+            return response;
+        }
+        const retryAfter = parseInt(response.headers.get('Retry-After') || '1', 10);
+        setLoadingText(`サーバー混雑のため待機中... (${retryAfter}秒)`);
+        await sleep(retryAfter * 1000);
+    }
+}
 
-    if (selectedFiles.length === 0) {
-        showError('ファイルをアップロードしてください');
-        return;
+// 共通のリクエストパラメータ
+function buildRequestParams(keywords, action) {
+    const params = new URLSearchParams();
+    params.append('keywords', JSON.stringify(keywords));
+    params.append('recursive', recursiveProcessing);
+    params.append('scopes', JSON.stringify(getSelectedScopes()));
+    if (action) {
+        params.append('action', action);
+        if (action === 'replace') {
+            params.append('new_keyword', newKeywordInput.value);
+        }
     }
+    return params;
+}
 
-    const selectedKeywords = Array.from(document.querySelectorAll('.keyword-checkbox'))
+// 各ファイルのアップロードが完了した時点で、そのファイルの処理を開始する
+async function processEachFileWhenUploaded(url, keywords, action, onResult) {
+    uploadProgress = { done: 0, total: 0 };
+    const errors = [];
+
+    await Promise.all(selectedFiles.map(async (file) => {
+        try {
+            const uploadId = await uploadFile(file);
+
+            const params = buildRequestParams(keywords, action);
+            params.append('upload_ids', JSON.stringify([uploadId]));
+            const response = await postForm(url, params);
+            const data = await response.json();
+
+            if (!response.ok) {
+                errors.push(`${file.name}: ${data.error || 'エラーが発生しました'}`);
+                return;
+            }
+            onResult(data);
+        } catch (error) {
+            errors.push(`${file.name}: ${error.message}`);
+        }
+    }));
+
+    return errors;
+}
+
+function getCheckedKeywords() {
+    return Array.from(document.querySelectorAll('.keyword-checkbox'))
         .filter(cb => cb.checked)
         .map(cb => cb.value);
+}
 
-    if (selectedKeywords.length === 0) {
-        showError('少なくとも1つのキーワードを選択してください');
-        return;
-    }
+// キーワード検出
+async function detectKeywords() {
+    if (!validateInputs('detect')) return;
+
+    const selectedKeywords = getCheckedKeywords();
 
     try {
         showLoading(true);
 
-        // 全ファイルをまとめて送信
-        const formData = new FormData();
-        for (let file of selectedFiles) {
-            formData.append('file', file);
+        // ファイルごとの結果を集約しながら表示
+        const merged = { total_count: 0, files_processed: 0, results: [] };
+        const statusMessages = [];
+        const errors = await processEachFileWhenUploaded('/api/detect', selectedKeywords, null, (data) => {
+            statusMessages.push(...describeFileStatuses(data.file_statuses || []));
+            merged.total_count += data.total_count;
+            merged.files_processed += data.files_processed;
+            merged.results = merged.results.concat(data.results);
+            displayDetectResults(merged);
+        });
+
+        if (merged.files_processed > 0) {
+            displayDetectResults(merged);
         }
-        formData.append('keywords', JSON.stringify(selectedKeywords));
-        formData.append('action', currentAction);
-        formData.append('recursive', recursiveProcessing);
-        if (currentAction === 'replace') {
-            formData.append('new_keyword', newKeywordInput.value);
+        const messages = errors.concat(statusMessages);
+        if (messages.length > 0) {
+            showError(messages.join('\n'));
         }
 
-        const response = await fetch('/api/preview', {
-            method: 'POST',
-            body: formData
-        });
+    } catch (error) {
+        showError('通信エラー: ' + error.message);
+    } finally {
+        showLoading(false);
+    }
+}
 
-        const data = await response.json();
+// 処理予算を超えたファイルなどの状態をメッセージにする
+const FILE_STATUS_LABELS = { error: 'エラー', timeout: 'タイムアウト', too_large: 'サイズ超過' };
 
-        if (!response.ok) {
-            showError(data.error || 'エラーが発生しました');
-            return;
+function describeFileStatuses(statuses) {
+    const messages = [];
+    statuses.forEach(status => {
+        if (status.retried_from) {
+            messages.push(`${status.file}: ${FILE_STATUS_LABELS[status.retried_from]}のため raw エンジンで再検査しました`);
+        } else if (status.status !== 'ok') {
+            messages.push(`${status.file}: ${FILE_STATUS_LABELS[status.status] || 'エラー'} (${status.error})`);
         }
+    });
+    return messages;
+}
 
-        displayPreviewResults(data);
+// 変更プレビュー
+async function previewChanges() {
+    if (!validateInputs(currentAction)) return;
+
+    const selectedKeywords = getCheckedKeywords();
+
+    try {
+        showLoading(true);
+
+        // ファイルごとの統計を集約しながら表示
+        const merged = {
+            before: { count: 0, slides: 0 },
+            after: { count: 0, slides: 0 },
+            modified_shapes: 0,
+            files_processed: 0,
+            action: currentAction
+        };
+        const errors = await processEachFileWhenUploaded('/api/preview', selectedKeywords, currentAction, (data) => {
+            merged.before.count += data.before.count;
+            merged.before.slides += data.before.slides;
+            merged.after.count += data.after.count;
+            merged.after.slides += data.after.slides;
+            merged.modified_shapes += data.modified_shapes;
+            merged.files_processed += data.files_processed;
+            displayPreviewResults(merged);
+        });
+
+        if (errors.length > 0) {
+            showError(errors.join('\n'));
+        }
 
     } catch (error) {
         showError('通信エラー: ' + error.message);
@@ -486,39 +709,19 @@ async function previewChanges() {
 async function executeChanges() {
     if (!validateInputs(currentAction)) return;
 
-    if (selectedFiles.length === 0) {
-        showError('ファイルをアップロードしてください');
-        return;
-    }
-
-    const selectedKeywords = Array.from(document.querySelectorAll('.keyword-checkbox'))
-        .filter(cb => cb.checked)
-        .map(cb => cb.value);
-
-    if (selectedKeywords.length === 0) {
-        showError('少なくとも1つのキーワードを選択してください');
-        return;
-    }
+    const selectedKeywords = getCheckedKeywords();
 
     try {
         showLoading(true);
 
-        // 全ファイルをまとめて送信
-        const formData = new FormData();
-        for (let file of selectedFiles) {
-            formData.append('file', file);
-        }
-        formData.append('keywords', JSON.stringify(selectedKeywords));
-        formData.append('action', currentAction);
-        formData.append('recursive', recursiveProcessing);
-        if (currentAction === 'replace') {
-            formData.append('new_keyword', newKeywordInput.value);
-        }
+        // 全ファイルのアップロード完了後にまとめて処理（複数ファイルはZIPで返る）
+        uploadProgress = { done: 0, total: 0 };
+        const uploadIds = await Promise.all(selectedFiles.map(file => uploadFile(file)));
 
-        const response = await fetch('/api/replace', {
-            method: 'POST',
-            body: formData
-        });
+        const params = buildRequestParams(selectedKeywords, currentAction);
+        params.append('upload_ids', JSON.stringify(uploadIds));
+
+        const response = await postForm('/api/replace', params);
 
         if (!response.ok) {
             const data = await response.json();
@@ -569,12 +772,20 @@ function displayDetectResults(data) {
         </div>
     `;
 
+    const scopeLabels = {
+        'slides': 'スライド',
+        'masters': 'マスター',
+        'layouts': 'レイアウト',
+        'notes': 'ノート'
+    };
+
     let detailsHtml = '';
     if (data.results && data.results.length > 0) {
         data.results.forEach(item => {
+            const scopeLabel = scopeLabels[item.scope] || 'スライド';
             detailsHtml += `
                 <div class="result-item">
-                    <div class="result-header">スライド ${item.slide} (${item.file})</div>
+                    <div class="result-header">${scopeLabel} ${item.slide} (${item.file})</div>
                     <div class="result-details">
                         <p><strong>検出数:</strong> ${item.count}</p>
                         <p><strong>テキスト:</strong> ${escapeHtml(item.text)}</p>
@@ -654,6 +865,11 @@ function validateInputs(action) {
         return false;
     }
 
+    if (getSelectedScopes().length === 0) {
+        showError('少なくとも1つの検査対象を選択してください');
+        return false;
+    }
+
     if (action === 'replace' && !newKeywordInput.value.trim()) {
         showError('置換先のキーワードを入力してください');
         return false;
@@ -688,9 +904,16 @@ function clearError() {
 
 // ローディング表示
 function showLoading(show) {
+    if (show) {
+        setLoadingText('処理中...');
+    }
     loading.style.display = show ? 'flex' : 'none';
 }
 
+function setLoadingText(text) {
+    loadingText.textContent = text;
+}
+
 // HTML エスケープ
 function escapeHtml(text) {
     const div = document.createElement('div');
@@ -700,6 +923,7 @@ function escapeHtml(text) {
 
 // 初期化
 document.addEventListener('DOMContentLoaded', () => {
+    chunkLimiter = createLimiter(CONFIG.upload_concurrency || 4);
     initializePresetKeywords();
     updateButtonVisibility();
 });
@@ -0,0 +1,60 @@
+"""
+テスト共通の設定とフィクスチャ
+"""
+import os
+import sys
+
+import pytest
+
+# リポジトリ直下のモジュールを読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_deck(file_path, slides=3, keyword='OldCompany'):
+    """スライド・ノート・マスター・レイアウトにキーワードを含むデッキを作成"""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"{keyword} スライド {i + 1}"
+        body = slide.placeholders[1].text_frame
+        body.text = "本文" if i % 2 else f"本文 {keyword.upper()} と {keyword.lower()}"
+        body.add_paragraph().text = "2行目"
+        textbox = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(4), Inches(1))
+        textbox.text_frame.text = f"© {keyword}"
+        if i % 2 == 0:
+            slide.notes_slide.notes_text_frame.text = f"ノート {keyword}"
+
+    # マスター・レイアウトのシェイプにはテキストボックスを追加できないため、既存のプレースホルダーを書き換える
+    prs.slide_masters[0].shapes[0].text_frame.text = f"マスター {keyword}"
+    prs.slide_layouts[0].shapes[0].text_frame.text = f"レイアウト {keyword}"
+    prs.save(str(file_path))
+    return file_path
+
+
+@pytest.fixture
+def deck(tmp_path):
+    return build_deck(tmp_path / 'deck.pptx')
+
+
+@pytest.fixture(scope='session')
+def web_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp('web')
+
+
+@pytest.fixture
+def web_app(web_dir, monkeypatch):
+    """Web版（app.py）のモジュール
+    アップロード先・キャッシュなどは作業ディレクトリからの相対パスのため、一時ディレクトリで読み込み・実行する
+    （config.json がないため既定の設定で動作する）"""
+    monkeypatch.chdir(web_dir)
+    import app
+    return app
+
+
+@pytest.fixture
+def client(web_app):
+    return web_app.app.test_client()
@@ -0,0 +1,96 @@
+"""
+admission.AdmissionController のテスト（待ち行列・タイムアウト・拒否）
+"""
+import threading
+import time
+
+from admission import AdmissionController
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "条件が満たされませんでした"
+        time.sleep(0.01)
+
+
+def test_admits_within_budget():
+    admission = AdmissionController(budget_bytes=100, max_queue=1, queue_timeout=1)
+    assert admission.acquire(40) == 40
+    assert admission.acquire(60) == 60
+    assert admission.stats()['in_use_bytes'] == 100
+
+
+def test_oversized_request_runs_alone():
+    admission = AdmissionController(budget_bytes=100, max_queue=1, queue_timeout=1)
+    assert admission.acquire(500) == 100  # 予算を超える分は予算に丸める
+    admission.release(100)
+    assert admission.stats()['in_flight'] == 0
+
+
+def test_queued_request_is_admitted_after_release():
+    admission = AdmissionController(budget_bytes=100, max_queue=2, queue_timeout=5)
+    first = admission.acquire(80)
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(admission.acquire(50)))
+    waiter.start()
+
+    wait_for(lambda: admission.stats()['queue_depth'] == 1)
+    assert not admitted
+    admission.release(first, hold_seconds=1.0)
+    waiter.join(5)
+    assert admitted == [50]
+    assert admission.stats()['peak_queue_depth'] == 1
+
+
+def test_queue_is_first_come_first_served():
+    admission = AdmissionController(budget_bytes=100, max_queue=2, queue_timeout=5)
+    first = admission.acquire(100)
+    order = []
+
+    def request(name, cost):
+        assert admission.acquire(cost) == cost
+        order.append(name)
+
+    big = threading.Thread(target=request, args=('big', 100))
+    big.start()
+    wait_for(lambda: admission.stats()['queue_depth'] == 1)
+    small = threading.Thread(target=request, args=('small', 10))
+    small.start()
+    wait_for(lambda: admission.stats()['queue_depth'] == 2)
+
+    # 後から来た small は予算に収まっても、先頭の big より先には受け付けない
+    admission.release(first)
+    big.join(5)
+    assert order == ['big']
+    assert admission.stats()['queue_depth'] == 1
+
+    admission.release(100)
+    small.join(5)
+    assert order == ['big', 'small']
+
+
+def test_times_out_in_queue():
+    admission = AdmissionController(budget_bytes=100, max_queue=1, queue_timeout=0.1)
+    admission.acquire(100)
+    assert admission.acquire(10) is None
+    stats = admission.stats()
+    assert stats['timed_out_total'] == 1
+    assert stats['rejected_total'] == 1
+    assert stats['queue_depth'] == 0
+
+
+def test_rejects_when_queue_is_full():
+    admission = AdmissionController(budget_bytes=100, max_queue=1, queue_timeout=5)
+    held = admission.acquire(100)
+    waiter = threading.Thread(target=admission.acquire, args=(10,))
+    waiter.start()
+    wait_for(lambda: admission.stats()['queue_depth'] == 1)
+
+    assert admission.acquire(10) is None
+    assert admission.stats()['rejected_total'] == 1
+    assert admission.stats()['timed_out_total'] == 0
+    assert admission.retry_after() >= 1
+
+    admission.release(held)
+    waiter.join(5)
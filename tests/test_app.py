@@ -0,0 +1,211 @@
+"""
+Web版（app.py）のルートのテスト（アドミッション制御・分割アップロード・置換結果のキャッシュ）
+"""
+import io
+import json
+import zipfile
+
+import pytest
+
+from admission import AdmissionController
+from conftest import build_deck
+
+
+@pytest.fixture
+def deck_bytes(tmp_path):
+    return build_deck(tmp_path / 'deck.pptx').read_bytes()
+
+
+def detect_form(deck_bytes, **fields):
+    form = {'file': (io.BytesIO(deck_bytes), 'deck.pptx'), 'keywords': json.dumps(['OldCompany'])}
+    form.update(fields)
+    return form
+
+
+# --- アドミッション制御 ---
+
+@pytest.fixture
+def admission(web_app, monkeypatch):
+    admission = AdmissionController(budget_bytes=1024 ** 3, max_queue=0, queue_timeout=0.1)
+    monkeypatch.setattr(web_app, 'admission', admission)
+    return admission
+
+
+def test_saturated_budget_returns_503(client, admission, deck_bytes):
+    held = admission.acquire(admission.budget_bytes)
+    response = client.post('/api/detect', data=detect_form(deck_bytes), content_type='multipart/form-data')
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    response.close()
+    assert client.get('/api/status').json['admission']['rejected_total'] == 1
+
+    admission.release(held)
+    response = client.post('/api/detect', data=detect_form(deck_bytes), content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.json['total_count'] > 0
+    response.close()
+    assert client.get('/api/status').json['admission']['in_flight'] == 0
+
+
+def test_cost_of_upload_ids_request_uses_upload_size(web_app, client, admission, deck_bytes, monkeypatch):
+    upload = client.post('/api/uploads', json={'filename': 'deck.pptx', 'size': len(deck_bytes)}).json
+    for index in range(upload['total_chunks']):
+        start = index * upload['chunk_size']
+        client.put(f"/api/uploads/{upload['upload_id']}/chunks/{index}",
+                   data=deck_bytes[start:start + upload['chunk_size']])
+
+    costs = []
+    acquire = admission.acquire
+    monkeypatch.setattr(admission, 'acquire', lambda cost: costs.append(cost) or acquire(cost))
+    response = client.post('/api/detect', data={'upload_ids': json.dumps([upload['upload_id']]),
+                                                'keywords': json.dumps(['OldCompany'])})
+    assert response.status_code == 200
+    # 本文は小さいが、参照先のアップロードのサイズで見積もる
+    assert costs == [len(deck_bytes) * web_app.MEMORY_COST_FACTOR]
+
+
+def test_budget_is_released_when_download_is_closed(client, admission, deck_bytes):
+    response = client.post('/api/replace', data=detect_form(deck_bytes, new_keyword='NewCompany'),
+                           content_type='multipart/form-data', buffered=False)
+    assert response.status_code == 200
+    # 送信が終わるまで予算を保持する
+    assert client.get('/api/status').json['admission']['in_flight'] == 1
+    assert response.get_data()[:2] == b'PK'
+    response.close()
+    assert client.get('/api/status').json['admission']['in_flight'] == 0
+
+
+# --- 分割アップロード ---
+
+def start_upload(client, data, filename='deck.pptx'):
+    response = client.post('/api/uploads', json={'filename': filename, 'size': len(data)})
+    assert response.status_code == 201
+    return response.json
+
+
+def put_chunk(client, upload, data, index, body=None):
+    if body is None:
+        start = index * upload['chunk_size']
+        body = data[start:start + upload['chunk_size']]
+    return client.put(f"/api/uploads/{upload['upload_id']}/chunks/{index}", data=body)
+
+
+def upload_all(client, data):
+    upload = start_upload(client, data)
+    for index in range(upload['total_chunks']):
+        assert put_chunk(client, upload, data, index).status_code == 200
+    return upload
+
+
+@pytest.fixture
+def small_chunks(web_app, monkeypatch):
+    # テスト用のデッキでも複数チャンクになるようにする
+    monkeypatch.setattr(web_app.upload_store, 'chunk_size', 8 * 1024)
+
+
+def test_upload_chunks_can_resume(client, small_chunks, deck_bytes):
+    upload = start_upload(client, deck_bytes)
+    assert upload['total_chunks'] > 2
+    assert put_chunk(client, upload, deck_bytes, 1).status_code == 200
+
+    status = client.get(f"/api/uploads/{upload['upload_id']}").json
+    assert status['received'] == [1]
+    assert not status['complete']
+    for index in range(upload['total_chunks']):
+        if index not in status['received']:
+            put_chunk(client, upload, deck_bytes, index)
+    assert client.get(f"/api/uploads/{upload['upload_id']}").json['complete']
+
+
+def test_invalid_chunks_are_rejected(client, small_chunks, deck_bytes):
+    upload = start_upload(client, deck_bytes)
+    last = upload['total_chunks'] - 1
+    assert put_chunk(client, upload, deck_bytes, upload['total_chunks']).status_code == 400  # 範囲外
+    assert put_chunk(client, upload, deck_bytes, 0, body=deck_bytes[:100]).status_code == 400  # 短い
+    assert put_chunk(client, upload, deck_bytes, last, body=deck_bytes[:upload['chunk_size']]).status_code == 400
+    assert client.get(f"/api/uploads/{upload['upload_id']}").json['received'] == []
+
+
+def test_invalid_upload_requests(client, web_app, deck_bytes):
+    assert client.post('/api/uploads', json={'filename': 'a.pptx', 'size': -1}).status_code == 400
+    assert client.post('/api/uploads', json={'filename': 'a.pptx', 'size': 'x'}).status_code == 400
+    too_large = web_app.MAX_FILE_SIZE + 1
+    assert client.post('/api/uploads', json={'filename': 'a.pptx', 'size': too_large}).status_code == 400
+    assert client.post('/api/uploads', json={'filename': 'a.txt', 'size': 10}).status_code == 400
+    assert client.post('/api/uploads', json={'filename': 1, 'size': 10}).status_code == 400
+
+    assert client.get('/api/uploads/unknown').status_code == 404
+    assert client.put('/api/uploads/unknown/chunks/0', data=b'x').status_code == 404
+
+
+def test_upload_ids_are_used_by_detect_and_replace(client, deck_bytes):
+    upload = upload_all(client, deck_bytes)
+    upload_ids = json.dumps([upload['upload_id']])
+
+    detected = client.post('/api/detect', data={'upload_ids': upload_ids, 'keywords': json.dumps(['OldCompany'])})
+    assert detected.status_code == 200
+    assert detected.json['files_processed'] == 1
+    assert detected.json['total_count'] > 0
+
+    replaced = client.post('/api/replace', data={'upload_ids': upload_ids, 'keywords': json.dumps(['OldCompany']),
+                                                 'new_keyword': 'NewCompany'})
+    assert replaced.status_code == 200
+    assert replaced.get_data()[:2] == b'PK'
+    replaced.close()
+
+    # 処理後も保持され、同じファイルの再処理では再送しない
+    assert client.get(f"/api/uploads/{upload['upload_id']}").json['complete']
+
+
+def test_incomplete_or_unknown_upload_ids_are_rejected(client, small_chunks, deck_bytes):
+    upload = start_upload(client, deck_bytes)
+    put_chunk(client, upload, deck_bytes, 0)
+    for upload_id in (upload['upload_id'], 'unknown'):
+        response = client.post('/api/detect', data={'upload_ids': json.dumps([upload_id]),
+                                                    'keywords': json.dumps(['OldCompany'])})
+        assert response.status_code == 400
+
+
+# --- 置換結果のキャッシュ ---
+
+def replace(client, files, new_keyword):
+    # キャッシュはテスト間で共有されるため、テストごとに異なる置換先を使う
+    data = {'file': [(io.BytesIO(content), filename) for filename, content in files],
+            'keywords': json.dumps(['OldCompany']), 'new_keyword': new_keyword}
+    response = client.post('/api/replace', data=data, content_type='multipart/form-data')
+    body = response.get_data()
+    response.close()
+    return response, body
+
+
+def test_replace_output_is_cached(client, deck_bytes):
+    first, first_body = replace(client, [('deck.pptx', deck_bytes)], 'CachedCompany')
+    assert first.status_code == 200
+    assert first.headers['X-Output-Cache'] == 'MISS'
+
+    second, second_body = replace(client, [('deck.pptx', deck_bytes)], 'CachedCompany')
+    assert second.status_code == 200
+    assert second.headers['X-Output-Cache'] == 'HIT'
+    assert second_body == first_body
+    assert int(second.headers['X-Output-Cache-Hits']) == int(first.headers['X-Output-Cache-Hits']) + 1
+
+    # 置換先が変われば別の出力になる
+    other, _ = replace(client, [('deck.pptx', deck_bytes)], 'OtherCompany')
+    assert other.headers['X-Output-Cache'] == 'MISS'
+
+
+def test_zip_with_failed_file_is_not_cached(web_app, client, deck_bytes):
+    files = [('deck.pptx', deck_bytes), ('broken.pptx', b'not a pptx')]
+    entries = web_app.output_cache.stats()['entries']
+    for _ in range(2):
+        response, body = replace(client, files, 'PartialCompany')
+        assert response.status_code == 200
+        assert response.headers['X-Output-Cache'] == 'MISS'
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            assert zf.namelist() == ['modified_deck.pptx']
+    assert web_app.output_cache.stats()['entries'] == entries
+
+    # すべて処理できた ZIP はキャッシュする
+    files = [('deck.pptx', deck_bytes), ('deck2.pptx', deck_bytes)]
+    assert replace(client, files, 'PartialCompany')[0].headers['X-Output-Cache'] == 'MISS'
+    assert replace(client, files, 'PartialCompany')[0].headers['X-Output-Cache'] == 'HIT'
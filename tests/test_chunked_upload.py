@@ -0,0 +1,73 @@
+"""
+chunked_upload.ChunkedUploadStore のテスト（再開・組み立て・上限）
+"""
+import os
+
+import pytest
+
+from chunked_upload import ChunkedUploadStore, UploadLimitExceeded, UploadNotFound
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkedUploadStore(str(tmp_path / 'chunked'), chunk_size=4, max_file_size=100, ttl=3600,
+                              max_total_size=30)
+
+
+def test_resume_sends_only_missing_chunks(store):
+    data = b'0123456789'
+    upload = store.create('deck.pptx', len(data))
+    assert upload['total_chunks'] == 3
+    upload_id = upload['upload_id']
+
+    # チャンク 0 と 2 を受信した後に通信が切れた想定
+    store.write_chunk(upload_id, 2, data[8:])
+    store.write_chunk(upload_id, 0, data[:4])
+    status = store.status(upload_id)
+    assert status['received'] == [0, 2]
+    assert not status['complete']
+    with pytest.raises(ValueError):
+        store.completed_path(upload_id)
+
+    missing = [i for i in range(status['total_chunks']) if i not in status['received']]
+    assert missing == [1]
+    assert store.write_chunk(upload_id, 1, data[4:8])['complete']
+
+    with open(store.completed_path(upload_id), 'rb') as f:
+        assert f.read() == data
+
+
+def test_resending_a_chunk_is_idempotent(store):
+    upload_id = store.create('deck.pptx', 4)['upload_id']
+    store.write_chunk(upload_id, 0, b'abcd')
+    assert store.write_chunk(upload_id, 0, b'abcd')['received'] == [0]
+
+
+def test_rejects_invalid_chunks(store):
+    upload_id = store.create('deck.pptx', 6)['upload_id']
+    with pytest.raises(ValueError):
+        store.write_chunk(upload_id, 1, b'abc')   # 最後のチャンクは 2 バイト
+    with pytest.raises(ValueError):
+        store.write_chunk(upload_id, 2, b'ab')    # 範囲外
+    with pytest.raises(UploadNotFound):
+        store.status('0' * 32)
+    with pytest.raises(UploadNotFound):
+        store.status('../etc')
+
+
+@pytest.mark.parametrize('filename, size', [(1, 4), ('', 4), ('deck.pptx', '4'), ('deck.pptx', True),
+                                             ('deck.pptx', -1), ('deck.pptx', 101)])
+def test_rejects_invalid_requests(store, filename, size):
+    with pytest.raises(ValueError):
+        store.create(filename, size)
+
+
+def test_limits_total_pending_size(store):
+    first = store.create('a.pptx', 20)
+    with pytest.raises(UploadLimitExceeded):
+        store.create('b.pptx', 20)
+    assert store.create('c.pptx', 10)['size'] == 10
+
+    # 期限切れで削除されると再び受け付ける
+    os.utime(os.path.join(store.base_dir, first['upload_id'], 'meta.json'), (0, 0))
+    assert store.create('b.pptx', 20)['size'] == 20
@@ -0,0 +1,59 @@
+"""
+detect_keywords_cli のファイル探索のテスト
+"""
+from pathlib import Path
+
+from detect_keywords_cli import find_ppt_files, iter_ppt_files
+
+
+def make_tree(root):
+    files = [
+        'b.pptx', 'a.PPTX', 'old.ppt', 'notes.txt', '.hidden.pptx',
+        'sub/c.pptx', 'sub/deeper/d.pptx', 'sub/deeper/readme.md',
+        '.git/e.pptx', 'sub/.cache/f.pptx', 'z/g.pptx',
+    ]
+    for name in files:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+    return root
+
+
+def relative(root, paths):
+    return [p.relative_to(root).as_posix() for p in paths]
+
+
+def test_find_ppt_files_is_sorted_and_prunes_hidden(tmp_path):
+    root = make_tree(tmp_path)
+    assert relative(root, find_ppt_files(root)) == [
+        'a.PPTX', 'b.pptx', 'old.ppt', 'sub/c.pptx', 'sub/deeper/d.pptx', 'z/g.pptx'
+    ]
+
+
+def test_non_recursive_lists_top_level_only(tmp_path):
+    root = make_tree(tmp_path)
+    assert relative(root, find_ppt_files(root, recursive=False)) == ['a.PPTX', 'b.pptx', 'old.ppt']
+
+
+def test_iter_matches_find_regardless_of_worker_count(tmp_path):
+    root = make_tree(tmp_path)
+    for workers in (1, 4):
+        found = list(iter_ppt_files(root, workers=workers))
+        assert all(isinstance(p, Path) for p in found)
+        assert sorted(found) == find_ppt_files(root)
+
+
+def test_missing_directory_is_reported(tmp_path):
+    messages = []
+    assert find_ppt_files(tmp_path / 'missing', log=messages.append) == []
+    assert 'ディレクトリが存在しません' in messages[0]
+
+
+def test_stopping_early_does_not_hang(tmp_path):
+    root = make_tree(tmp_path)
+    for i in range(50):
+        (root / f'many{i}').mkdir()
+        (root / f'many{i}' / 'x.pptx').write_bytes(b'')
+    walker = iter_ppt_files(root)
+    assert next(walker).suffix.lower() in ('.pptx', '.ppt')
+    walker.close()
@@ -0,0 +1,125 @@
+"""
+diagnose_pptx のテスト（パートの分類・遅くなる要因のしきい値・壊れたデッキの診断）
+"""
+import zipfile
+
+import pytest
+
+import diagnose_pptx
+from diagnose_pptx import analyze_deck, categorize_part, find_pathologies, has_errors, print_report
+
+MISSING_LAYOUT = 'ppt/slideLayouts/slideLayout3.xml'
+
+
+@pytest.mark.parametrize('name, category', [
+    ('ppt/slides/slide1.xml', 'slides'),
+    ('ppt/slides/_rels/slide1.xml.rels', 'rels'),
+    ('ppt/notesSlides/notesSlide1.xml', 'notes'),
+    ('ppt/slideLayouts/slideLayout1.xml', 'layouts'),
+    ('ppt/slideMasters/slideMaster1.xml', 'masters'),
+    ('ppt/media/image1.png', 'media'),
+    ('ppt/embeddings/oleObject1.bin', 'embeddings'),
+    ('ppt/charts/chart1.xml', 'charts'),
+    ('ppt/theme/theme1.xml', 'theme'),
+    ('ppt/presentation.xml', 'other'),
+    ('[Content_Types].xml', 'other'),
+])
+def test_categorize_part(name, category):
+    assert categorize_part(name) == category
+
+
+def make_report(parts=(), slides=(), runs_per_paragraph=1.0, layouts=1, masters=1):
+    return {
+        'parts': {'all': [{'name': name, 'category': categorize_part(name), 'uncompressed': size}
+                          for name, size in parts]},
+        'slides': [{'slide': i + 1, 'runs': runs} for i, runs in enumerate(slides)],
+        'totals': {'runs_per_paragraph': runs_per_paragraph},
+        'layouts': layouts,
+        'masters': masters,
+    }
+
+
+def test_pathologies_below_thresholds():
+    report = make_report(
+        parts=[('ppt/media/image1.png', diagnose_pptx.LARGE_MEDIA_BYTES - 1),
+               ('ppt/slides/slide1.xml', diagnose_pptx.LARGE_XML_PART_BYTES - 1)],
+        slides=[diagnose_pptx.MAX_RUNS_PER_SLIDE - 1],
+        runs_per_paragraph=diagnose_pptx.MAX_RUNS_PER_PARAGRAPH - 0.1,
+        layouts=diagnose_pptx.MAX_LAYOUTS - 1,
+        masters=diagnose_pptx.MAX_MASTERS - 1)
+    assert find_pathologies(report) == []
+
+
+def test_pathologies_at_thresholds():
+    media = diagnose_pptx.TOTAL_MEDIA_BYTES // 5
+    report = make_report(
+        parts=[('ppt/media/image1.png', diagnose_pptx.LARGE_MEDIA_BYTES)]
+        + [(f'ppt/embeddings/oleObject{i}.bin', media) for i in range(5)]
+        + [('ppt/slides/slide1.xml', diagnose_pptx.LARGE_XML_PART_BYTES),
+           ('ppt/media/huge.xml', 1)],
+        slides=[diagnose_pptx.MAX_RUNS_PER_SLIDE] + [1] * (diagnose_pptx.MAX_SLIDES - 1),
+        runs_per_paragraph=diagnose_pptx.MAX_RUNS_PER_PARAGRAPH,
+        layouts=diagnose_pptx.MAX_LAYOUTS,
+        masters=diagnose_pptx.MAX_MASTERS)
+    warnings = find_pathologies(report)
+
+    assert sum(w.startswith('巨大なメディア: ') for w in warnings) == 6
+    assert any(w.startswith('メディアの合計サイズが大きい') for w in warnings)
+    assert [w for w in warnings if w.startswith('巨大なXMLパート')] == [
+        "巨大なXMLパート: ppt/slides/slide1.xml (5.0 MB)"]
+    assert f"ランが非常に多いスライド: スライド 1 ({diagnose_pptx.MAX_RUNS_PER_SLIDE} ラン)" in warnings
+    assert any(w.startswith('ランの断片化が激しい') for w in warnings)
+    assert f"レイアウトが非常に多い: {diagnose_pptx.MAX_LAYOUTS} 件" in warnings
+    assert f"マスターが非常に多い: {diagnose_pptx.MAX_MASTERS} 件" in warnings
+    assert f"スライドが非常に多い: {diagnose_pptx.MAX_SLIDES} 枚" in warnings
+
+
+def test_healthy_deck(deck):
+    report = analyze_deck(deck, ['OldCompany'])
+    assert not has_errors(report)
+    assert report['missing_parts'] == []
+    assert len(report['slides']) == 3
+    assert report['timings']['pptx']['save'] is not None
+    assert report['warnings'] == []
+
+
+@pytest.fixture
+def broken_deck(deck, tmp_path):
+    # 参照されているレイアウトのパートを取り除く
+    path = tmp_path / 'broken.pptx'
+    with zipfile.ZipFile(deck) as src, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            if item.filename != MISSING_LAYOUT:
+                dst.writestr(item, src.read(item.filename))
+    return path
+
+
+def test_broken_deck_keeps_part_and_slide_stats(broken_deck, capsys):
+    report = analyze_deck(broken_deck, ['OldCompany'])
+
+    assert report['error'] is None
+    assert has_errors(report)
+    # python-pptx は壊れた参照を読み飛ばすが、raw エンジンは欠けたパートを読めずに失敗する
+    assert report['timings']['pptx']['error'] is None
+    assert MISSING_LAYOUT in report['timings']['raw']['error']
+    assert report['timings']['raw']['parse'] is None
+    assert report['parts']['count'] > 0
+    assert len(report['slides']) == 3
+    assert report['totals']['runs'] > 0
+    assert ('ppt/slideMasters/slideMaster1.xml', MISSING_LAYOUT) in report['missing_parts']
+    assert any(w.startswith(f"参照先のパートがありません: {MISSING_LAYOUT}") for w in report['warnings'])
+    assert any(w.startswith('raw エンジンで読み込めません') for w in report['warnings'])
+
+    print_report(report)
+    out = capsys.readouterr().out
+    assert 'パート分類別サイズ' in out
+    assert 'テキスト構造' in out
+    assert f"raw        ❌ エラー: There is no item named '{MISSING_LAYOUT}'" in out
+
+
+def test_not_a_zip_is_fatal(tmp_path):
+    path = tmp_path / 'broken.pptx'
+    path.write_bytes(b'not a zip')
+    report = analyze_deck(path, ['OldCompany'])
+    assert report['error']
+    assert has_errors(report)
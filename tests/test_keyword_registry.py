@@ -0,0 +1,141 @@
+"""
+keyword_registry.KeywordRegistry のテスト（クライアントが登録したセットの上限と LRU 削除・設定ファイルの自動再読み込み）
+"""
+import json
+import os
+
+import pytest
+
+from keyword_registry import KeywordRegistry
+from keyword_scanner import compile_keywords
+
+
+@pytest.fixture
+def registry(tmp_path):
+    config = {'default_keywords': ['OldCompany'], 'default_replacement': 'NewCompany',
+              'keyword_sets': {'legacy': {'keywords': ['旧社名'], 'replacement': '新社名'}}}
+    return KeywordRegistry(str(tmp_path / 'config.json'), config, max_client_sets=2)
+
+
+def test_evicts_least_recently_used_client_set(registry):
+    registry.register('a', ['A'])
+    registry.register('b', ['B'])
+    registry.get('a')  # a を使うと b が最も古くなる
+    registry.register('c', ['C'])
+
+    with pytest.raises(KeyError):
+        registry.get('b')
+    assert registry.get('a').keywords == ('A',)
+    assert registry.get('c').keywords == ('C',)
+    stats = registry.stats()
+    assert stats['client_sets'] == 2
+    assert stats['evicted_total'] == 1
+
+
+def test_config_sets_are_not_evicted(registry):
+    for name in ('a', 'b', 'c', 'd'):
+        registry.register(name, [name.upper()])
+    assert registry.get('default').keywords == ('OldCompany',)
+    assert registry.get('legacy').replacement == '新社名'
+    assert sorted(s.name for s in registry.list_sets()) == ['c', 'd', 'default', 'legacy']
+
+
+def test_new_version_does_not_count_as_new_set(registry):
+    registry.register('a', ['A'])
+    registry.register('b', ['B'])
+    assert registry.register('a', ['A', 'A2']).set_id == 'a@2'
+    assert registry.get('a@1').keywords == ('A',)
+    assert registry.get('b').keywords == ('B',)
+    assert registry.stats()['evicted_total'] == 0
+
+
+def test_config_sets_cannot_be_overwritten(registry):
+    with pytest.raises(ValueError):
+        registry.register('legacy', ['X'])
+
+
+def test_patterns_share_the_scanner_cache(registry):
+    keyword_set = registry.get('default')
+    assert keyword_set.patterns is compile_keywords(('OldCompany',))
+    stats = registry.stats()
+    assert stats['pattern_cache_size'] == compile_keywords.cache_info().currsize
+    assert stats['pattern_cache_hits'] >= 1
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'config.json'
+    mtime = [1_700_000_000]
+
+    def write(config):
+        # 同じ秒数内の書き込みでも更新を検知できるよう、更新日時を進める
+        path.write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+        mtime[0] += 10
+        os.utime(path, (mtime[0], mtime[0]))
+
+    return path, write
+
+
+def reloading_registry(config_file, config):
+    path, write = config_file
+    write(config)
+    return KeywordRegistry(str(path), config, check_interval=0)
+
+
+BASE_CONFIG = {'default_keywords': ['OldCompany'],
+               'keyword_sets': {'legacy': {'keywords': ['旧社名'], 'replacement': '新社名'},
+                                'campaign': {'keywords': ['Spring']}}}
+
+
+def test_edit_bumps_version_and_keeps_old_version(config_file):
+    registry = reloading_registry(config_file, BASE_CONFIG)
+    assert registry.get('legacy').set_id == 'legacy@1'
+
+    _, write = config_file
+    write(dict(BASE_CONFIG, keyword_sets=dict(BASE_CONFIG['keyword_sets'],
+                                              legacy={'keywords': ['旧社名', '旧ロゴ'], 'replacement': '新社名'})))
+
+    assert registry.get('legacy').set_id == 'legacy@2'
+    assert registry.get('legacy').keywords == ('旧社名', '旧ロゴ')
+    assert registry.get('legacy@1').keywords == ('旧社名',)
+    # 内容が変わっていないセットのバージョンは変わらない
+    assert registry.get('campaign').set_id == 'campaign@1'
+    assert registry.stats()['reloaded_total'] == 1
+
+
+def test_removed_set_becomes_unreachable(config_file):
+    registry = reloading_registry(config_file, BASE_CONFIG)
+    assert registry.get('campaign@1')
+
+    _, write = config_file
+    write(dict(BASE_CONFIG, keyword_sets={'legacy': BASE_CONFIG['keyword_sets']['legacy']}))
+
+    for set_id in ('campaign', 'campaign@1'):
+        with pytest.raises(KeyError):
+            registry.get(set_id)
+    assert sorted(s.name for s in registry.list_sets()) == ['default', 'legacy']
+
+
+@pytest.mark.parametrize('keyword_sets', [
+    {'k': ['Z']},                  # 定義が辞書でない
+    {'k': {'keywords': []}},       # キーワードが空
+    ['k'],                         # keyword_sets が辞書でない
+])
+def test_bad_file_keeps_previous_config(config_file, keyword_sets, capsys):
+    registry = reloading_registry(config_file, BASE_CONFIG)
+
+    _, write = config_file
+    write({'default_keywords': ['NewCompany'], 'keyword_sets': keyword_sets})
+
+    assert registry.get('default').keywords == ('OldCompany',)
+    assert registry.get('legacy@1').replacement == '新社名'
+    assert registry.config['default_keywords'] == ['OldCompany']
+    stats = registry.stats()
+    assert stats['reloaded_total'] == 0
+    assert stats['reload_failed_total'] == 1
+    assert '設定ファイルの再読み込みに失敗しました' in capsys.readouterr().out
+
+    # 修正されたファイルは読み込む
+    write(dict(BASE_CONFIG, default_keywords=['NewCompany']))
+    assert registry.get('default').set_id == 'default@2'
+    assert registry.stats()['reloaded_total'] == 1
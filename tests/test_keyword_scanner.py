@@ -0,0 +1,47 @@
+"""
+keyword_scanner のテスト（pptx エンジンと raw エンジンの結果が一致すること）
+"""
+import pytest
+from pptx import Presentation
+
+from keyword_scanner import (
+    SCOPES, find_keywords_in_package, find_keywords_in_presentation, parse_scopes, visit_scope_shapes
+)
+
+
+@pytest.mark.parametrize('scopes', [(scope,) for scope in SCOPES] + [SCOPES])
+def test_engines_return_same_results(deck, scopes):
+    keywords = ['OldCompany', '存在しない']
+    expected = find_keywords_in_presentation(Presentation(str(deck)), keywords, scopes)
+    assert expected, f"{scopes} で検出されるデッキを作成していない"
+    assert find_keywords_in_package(str(deck), keywords, scopes) == expected
+    assert {r['scope'] for r in expected} == set(scopes)
+
+
+def test_counts_are_case_insensitive(deck):
+    results = find_keywords_in_package(str(deck), ['oldcompany'], ('slides',))
+    body = [r for r in results if r['slide'] == 1 and r['shape'] == 1]
+    assert body[0]['count'] == 2
+
+
+def test_master_errors_skip_only_that_part(deck, capsys):
+    prs = Presentation(str(deck))
+    visited = []
+
+    def visit(scope, location, shape_num, shape):
+        if scope == 'layouts' and location.endswith('Layout 1'):
+            raise RuntimeError('壊れたシェイプ')
+        visited.append((scope, location))
+
+    visit_scope_shapes(prs, ('slides', 'layouts'), visit)
+    assert 'マスタースライド処理エラー' in capsys.readouterr().out
+    assert any(location.endswith('Layout 2') for scope, location in visited if scope == 'layouts')
+    assert any(scope == 'slides' for scope, _ in visited)
+
+
+def test_parse_scopes_orders_and_validates():
+    assert parse_scopes('notes,slides') == ('slides', 'notes')
+    assert parse_scopes('["layouts", "masters"]') == ('masters', 'layouts')
+    assert parse_scopes('') == ('slides', 'layouts')
+    with pytest.raises(ValueError):
+        parse_scopes('unknown')
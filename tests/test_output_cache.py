@@ -0,0 +1,145 @@
+"""
+output_cache.OutputCache のテスト（LRU による削除・削除できなかったファイルの再試行・再起動後の使用順・統計）
+"""
+import os
+
+import pytest
+
+from output_cache import OutputCache
+
+
+def read(cache, key):
+    f = cache.open(key)
+    if f is None:
+        return None
+    with f:
+        return f.read()
+
+
+def set_mtime(cache, key, mtime):
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=10)
+    cache.put('aa01', b'1234')
+    cache.put('bb02', b'5678')
+    assert read(cache, 'aa01') == b'1234'  # aa01 を使うと bb02 が最も古くなる
+    cache.put('cc03', b'9012')
+
+    assert read(cache, 'bb02') is None
+    assert read(cache, 'aa01') == b'1234'
+    assert read(cache, 'cc03') == b'9012'
+    assert not os.path.exists(cache._path('bb02'))
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] == 8
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+
+
+def test_oversized_entry_is_not_stored(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=4)
+    cache.put('aa01', b'12345')
+    assert read(cache, 'aa01') is None
+    assert cache.stats()['entries'] == 0
+
+
+@pytest.fixture
+def locked_files(monkeypatch):
+    """Windows のように開いているファイルを削除できない状態を再現する（集合に含まれるパスは削除できない）"""
+    locked = set()
+    remove = os.remove
+
+    def locked_remove(path):
+        if path in locked:
+            raise PermissionError(13, 'ファイルは使用中です', path)
+        remove(path)
+
+    monkeypatch.setattr(os, 'remove', locked_remove)
+    return locked
+
+
+def test_failed_removal_is_retried(tmp_path, locked_files):
+    cache = OutputCache(str(tmp_path), max_bytes=8)
+    cache.put('aa01', b'1234')
+    cache.put('bb02', b'5678')
+    locked_files.add(cache._path('aa01'))  # 送信中
+    cache.put('cc03', b'9012')
+
+    # 索引からは外れるが、ファイルが残っている間は合計サイズに含める
+    assert read(cache, 'aa01') is None
+    assert os.path.exists(cache._path('aa01'))
+    stats = cache.stats()
+    assert stats['pending_deletes'] == 1
+    assert stats['bytes'] == 8
+    assert stats['entries'] == 1  # 実際の使用量を上限に収めるため bb02 も削除する
+    assert read(cache, 'bb02') is None
+
+    locked_files.clear()  # 送信が終わった
+    cache.put('dd04', b'3456')
+    assert not os.path.exists(cache._path('aa01'))
+    stats = cache.stats()
+    assert stats['pending_deletes'] == 0
+    assert stats['bytes'] == 8
+    assert read(cache, 'cc03') == b'9012'
+    assert read(cache, 'dd04') == b'3456'
+
+
+def test_rewritten_entry_replaces_pending_delete(tmp_path, locked_files):
+    cache = OutputCache(str(tmp_path), max_bytes=4)
+    cache.put('aa01', b'1234')
+    locked_files.add(cache._path('aa01'))
+    cache.put('bb02', b'5678')
+    assert cache.stats()['pending_deletes'] == 1
+
+    # 同じキーで保存し直したファイルは、後の再試行で削除されない
+    locked_files.clear()
+    cache.put('aa01', b'1234')
+    assert cache.stats()['pending_deletes'] == 0
+    assert read(cache, 'aa01') == b'1234'
+    assert cache.stats()['bytes'] == 4
+
+
+def test_restart_keeps_usage_order(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=12)
+    for i, key in enumerate(['aa01', 'bb02', 'cc03']):
+        cache.put(key, b'1234')
+        set_mtime(cache, key, 1000 + i)
+    # 最終使用日時（更新日時）は open で更新される
+    read(cache, 'aa01')
+
+    # 書き込み途中で停止した一時ファイルは再起動時に削除する
+    tmp_file = cache._path('dd04') + '.1.tmp'
+    os.makedirs(os.path.dirname(tmp_file), exist_ok=True)
+    with open(tmp_file, 'wb') as f:
+        f.write(b'partial')
+
+    restarted = OutputCache(str(tmp_path), max_bytes=12)
+    assert not os.path.exists(tmp_file)
+    assert restarted.stats()['bytes'] == 12
+    restarted.put('ee05', b'1234')
+
+    # 再起動前に最も古かった bb02 から削除される
+    assert read(restarted, 'bb02') is None
+    assert read(restarted, 'aa01') == b'1234'
+    assert read(restarted, 'cc03') == b'1234'
+
+
+def test_restart_with_smaller_limit_evicts_oldest(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=12)
+    for i, key in enumerate(['aa01', 'bb02', 'cc03']):
+        cache.put(key, b'1234')
+        set_mtime(cache, key, 1000 + i)
+
+    restarted = OutputCache(str(tmp_path), max_bytes=8)
+    assert read(restarted, 'aa01') is None
+    assert read(restarted, 'bb02') == b'1234'
+    assert restarted.stats()['evictions'] == 1
+
+
+def test_make_key_depends_on_fields():
+    key = OutputCache.make_key(digests=['abc'], keywords=['A'], action='replace')
+    assert key == OutputCache.make_key(action='replace', keywords=['A'], digests=['abc'])
+    assert key != OutputCache.make_key(digests=['abc'], keywords=['B'], action='replace')
@@ -0,0 +1,57 @@
+"""
+parallel_scan.ParallelScanner のテスト（パート数の確認の上限・打ち切ったデッキのチャンクの停止）
+"""
+import pytest
+
+from conftest import build_deck
+from keyword_scanner import find_keywords_in_package
+from parallel_scan import ParallelScanInterrupted, ParallelScanner
+from scan_worker import STATUS_OK, STATUS_TIMEOUT, is_retryable
+
+SCOPES = ('slides', 'layouts')
+
+
+@pytest.fixture
+def scanner():
+    scanner = ParallelScanner(workers=2, min_parts=1, min_bytes=0, chunk_parts=2)
+    yield scanner
+    scanner.close()
+
+
+@pytest.fixture
+def big_deck(tmp_path):
+    return build_deck(tmp_path / 'big.pptx', slides=12)
+
+
+def test_matches_raw_engine(scanner, big_deck):
+    parts = scanner.plan(big_deck, SCOPES)
+    result = scanner.scan_file(big_deck, parts, ['OldCompany'], timeout=60)
+    assert result['status'] == STATUS_OK
+    assert result['chunks'] > 1
+    assert result['results'] == find_keywords_in_package(str(big_deck), ['OldCompany'], SCOPES)
+
+
+def test_plan_is_capped_by_part_sizes(big_deck):
+    assert ParallelScanner(workers=2, min_parts=1, min_bytes=0).plan(big_deck, SCOPES)
+    capped = ParallelScanner(workers=2, min_parts=1, min_bytes=0, plan_max_bytes=1024)
+    assert capped.plan(big_deck, SCOPES) is None
+
+
+def test_timeout_stops_remaining_chunks(scanner, big_deck):
+    parts = scanner.plan(big_deck, SCOPES)
+    result = scanner.scan_file(big_deck, parts, ['OldCompany'], timeout=0.001)
+    assert result['status'] == STATUS_TIMEOUT
+    assert not is_retryable(result)
+    assert scanner._pool is None  # プールごと停止した
+
+    # 次の検出は新しいプールで行う
+    assert scanner.scan_file(big_deck, parts, ['OldCompany'], timeout=60)['status'] == STATUS_OK
+
+
+def test_other_deck_is_interrupted_when_pool_stops(scanner, big_deck):
+    parts = scanner.plan(big_deck, SCOPES)
+    first = scanner.scan_async(big_deck, parts, ['OldCompany'])
+    second = scanner.scan_async(big_deck, parts, ['OldCompany'])
+    first.cancel()
+    with pytest.raises(ParallelScanInterrupted):
+        second.get(60)
@@ -0,0 +1,129 @@
+"""
+scan_daemon のテスト（待ち受け・ping・残骸のソケットの置き換え・権限・接続できない場合の通常モード）
+"""
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import scan_daemon
+from conftest import build_deck
+from detect_keywords_cli import build_scan_request, request_daemon_scan, scan_events
+
+pytestmark = pytest.mark.skipif(not scan_daemon.is_supported(), reason='Unix ソケットが使用できない環境')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def socket_path():
+    # Unix ソケットのパスは長さに制限があるため、短い一時ディレクトリを使う
+    directory = tempfile.mkdtemp(prefix='sd')
+    path = os.path.join(directory, 'd.sock')
+    yield path
+    if os.path.exists(path):
+        os.remove(path)
+    os.rmdir(directory)
+
+
+@pytest.fixture
+def run_server(socket_path):
+    servers = []
+
+    def start(handler):
+        server = scan_daemon.create_server(socket_path, handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.shutdown()
+        server.server_close()
+        thread.join(5)
+
+
+def test_request_round_trip(socket_path, run_server):
+    def handler(request):
+        yield {'event': 'echo', 'directory': request['directory']}
+        yield {'event': 'done'}
+
+    run_server(handler)
+    assert scan_daemon.ping(socket_path)
+    events = list(scan_daemon.send_request(socket_path, {'directory': '資料'}, timeout=5))
+    assert events == [{'event': 'echo', 'directory': '資料'}, {'event': 'done'}]
+
+
+def test_handler_error_is_sent_as_event(socket_path, run_server):
+    def handler(request):
+        raise ValueError('不明なエンジンです: x')
+        yield
+
+    run_server(handler)
+    events = list(scan_daemon.send_request(socket_path, {}, timeout=5))
+    assert events == [{'event': 'error', 'error': '不明なエンジンです: x'}]
+
+
+def test_socket_is_owner_only(socket_path, run_server):
+    run_server(lambda request: iter(()))
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+
+def test_stale_socket_is_replaced(socket_path, run_server):
+    # 前回異常終了したプロセスのソケットファイル（待ち受けていない）
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    assert os.path.exists(socket_path)
+    assert not scan_daemon.ping(socket_path)
+
+    run_server(lambda request: iter(()))
+    assert scan_daemon.ping(socket_path)
+
+
+def test_running_daemon_is_not_replaced(socket_path, run_server):
+    run_server(lambda request: iter(()))
+    with pytest.raises(RuntimeError):
+        scan_daemon.create_server(socket_path, lambda request: iter(()))
+    assert scan_daemon.ping(socket_path)
+
+
+def test_client_defaults_come_from_client_config(tmp_path, socket_path, run_server):
+    build_deck(tmp_path / 'deck.pptx', keyword='NewBrand')
+    daemon_config = {'default_keywords': ['OldCompany'], 'default_scopes': ['slides', 'layouts']}
+    client_config = {'default_keywords': ['NewBrand'], 'default_scopes': ['slides'],
+                     'file_time_limit_sec': 30, 'file_memory_limit_mb': 512}
+    run_server(lambda request: scan_events(request, daemon_config))
+
+    args = SimpleNamespace(directory=str(tmp_path), keywords=None, no_recursive=False, scope=None, engine=None,
+                           time_limit=None, memory_limit=None, no_retry_raw=False, parallel_workers=1,
+                           profile=False, profile_dump=None)
+    events = list(request_daemon_scan(socket_path, build_scan_request(args, client_config)))
+
+    start = events[0]
+    assert start['keywords'] == ['NewBrand']
+    assert start['scopes'] == ['slides']
+    assert (start['time_limit'], start['memory_limit']) == (30, 512)
+    done = [e for e in events if e['event'] == 'file_done']
+    assert done and all(r['scope'] == 'slides' for r in done[0]['result']['results'])
+    assert done[0]['result']['results']
+
+
+def test_client_falls_back_when_no_daemon(tmp_path, socket_path):
+    build_deck(tmp_path / 'deck.pptx')
+    assert request_daemon_scan(socket_path, {'directory': str(tmp_path)}) is None
+
+    completed = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, 'detect_keywords_cli.py'), str(tmp_path), '--client',
+         '--socket', socket_path, '-k', 'OldCompany'],
+        cwd=str(tmp_path), capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    assert '通常モードで実行します' in completed.stderr
+    assert '検出ファイル数: 1/1' in completed.stdout
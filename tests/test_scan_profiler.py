@@ -0,0 +1,39 @@
+"""
+scan_profiler のテスト（計測値の内訳・スナップショットの保存時間・tracemalloc の停止）
+"""
+import tracemalloc
+
+import pytest
+
+from scan_profiler import ScanProfile, profile_detection
+
+
+@pytest.mark.parametrize('engine', ['pptx', 'raw'])
+def test_snapshot_is_saved_outside_timings(deck, tmp_path, engine):
+    snapshot_path = str(tmp_path / 'tracemalloc.snapshot')
+    results, metrics = profile_detection(deck, ['OldCompany'], ('slides',), engine, snapshot_path=snapshot_path)
+
+    assert results
+    assert metrics['snapshot'] == snapshot_path
+    assert tracemalloc.Snapshot.load(snapshot_path).traces
+    assert metrics['snapshot_time'] > 0
+    assert metrics['parse'] >= 0 and metrics['scan'] >= 0
+    assert metrics['peak_python_heap'] > 0
+    # スナップショットを保存したファイルの計測が終われば tracemalloc は停止する
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_without_snapshot_does_not_trace(deck):
+    _, metrics = profile_detection(deck, ['OldCompany'], ('slides',), 'pptx')
+    assert 'snapshot' not in metrics
+    assert 'peak_python_heap' not in metrics
+    assert not tracemalloc.is_tracing()
+
+
+def test_wall_time_excludes_snapshot_time():
+    profile = ScanProfile()
+    profile.add(1, {'file': 'a.pptx', 'status': 'ok',
+                    'profile': {'wall': 1.5, 'parse': 0.2, 'scan': 0.3, 'snapshot_time': 1.0}})
+    entry = profile.files[1]
+    assert entry['wall'] == pytest.approx(0.5)
+    assert entry['parse'] + entry['scan'] == pytest.approx(0.5)
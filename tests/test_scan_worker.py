@@ -0,0 +1,71 @@
+"""
+scan_worker のテスト（プロセスを使わない小さなファイル・小さなファイルの打ち切り・ジョブごとの処理予算・ワーカーの貸し出し）
+"""
+import pytest
+
+from conftest import build_deck
+from scan_worker import (
+    STATUS_OK, STATUS_TIMEOUT, STATUS_TOO_LARGE, ScanWorker, ScanWorkerPool, WorkerBusy,
+    estimate_parse_memory, is_retryable, retry_with_raw_engine, scan_file
+)
+
+MB = 1024 * 1024
+
+
+def test_small_file_runs_without_worker_process(deck):
+    worker = ScanWorker(time_limit=60, memory_limit=512 * MB, inprocess_limit=64 * MB)
+    result = scan_file(worker, deck, ['OldCompany'])
+    assert result['status'] == STATUS_OK
+    assert result['results']
+    assert worker._process is None
+
+
+def test_slow_small_file_is_aborted(deck, tmp_path):
+    # 見積もりは小さいが検出に時間のかかるファイル（inprocess_limit を指定しなければワーカーで打ち切れる）
+    slow = tmp_path / 'slow.pptx'
+    build_deck(slow, slides=300)
+    assert estimate_parse_memory(slow) < 64 * MB
+
+    with ScanWorker(time_limit=60, memory_limit=512 * MB) as worker:
+        worker.ensure_started()
+        result = scan_file(worker, slow, ['OldCompany'], budget=(0.05, 512 * MB))
+        assert result['status'] == STATUS_TIMEOUT
+        assert is_retryable(result)
+        assert worker._process is None
+
+        # 次のファイルではワーカーを起動し直して検出する
+        assert scan_file(worker, deck, ['OldCompany'])['status'] == STATUS_OK
+
+
+def test_budget_is_given_per_job(deck):
+    worker = ScanWorker(time_limit=60, memory_limit=512 * MB, inprocess_limit=64 * MB)
+    result = scan_file(worker, deck, ['OldCompany'], budget=(60, 1))
+    assert result['status'] == STATUS_TOO_LARGE
+    assert is_retryable(result)
+
+    # raw エンジンは見積もりで打ち切らない
+    retried = retry_with_raw_engine(worker, deck, ['OldCompany'], ('slides',), result, budget=(60, 64 * MB))
+    assert retried['status'] == STATUS_OK
+    assert retried['retried_from'] == STATUS_TOO_LARGE
+    assert not is_retryable(retried)
+    assert worker._process is None
+
+
+def test_worker_process_is_reused_across_budgets(deck):
+    with ScanWorker(time_limit=60, memory_limit=2048 * MB) as worker:
+        assert scan_file(worker, deck, ['OldCompany'])['status'] == STATUS_OK
+        pid = worker._process.pid
+        result = scan_file(worker, deck, ['OldCompany'], engine='raw', budget=(30, 1024 * MB))
+        assert result['status'] == STATUS_OK
+        assert worker._process.pid == pid
+
+
+def test_pool_raises_when_no_worker_is_free():
+    pool = ScanWorkerPool(1, acquire_timeout=0.05)
+    with pool.worker():
+        with pytest.raises(WorkerBusy):
+            with pool.worker():
+                pass
+    with pool.worker() as worker:
+        assert worker is not None
+    pool.close()